@@ -0,0 +1,101 @@
+"""
+Microbenchmark: logging cost per text update on the event loop thread
+
+    python -m benchmarks.bench_logging
+
+"old" is the previous setup: a synchronous colored StreamHandler, and per update a print
+of the whole message, seven INFO lines about it, "Processing text message" and the full
+answer at INFO. "new" is setup_logger (queue + writer thread) with the current chat
+handler lines, at INFO (the default) and at DEBUG (every line written). Output goes to
+/dev/null, so a terminal or a slow pipe would only widen the gap.
+"""
+
+import contextlib
+import datetime
+import logging
+import os
+import time
+
+from telegram import Chat, Message, User
+
+from bot.handlers import chat
+from bot.utils import logger as bot_logger
+
+ANSWER = "Under GDPR you need a lawful basis for every processing activity (Art. 6). " * 20
+
+RESET = "\033[0m"
+
+
+class OldColorFormatter(logging.Formatter):
+    """The previous formatter, which recolored record.levelname in place"""
+
+    def format(self, record):
+        record.levelname = f"{bot_logger.COLORS.get(record.levelname, '')}{record.levelname}{RESET}"
+        return super().format(record)
+
+
+def old_update(message):
+    print("Chat message received 🍕🍕🍕🍕🍕", message)
+    logging.info(f"Message type: {type(message)}")
+    logging.info(f"Voice: {message.voice}")
+    logging.info(f"Audio: {message.audio}")
+    logging.info(f"Document: {message.document}")
+    logging.info(f"Photo: {message.photo}")
+    logging.info(f"Text: {message.text}")
+    logging.info(f"Caption: {message.caption}")
+    logging.info("Processing text message")
+    logging.info(f"Response: {ANSWER}")
+
+
+def new_update(message):
+    chat._log_message(message)
+    chat.logger.debug("Processing text message")
+    chat.logger.debug("Response: %s", ANSWER)
+
+
+def make_message() -> Message:
+    user = User(id=42, first_name="Aye", is_bot=False, language_code="my")
+    return Message(
+        message_id=7,
+        date=datetime.datetime.now(datetime.timezone.utc),
+        chat=Chat(id=42, type=Chat.PRIVATE, first_name="Aye"),
+        from_user=user,
+        text="Do we need a DPO for a 20-person clinic in Yangon?",
+    )
+
+
+def per_update(fn, message, number: int) -> float:
+    started = time.perf_counter()
+    for _ in range(number):
+        fn(message)
+    return (time.perf_counter() - started) / number
+
+
+def main(number: int = 5000):
+    message = make_message()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for handler in logging.root.handlers[:]:
+            logging.root.removeHandler(handler)
+        handler = logging.StreamHandler(devnull)
+        handler.setFormatter(OldColorFormatter(bot_logger.TEXT_FORMAT))
+        logging.basicConfig(level=logging.INFO, handlers=[handler])
+        old = per_update(old_update, message, number)
+
+        results = {}
+        for level in ("INFO", "DEBUG"):
+            bot_logger.setup_logger(level=level, stream=devnull)
+            results[level] = per_update(new_update, message, number)
+            started = time.perf_counter()
+            bot_logger.stop_logger()
+            results[level + " drain"] = (time.perf_counter() - started) / number
+
+    print(f"per update, {number} updates")
+    print(f"  {'old: sync handler, print + 9 INFO':<38} {old * 1e6:8.1f} us")
+    print(f"  {'new: queue, LOG_LEVEL=INFO':<38} {results['INFO'] * 1e6:8.1f} us")
+    print(f"  {'new: queue, LOG_LEVEL=DEBUG':<38} {results['DEBUG'] * 1e6:8.1f} us"
+          f"  (+{results['DEBUG drain'] * 1e6:.1f} us left to the writer thread at exit)")
+    print(f"  speedup at INFO: {old / results['INFO']:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
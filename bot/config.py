@@ -3,8 +3,209 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _get_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _get_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+def _get_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
 def get_bot_token() -> str:
     token = os.getenv("TELEGRAM_BOT_TOKEN")
     if not token:
         raise ValueError("TELEGRAM_BOT_TOKEN not set in environment variables.")
-    return token 
\ No newline at end of file
+    return token
+
+
+# --- Update ingress --- #
+# "polling" (getUpdates) or "webhook" (Telegram POSTs updates to the embedded server)
+BOT_MODE = os.getenv("BOT_MODE", "polling").strip().lower()
+# Public HTTPS base URL Telegram should call, e.g. https://bot.example.com
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+# Sent back by Telegram in X-Telegram-Bot-Api-Secret-Token; generated per start if empty
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+# PORT is what most hosting platforms assign to web processes
+WEBHOOK_PORT = _get_int("PORT", 8443)
+WEBHOOK_MAX_CONNECTIONS = _get_int("WEBHOOK_MAX_CONNECTIONS", 40)
+# Bot API server; point at a local Bot API server or a stand-in for load tests
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org").rstrip("/")
+
+# --- Sharding --- #
+# Worker processes behind one ingress process; each chat is always served by the same
+# worker. 1 runs everything in a single process.
+BOT_SHARDS = _get_int("BOT_SHARDS", 1)
+# Raw updates buffered per worker before the ingress applies backpressure
+SHARD_QUEUE_SIZE = _get_int("SHARD_QUEUE_SIZE", 1000)
+
+# --- RAG HTTP client pool --- #
+RAG_MAX_CONNECTIONS = _get_int("RAG_MAX_CONNECTIONS", 100)
+RAG_MAX_KEEPALIVE_CONNECTIONS = _get_int("RAG_MAX_KEEPALIVE_CONNECTIONS", 20)
+RAG_KEEPALIVE_EXPIRY = _get_float("RAG_KEEPALIVE_EXPIRY", 30.0)
+RAG_HTTP2 = _get_bool("RAG_HTTP2", False)
+RAG_PRECONNECT = _get_int("RAG_PRECONNECT", 2)
+# Share one upstream call between identical in-flight requests
+RAG_COALESCE = _get_bool("RAG_COALESCE", True)
+
+# --- Update dispatch --- #
+# Handlers running at once; 1 keeps PTB's default sequential processing
+BOT_CONCURRENT_UPDATES = _get_int("BOT_CONCURRENT_UPDATES", 256)
+# Updates admitted at once, including those queued behind an earlier update of the same chat
+BOT_MAX_PENDING_UPDATES = _get_int("BOT_MAX_PENDING_UPDATES", 1024)
+
+# --- Answer cache for text queries --- #
+ANSWER_CACHE_ENABLED = _get_bool("ANSWER_CACHE_ENABLED", True)
+ANSWER_CACHE_MAX_ENTRIES = _get_int("ANSWER_CACHE_MAX_ENTRIES", 2048)
+ANSWER_CACHE_MAX_BYTES = _get_int("ANSWER_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+ANSWER_CACHE_TTL = _get_float("ANSWER_CACHE_TTL", 6 * 3600.0)
+
+# --- Streaming answers --- #
+# Use the chunked/SSE variant of /text and edit the reply as tokens arrive
+RAG_STREAMING = _get_bool("RAG_STREAMING", False)
+RAG_STREAM_PATH = os.getenv("RAG_STREAM_PATH", "/text/stream")
+# Minimum seconds between edits of one streamed message (Telegram allows ~1 edit/s per chat)
+STREAM_EDIT_INTERVAL = _get_float("STREAM_EDIT_INTERVAL", 1.0)
+STREAM_EDIT_INTERVAL_GROUP = _get_float("STREAM_EDIT_INTERVAL_GROUP", 3.0)
+
+# --- File uploads --- #
+# Pipe Telegram downloads straight into the RAG upload instead of buffering whole files
+RAG_STREAM_UPLOADS = _get_bool("RAG_STREAM_UPLOADS", True)
+# Files larger than this are spooled to a temporary file before uploading
+FILE_SPOOL_THRESHOLD = _get_int("FILE_SPOOL_THRESHOLD", 8 * 1024 * 1024)
+FILE_SPOOL_DIR = os.getenv("FILE_SPOOL_DIR", "")
+FILE_CHUNK_SIZE = _get_int("FILE_CHUNK_SIZE", 64 * 1024)
+
+# --- File and speech result cache --- #
+FILE_CACHE_ENABLED = _get_bool("FILE_CACHE_ENABLED", True)
+FILE_CACHE_MAX_ENTRIES = _get_int("FILE_CACHE_MAX_ENTRIES", 4096)
+FILE_CACHE_MAX_BYTES = _get_int("FILE_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+FILE_CACHE_TTL = _get_float("FILE_CACHE_TTL", 7 * 86400.0)
+# SQLite file for the on-disk tier; leave empty to keep results in memory only
+FILE_CACHE_PATH = os.getenv("FILE_CACHE_PATH", "")
+FILE_CACHE_DISK_MAX_BYTES = _get_int("FILE_CACHE_DISK_MAX_BYTES", 256 * 1024 * 1024)
+
+# --- Conversation memory --- #
+# The last turns of each chat are sent to the RAG API as `history` for follow-up questions.
+# Off by default: a text question with history bypasses the answer cache and coalescing,
+# and a file or voice answer with history is not stored in the result cache (cached
+# results are still served, since they depend on the content rather than the chat).
+CONVERSATION_MEMORY_ENABLED = _get_bool("CONVERSATION_MEMORY_ENABLED", False)
+CONVERSATION_MAX_TURNS = _get_int("CONVERSATION_MAX_TURNS", 6)
+CONVERSATION_TOKEN_BUDGET = _get_int("CONVERSATION_TOKEN_BUDGET", 1000)
+CONVERSATION_MAX_TURN_CHARS = _get_int("CONVERSATION_MAX_TURN_CHARS", 2000)
+CONVERSATION_TTL = _get_float("CONVERSATION_TTL", 1800.0)
+CONVERSATION_MAX_CHATS = _get_int("CONVERSATION_MAX_CHATS", 20000)
+CONVERSATION_MAX_BYTES = _get_int("CONVERSATION_MAX_BYTES", 64 * 1024 * 1024)
+
+# --- user_data / chat_data persistence --- #
+# SQLite file; leave empty to keep user_data and chat_data in memory only. With BOT_SHARDS > 1
+# each shard uses its own file (persistence-shard2.sqlite3), as a chat is only served by one shard
+PERSISTENCE_PATH = os.getenv("PERSISTENCE_PATH", "data/persistence.sqlite3")
+# Seconds between the Application's persistence updates
+PERSISTENCE_UPDATE_INTERVAL = _get_float("PERSISTENCE_UPDATE_INTERVAL", 60.0)
+# Changes are written this many seconds after the first of them, in one transaction
+PERSISTENCE_FLUSH_DELAY = _get_float("PERSISTENCE_FLUSH_DELAY", 1.0)
+
+# --- RAG retries and circuit breaker --- #
+RAG_RETRY_ATTEMPTS = _get_int("RAG_RETRY_ATTEMPTS", 3)
+RAG_RETRY_BASE_DELAY = _get_float("RAG_RETRY_BASE_DELAY", 0.25)
+RAG_RETRY_MAX_DELAY = _get_float("RAG_RETRY_MAX_DELAY", 2.0)
+# Consecutive failures that open an endpoint's circuit, and seconds before probing again
+RAG_BREAKER_FAILURES = _get_int("RAG_BREAKER_FAILURES", 5)
+RAG_BREAKER_RESET = _get_float("RAG_BREAKER_RESET", 30.0)
+
+# --- Adaptive concurrency limit for RAG calls (per endpoint) --- #
+RAG_LIMIT_INITIAL = _get_int("RAG_LIMIT_INITIAL", 8)
+RAG_LIMIT_MAX = _get_int("RAG_LIMIT_MAX", 128)
+# Calls over the limit wait in a queue of this size for at most RAG_LIMIT_MAX_WAIT seconds
+RAG_LIMIT_MAX_QUEUE = _get_int("RAG_LIMIT_MAX_QUEUE", 64)
+RAG_LIMIT_MAX_WAIT = _get_float("RAG_LIMIT_MAX_WAIT", 10.0)
+
+# --- Per-modality worker pools --- #
+# Workers plus queue of each pool should stay well below BOT_CONCURRENT_UPDATES, so one
+# modality can never hold every dispatcher slot
+SCHED_TEXT_WORKERS = _get_int("SCHED_TEXT_WORKERS", 24)
+SCHED_TEXT_QUEUE = _get_int("SCHED_TEXT_QUEUE", 160)
+SCHED_FILE_WORKERS = _get_int("SCHED_FILE_WORKERS", 4)
+SCHED_FILE_QUEUE = _get_int("SCHED_FILE_QUEUE", 16)
+SCHED_SPEECH_WORKERS = _get_int("SCHED_SPEECH_WORKERS", 2)
+SCHED_SPEECH_QUEUE = _get_int("SCHED_SPEECH_QUEUE", 16)
+# Text questions up to this length are served before longer ones
+TEXT_PRIORITY_MAX_CHARS = _get_int("TEXT_PRIORITY_MAX_CHARS", 200)
+
+# --- Outbound Telegram rate limits --- #
+TG_RATE_LIMIT_ENABLED = _get_bool("TG_RATE_LIMIT_ENABLED", True)
+# Messages per second across all chats, per second in one chat, and per minute in one group
+TG_RATE_GLOBAL = _get_float("TG_RATE_GLOBAL", 30.0)
+TG_RATE_PER_CHAT = _get_float("TG_RATE_PER_CHAT", 1.0)
+TG_RATE_GROUP_PER_MINUTE = _get_float("TG_RATE_GROUP_PER_MINUTE", 20.0)
+# Messages one chat may send back to back before the per-chat rate applies
+TG_RATE_CHAT_BURST = _get_int("TG_RATE_CHAT_BURST", 3)
+# Replays of a request that hit flood control (RetryAfter) before giving up
+TG_MAX_RETRIES = _get_int("TG_MAX_RETRIES", 3)
+
+# --- Durable file and speech jobs --- #
+# Queue file/speech requests in SQLite so they survive restarts; off runs them inline
+JOB_QUEUE_ENABLED = _get_bool("JOB_QUEUE_ENABLED", True)
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "data/jobs.sqlite3")
+# Job workers per kind, independent of the update dispatcher
+JOB_FILE_WORKERS = _get_int("JOB_FILE_WORKERS", 4)
+JOB_SPEECH_WORKERS = _get_int("JOB_SPEECH_WORKERS", 2)
+# Seconds a claimed job stays hidden; renewed while it runs, so it only lapses if the worker died
+JOB_VISIBILITY_TIMEOUT = _get_float("JOB_VISIBILITY_TIMEOUT", 180.0)
+# Attempts before a job goes to the dead-letter list; retries wait attempts x delay
+JOB_MAX_ATTEMPTS = _get_int("JOB_MAX_ATTEMPTS", 3)
+JOB_RETRY_DELAY = _get_float("JOB_RETRY_DELAY", 10.0)
+
+# --- Answer pagination --- #
+# Pages of answers longer than one message, kept for the ◀ / ▶ buttons
+PAGE_STORE_MAX_ENTRIES = _get_int("PAGE_STORE_MAX_ENTRIES", 1024)
+PAGE_STORE_MAX_BYTES = _get_int("PAGE_STORE_MAX_BYTES", 16 * 1024 * 1024)
+PAGE_STORE_TTL = _get_float("PAGE_STORE_TTL", 86400.0)
+
+# --- Menu images --- #
+# Telegram file_ids of menu images, so each image is uploaded only once; empty keeps them in memory
+MEDIA_CACHE_PATH = os.getenv("MEDIA_CACHE_PATH", "data/media_ids.json")
+# Local copies of menu images (named like the last part of their URL), uploaded instead of the URL
+MEDIA_ASSET_DIR = os.getenv("MEDIA_ASSET_DIR", "img")
+
+# --- Startup --- #
+# Digest of the last command list sent with setMyCommands; the push is skipped while it matches
+BOT_COMMANDS_STATE_PATH = os.getenv("BOT_COMMANDS_STATE_PATH", "data/bot_commands.sha256")
+
+# --- Metrics --- #
+# Prometheus text-format /metrics endpoint; 0 turns it off. Shard N listens on METRICS_PORT + N
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = _get_int("METRICS_PORT", 9464)
+
+# --- Tracing --- #
+# Every message gets a trace id (sent to the RAG API as X-Trace-Id) and span timings
+TRACE_ENABLED = _get_bool("TRACE_ENABLED", True)
+# Share of finished traces written out; traces taking TRACE_SLOW_SECONDS or longer always are
+TRACE_SAMPLE_RATE = _get_float("TRACE_SAMPLE_RATE", 0.05)
+TRACE_SLOW_SECONDS = _get_float("TRACE_SLOW_SECONDS", 10.0)
+# JSON lines file for exported traces, written by a background thread; empty logs them instead.
+# With BOT_SHARDS > 1 each shard writes its own file (traces-shard2.jsonl)
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "data/traces.jsonl")
+# The file is rotated at this size, keeping TRACE_EXPORT_BACKUPS older files (traces.jsonl.1, ...)
+TRACE_EXPORT_MAX_BYTES = _get_int("TRACE_EXPORT_MAX_BYTES", 64 * 1024 * 1024)
+TRACE_EXPORT_BACKUPS = _get_int("TRACE_EXPORT_BACKUPS", 3)
+
+# --- Logging --- #
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# "text" (colored on a terminal) or "json" (one object per line)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+# Share of DEBUG/INFO records kept per logger, e.g. "httpx=0.1,bot.handlers.chat=0.5"
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "httpx=0.1")
@@ -5,106 +5,348 @@ Handles text, voice, audio, photos, and document messages
 
 import logging
 import re
+import time
+from typing import Optional
 from telegram import Update
+from telegram.error import BadRequest, RetryAfter
 from telegram.ext import ContextTypes
-from bot.services.rag_api import query_text, query_text_with_file, speech_to_text
+from bot.config import RAG_STREAMING
+from bot.services import jobs, memory
+from bot.services.rag_api import query_text, query_text_with_file, speech_to_text, query_text_stream, is_retryable, RAGStreamError, USER_FRIENDLY_ERRORS
+from bot.services.scheduler import PRIORITY_NORMAL, SchedulerBusyError, scheduler, text_priority
+from bot.services.uploads import TelegramAttachmentSource
+from bot.utils.logger import lazy
+from bot.utils.metrics import REPLY_SEND_SECONDS, UPDATE_SECONDS, UPDATES, UPDATES_IN_PROGRESS
+from bot.utils.pagination import first_page
+from bot.utils.rendering import Rendered, render_markdown
+from bot.utils.streaming import StreamingReply
+from bot.utils.tracing import add_span, current_trace_id, span, tracer
 
 logger = logging.getLogger(__name__)
 
+FAILED_TEXT = "❌ Sorry, something went wrong. Please try again later."
 
-def escape_markdown_v2(text: str) -> str:
+_ERROR_TEXTS = frozenset(USER_FRIENDLY_ERRORS.values())
+
+
+def _history(chat_id) -> list:
+    """Earlier turns of the chat to send along with its next question"""
+    if memory.conversations is None:
+        return []
+    return memory.conversations.history(chat_id)
+
+
+def _remember(chat_id, question: str, answer: str):
+    """Keep a question and its answer for follow-ups, unless the answer is an error"""
+    if memory.conversations is not None and answer and answer not in _ERROR_TEXTS:
+        memory.conversations.record(chat_id, question, answer)
+
+
+async def stream_answer(message, query: str, history: Optional[list] = None):
+    """Reply to a text question by editing one message as the answer streams in"""
+    reply = StreamingReply(message, render=render_markdown)
+    await reply.start()
+    try:
+        async for token in query_text_stream(query, history):
+            await reply.feed(token)
+    except RAGStreamError as e:
+        if not reply.text:
+            await reply.finish(str(e))
+            return
+        logging.warning(f"Answer stream broke off after {len(reply.text)} chars: {e}")
+        await reply.finish(f"{reply.text}\n\n⚠️ {e}")
+        return
+    _remember(message.chat_id, query, reply.text)
+    with REPLY_SEND_SECONDS.labels("edit").time(), span("reply", streamed=True):
+        await reply.finish()
+
+
+def _describe(message) -> str:
+    parts = [name for name in ("text", "caption", "photo", "document", "voice", "audio") if getattr(message, name)]
+    return f"message {message.message_id} in chat {message.chat_id} ({', '.join(parts) or 'no content'})"
+
+
+def _log_message(message):
+    # One debug line per update; the description is only built if the record is written
+    logger.debug("Received %s", lazy(_describe, message))
+
+
+async def _reply(message, answer: Rendered):
+    with REPLY_SEND_SECONDS.labels("send").time(), span("reply"):
+        await message.reply_text(**first_page(answer))
+
+
+def _handled(modality: str, outcome: str, started: float):
+    """Record the outcome and handling time of a finished message"""
+    UPDATES_IN_PROGRESS.labels(modality).dec()
+    UPDATE_SECONDS.labels(modality).observe(time.perf_counter() - started)
+    UPDATES.labels(modality, outcome).inc()
+
+
+def _file_reply(response) -> str:
+    if isinstance(response, dict):
+        return response.get("response") or response.get("detail") or str(response)
+    return str(response)
+
+
+async def _run(update: Update, context: ContextTypes.DEFAULT_TYPE, modality: str, work, priority: int = PRIORITY_NORMAL):
+    """Show typing, run `work(message)` in the modality's worker pool and report failures, all in one trace"""
+    message = update.message
+    _log_message(message)
+    UPDATES_IN_PROGRESS.labels(modality).inc()
+    started = time.perf_counter()
+    outcome = "answered"
+    with tracer.trace("message", modality=modality, chat_id=message.chat_id) as trace:
+        try:
+            with span("typing"):
+                await context.bot.send_chat_action(chat_id=update.effective_chat.id, action="typing")
+            queued = time.perf_counter()
+            async with scheduler.slot(modality, priority):
+                add_span("queue", queued)
+                await work(message)
+        except SchedulerBusyError as e:
+            outcome = "busy"
+            logging.warning(f"Rejected {modality} message: {e}")
+            await message.reply_text(f"⏳ {USER_FRIENDLY_ERRORS['busy']}")
+        except RetryAfter as e:
+            # Still flooded after the rate limiter's replays: another reply would only fail too
+            outcome = "flooded"
+            logging.warning(f"Dropped {modality} reply under flood control: {e}")
+        except Exception as e:
+            outcome = "failed"
+            logging.error(f"Error in chat_message: {e}")
+            await message.reply_text(FAILED_TEXT)
+        finally:
+            trace.set(outcome=outcome)
+            _handled(modality, outcome, started)
+
+
+def _upload_job(message, attachment, filename: str, query: str = "") -> dict:
+    """What a file or speech job needs to run later: ids only, never the file itself"""
+    return {
+        "chat_id": message.chat_id,
+        "message_id": message.message_id,
+        "file_id": attachment.file_id,
+        "file_unique_id": attachment.file_unique_id,
+        "file_size": attachment.file_size,
+        "filename": filename,
+        "query": query,
+        # Taken now, so a queued job sees the conversation as it was when the file was sent
+        "history": _history(message.chat_id),
+        # The job's trace continues the message's, so both join up with the RAG logs
+        "trace_id": current_trace_id(),
+    }
+
+
+def _speech_job(message) -> dict:
+    file = message.voice or message.audio
+    filename = file.file_name if hasattr(file, 'file_name') and file.file_name else f"audio.{file.mime_type.split('/')[-1]}"
+    return _upload_job(message, file, filename)
+
+
+def _photo_job(message) -> dict:
+    # Get the largest photo size
+    photo = message.photo[-1]
+    # Photo with caption (text + image)
+    query = message.caption if message.caption else "What do you see in this image?"
+    return _upload_job(message, photo, f"image_{photo.file_id}.jpg", query)
+
+
+def _document_job(message) -> dict:
+    # File with caption (text + file)
+    query = message.caption if message.caption else "What is this document about?"
+    return _upload_job(message, message.document, message.document.file_name, query)
+
+
+class _StoredAttachment:
+    """A Telegram file known only by the ids kept in a job"""
+
+    def __init__(self, bot, job: dict):
+        self.bot = bot
+        self.file_id = job["file_id"]
+        self.file_unique_id = job["file_unique_id"]
+        self.file_size = job["file_size"]
+
+    async def get_file(self):
+        return await self.bot.get_file(self.file_id)
+
+
+def _speech_reply(result) -> Rendered:
+    if "error" in result:
+        return Rendered(f"❌ Speech error: {result['error']}")
+    if "detail" in result:
+        return Rendered(f"❌ {result['detail']}")
+    # The transcription is what the user said: shown as is, only the answer is markdown
+    return Rendered(f"🗣️ {result.get('transcription', '')}\n\n") + render_markdown(result.get('response', ''))
+
+
+def _check_retry(result, retry: bool):
+    if retry and is_retryable(result):
+        raise jobs.RetryableJobError(result["detail"])
+
+
+async def _answer_upload(bot, kind: str, job: dict, retry: bool = False) -> Rendered:
     """
-    Escape all Telegram MarkdownV2 special characters to prevent parsing errors.
+    Run a file or speech job against the RAG API and return the rendered reply. With
+    `retry`, a transient failure raises RetryableJobError instead of becoming the reply.
     """
-    if not isinstance(text, str):
-        text = str(text)
-    
-    # List of all MarkdownV2 special characters that need escaping
-    escape_chars = ['_', '*', '[', ']', '(', ')', '~', '`', '>', '#', '+', '-', '=', '|', '{', '}', '.', '!']
-    
-    # Escape each special character
-    for char in escape_chars:
-        text = text.replace(char, f'\\{char}')
-    
-    return text
+    # getFile and the download only happen if the result is not cached
+    source = TelegramAttachmentSource(_StoredAttachment(bot, job))
+    try:
+        history = job.get("history")
+        if kind == "speech":
+            result = await speech_to_text(source, job["filename"], history)
+            logger.debug("Voice to text result: %s", result)
+            _check_retry(result, retry)
+            if isinstance(result, dict) and "error" not in result and "detail" not in result:
+                _remember(job["chat_id"], result.get("transcription", ""), result.get("response", ""))
+            with span("render"):
+                return _speech_reply(result)
+        response = await query_text_with_file(job["query"], source, job["filename"], history)
+        _check_retry(response, retry)
+        if isinstance(response, dict) and "detail" not in response:
+            _remember(job["chat_id"], job["query"], response.get("response", ""))
+        with span("render"):
+            return render_markdown(_file_reply(response))
+    finally:
+        await source.aclose()
 
 
-async def chat_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle incoming chat messages (text, voice, audio, photos, documents)"""
-    print("Chat message received 🍕🍕🍕🍕🍕", update.message)
+async def _answer_speech(message):
+    logger.debug("Processing voice/audio message")
+    await _reply(message, await _answer_upload(message.get_bot(), "speech", _speech_job(message)))
+
+
+async def _answer_photo(message):
+    logger.debug("Processing photo message")
+    await _reply(message, await _answer_upload(message.get_bot(), "file", _photo_job(message)))
+
+
+async def _answer_document(message):
+    logger.debug("Processing document message")
+    await _reply(message, await _answer_upload(message.get_bot(), "file", _document_job(message)))
+
+
+# ----- Durable file and speech jobs ----- #
+PROCESSING_TEXT = {
+    "file": "⏳ Processing your file. This message will show the answer when it is ready.",
+    "speech": "⏳ Processing your voice message. This message will show the answer when it is ready.",
+}
+
+
+async def _submit(update: Update, kind: str, make_job):
+    """Acknowledge at once and queue the work; a job worker edits the acknowledgement later"""
     message = update.message
-    logging.info(f"Message type: {type(message)}")
-    logging.info(f"Voice: {message.voice}")
-    logging.info(f"Audio: {message.audio}")
-    logging.info(f"Document: {message.document}")
-    logging.info(f"Photo: {message.photo}")
-    logging.info(f"Text: {message.text}")
-    logging.info(f"Caption: {message.caption}")
+    _log_message(message)
+    UPDATES_IN_PROGRESS.labels(kind).inc()
+    started = time.perf_counter()
+    outcome = "queued"
+    with tracer.trace("message", modality=kind, chat_id=message.chat_id) as trace:
+        try:
+            job = make_job(message)
+            with span("reply", kind="ack"):
+                ack = await message.reply_text(PROCESSING_TEXT[kind])
+            job["ack_message_id"] = ack.message_id
+            job_id = jobs.runner.submit(kind, job)
+            logger.info("Queued %s job %s", kind, job_id)
+        except RetryAfter as e:
+            outcome = "flooded"
+            logging.warning(f"Dropped {kind} reply under flood control: {e}")
+        except Exception as e:
+            outcome = "failed"
+            logging.error(f"Error in chat_message: {e}")
+            await message.reply_text(FAILED_TEXT)
+        finally:
+            trace.set(outcome=outcome)
+            _handled(kind, outcome, started)
 
+
+async def _deliver(bot, job: dict, answer: Rendered):
+    """Edit the acknowledgement into the answer, or reply anew if it can no longer be edited"""
+    content = first_page(answer)
     try:
-        await context.bot.send_chat_action(chat_id=update.effective_chat.id, action="typing")
-
-        # 1. Speech (voice or audio)
-        if message.voice or message.audio:
-            logging.info("Processing voice/audio message")
-            file = message.voice or message.audio
-            file_obj = await file.get_file()
-            file_bytes = await file_obj.download_as_bytearray()
-            filename = file.file_name if hasattr(file, 'file_name') and file.file_name else f"audio.{file.mime_type.split('/')[-1]}"
-            result = await speech_to_text(bytes(file_bytes), filename)
-            print("Voice to text result: ", result)
-            if "error" in result:
-                await message.reply_text(escape_markdown_v2(f"❌ Speech error: {result['error']}"), parse_mode="MarkdownV2")
-            else:
-                transcription = escape_markdown_v2(result.get('transcription', ''))
-                response_text = escape_markdown_v2(result.get('response', ''))
-                await message.reply_text(f"🗣️ {transcription}\n\n{response_text}", parse_mode="MarkdownV2")
+        with REPLY_SEND_SECONDS.labels("edit").time(), span("reply"):
+            await bot.edit_message_text(chat_id=job["chat_id"], message_id=job["ack_message_id"], **content)
+    except BadRequest as e:
+        if "not modified" in str(e).lower():
+            # A replayed job whose answer was already shown
             return
+        with REPLY_SEND_SECONDS.labels("send").time(), span("reply"):
+            await bot.send_message(
+                job["chat_id"], **content,
+                reply_to_message_id=job["message_id"], allow_sending_without_reply=True,
+            )
 
-        # 2. Photo (image)
-        if message.photo:
-            logging.info("Processing photo message")
-            # Get the largest photo size
-            photo = message.photo[-1]
-            file_obj = await photo.get_file()
-            file_bytes = await file_obj.download_as_bytearray()
-            filename = f"image_{photo.file_id}.jpg"
-            # Photo with caption (text + image)
-            query = message.caption if message.caption else "What do you see in this image?"
-            response = await query_text_with_file(query, bytes(file_bytes), filename)
-            if isinstance(response, dict):
-                reply = response.get("response", str(response))
-            else:
-                reply = str(response)
-            await message.reply_text(escape_markdown_v2(reply), parse_mode="MarkdownV2")
-            return
 
-        # 3. File (document)
-        if message.document:
-            logging.info("Processing document message")
-            file_obj = await message.document.get_file()
-            file_bytes = await file_obj.download_as_bytearray()
-            filename = message.document.file_name
-            # File with caption (text + file)
-            query = message.caption if message.caption else "What is this document about?"
-            response = await query_text_with_file(query, bytes(file_bytes), filename)
-            if isinstance(response, dict):
-                reply = response.get("response", str(response))
-            else:
-                reply = str(response)
-            await message.reply_text(escape_markdown_v2(reply), parse_mode="MarkdownV2")
-            return
+async def run_job(bot, job: jobs.Job):
+    """
+    Run a queued file or speech job and deliver its answer, for jobs.JobRunner. A busy or
+    failing backend makes the runner try again later; only the last attempt shows that error.
+    """
+    with tracer.trace("job", job.payload.get("trace_id"), kind=job.kind, job_id=job.id, attempt=job.attempts):
+        answer = await _answer_upload(bot, job.kind, job.payload, retry=not job.last_attempt)
+        await _deliver(bot, job.payload, answer)
 
-        # 4. Text only
-        if message.text:
-            logging.info("Processing text message")
-            response = await query_text(message.text)
-            logging.info(f"Response: {response}")
-            await message.reply_text(escape_markdown_v2(response), parse_mode="MarkdownV2")
-            return
 
-        # 5. Unsupported
-        await message.reply_text(escape_markdown_v2("❌ Unsupported message type. Please send text, an image, a document, or an audio message."), parse_mode="MarkdownV2")
-    except Exception as e:
-        logging.error(f"Error in chat_message: {e}")
-        await message.reply_text(escape_markdown_v2("❌ Sorry, something went wrong. Please try again later."), parse_mode="MarkdownV2")
+async def report_dead_job(bot, job: jobs.Job, error: str):
+    """Tell the user when their job ended up in the dead letters"""
+    await _deliver(bot, job.payload, Rendered(FAILED_TEXT))
+
+
+async def _answer_text(message):
+    logger.debug("Processing text message")
+    history = _history(message.chat_id)
+    if RAG_STREAMING:
+        await stream_answer(message, message.text, history)
+        return
+    response = await query_text(message.text, history)
+    logger.debug("Response: %s", response)
+    _remember(message.chat_id, message.text, response)
+    with span("render"):
+        answer = render_markdown(response)
+    await _reply(message, answer)
+
+
+# ----- Per-modality handlers, each registered with its own filter ----- #
+async def text_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle plain text questions; short ones get priority in the text pool"""
+    await _run(update, context, "text", _answer_text, text_priority(update.message.text))
+
+
+async def photo_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle photos (with optional caption) as a durable job, or inline in the file pool"""
+    if jobs.runner is not None:
+        await _submit(update, "file", _photo_job)
+    else:
+        await _run(update, context, "file", _answer_photo)
+
+
+async def document_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle documents (with optional caption) as a durable job, or inline in the file pool"""
+    if jobs.runner is not None:
+        await _submit(update, "file", _document_job)
+    else:
+        await _run(update, context, "file", _answer_document)
+
+
+async def voice_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle voice notes and audio files as a durable job, or inline in the speech pool"""
+    if jobs.runner is not None:
+        await _submit(update, "speech", _speech_job)
+    else:
+        await _run(update, context, "speech", _answer_speech)
+
+
+async def chat_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle incoming chat messages (text, voice, audio, photos, documents)"""
+    message = update.message
+    if message.voice or message.audio:
+        await voice_message(update, context)
+    elif message.photo:
+        await photo_message(update, context)
+    elif message.document:
+        await document_message(update, context)
+    elif message.text:
+        await text_message(update, context)
+    else:
+        await message.reply_text("❌ Unsupported message type. Please send text, an image, a document, or an audio message.")
@@ -1,14 +1,31 @@
 import logging
 import asyncio
+import secrets
+import sys
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters
 
-from .config import get_bot_token
-from .handlers.start import start_command
-from .handlers.menu import menu_command
-from .handlers.callbacks import button_callback, show_main_menu
-from .handlers.chat import chat_message
+from .config import (
+    get_bot_token, BOT_CONCURRENT_UPDATES, BOT_MAX_PENDING_UPDATES,
+    TG_RATE_LIMIT_ENABLED, TG_RATE_GLOBAL, TG_RATE_PER_CHAT, TG_RATE_GROUP_PER_MINUTE,
+    TG_RATE_CHAT_BURST, TG_MAX_RETRIES,
+    BOT_MODE, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_MAX_CONNECTIONS,
+    BOT_SHARDS, SHARD_QUEUE_SIZE, TELEGRAM_API_BASE,
+    JOB_QUEUE_ENABLED, JOB_QUEUE_PATH, JOB_FILE_WORKERS, JOB_SPEECH_WORKERS,
+    JOB_VISIBILITY_TIMEOUT, JOB_MAX_ATTEMPTS, JOB_RETRY_DELAY, BOT_COMMANDS_STATE_PATH,
+    PERSISTENCE_PATH, PERSISTENCE_UPDATE_INTERVAL, PERSISTENCE_FLUSH_DELAY, METRICS_HOST, METRICS_PORT, TRACE_EXPORT_PATH,
+)
 from .utils.logger import setup_logger
-from bot.services.rag_api import query_text
+from .utils.update_processor import PerChatUpdateProcessor
+from .utils.rate_limiter import PriorityRateLimiter
+from .utils.startup import lazy_callback, profile_startup, push_commands_if_changed
+from .utils import metrics
+from .utils.tracing import tracer
+from bot.services.rag_api import init_client, close_client
+from bot.services.uploads import close_download_client
+from bot.services import jobs
+from bot.services.media import media
+from bot.services.persistence import SQLitePersistence
+from bot.services.jobs import JobRunner, JobStore
 
 
 # --- /help command handler --- #
@@ -27,22 +44,141 @@ async def help_command(update, context):
     await update.message.reply_html(text)
 
 
+BOT_COMMANDS = (
+    ("start", "🚀 Start the bot and open the main menu"),
+    ("help", "❓ Get help, tips, and guides"),
+    ("menu", "📋 Show navigation options"),
+)
+
+
 async def set_bot_commands(app):
-    """Set bot command descriptions"""
-    commands = [
-        ("start", "🚀 Start the bot and open the main menu"),
-        ("help", "❓ Get help, tips, and guides"),
-        ("menu", "📋 Show navigation options"),
-    ]
-    await app.bot.set_my_commands(commands)
-    logging.info("Bot commands set successfully")
+    """Set bot command descriptions, once and only when they changed since the last push"""
+    if app.bot_data.get("shard", 0) != 0:
+        return
+    if await push_commands_if_changed(app.bot, BOT_COMMANDS, BOT_COMMANDS_STATE_PATH):
+        logging.info("Bot commands set successfully")
 
 
-def main():
-    setup_logger()
-    logging.info("Starting Telegram bot...")
-    token = get_bot_token()
-    app = Application.builder().token(token).build()
+async def open_rag_client(app):
+    await init_client()
+
+
+async def preload_media(app):
+    """Read the local copies of the usage screen images, the only images the bot sends"""
+    from .handlers.menu import USAGE_SCREENS
+    media.preload(media.asset_name(photo) for photo, _ in USAGE_SCREENS.values() if photo)
+
+
+async def start_job_workers(app):
+    """Start the durable file/speech job workers; chat handlers load on the first job"""
+    if not JOB_QUEUE_ENABLED:
+        return
+    store = JobStore(
+        jobs.shard_path(JOB_QUEUE_PATH, app.bot_data.get("shard")),
+        visibility_timeout=JOB_VISIBILITY_TIMEOUT,
+        max_attempts=JOB_MAX_ATTEMPTS,
+    )
+    run_job = lazy_callback("bot.handlers.chat:run_job")
+    report_dead_job = lazy_callback("bot.handlers.chat:report_dead_job")
+
+    async def run(job):
+        await run_job(app.bot, job)
+
+    async def on_dead(job, error):
+        await report_dead_job(app.bot, job, error)
+
+    jobs.runner = JobRunner(
+        store,
+        {"file": run, "speech": run},
+        {"file": JOB_FILE_WORKERS, "speech": JOB_SPEECH_WORKERS},
+        on_dead=on_dead,
+        retry_delay=JOB_RETRY_DELAY,
+    )
+    jobs.runner.start()
+
+
+async def start_metrics(app):
+    """Serve /metrics locally; each shard on its own port"""
+    if METRICS_PORT > 0:
+        await metrics.start_server(METRICS_HOST, METRICS_PORT + app.bot_data.get("shard", 0))
+
+
+# (label, step, needs the Bot API) run in order by post_init; --startup-profile times each
+STARTUP_STEPS = (
+    ("metrics endpoint", start_metrics, False),
+    ("RAG connection pool", open_rag_client, False),
+    ("menu image preload", preload_media, False),
+    ("job queue", start_job_workers, False),
+    ("bot commands", set_bot_commands, True),
+)
+
+
+async def on_startup(app):
+    """Application.post_init: serve metrics, open the RAG pool, load menu images, start job workers, push commands"""
+    for _, step, _ in STARTUP_STEPS:
+        await step(app)
+
+
+async def on_stop(app):
+    """Application.post_stop: stop the job workers; unfinished jobs resume on next start"""
+    if jobs.runner is not None:
+        runner, jobs.runner = jobs.runner, None
+        await runner.stop()
+        runner.store.close()
+
+
+async def on_shutdown(app):
+    """Application.post_shutdown: close the RAG and download connection pools, the persistence and trace files and /metrics"""
+    await close_client()
+    await close_download_client()
+    if isinstance(app.persistence, SQLitePersistence):
+        app.persistence.close()
+    await metrics.stop_server()
+    tracer.close()
+
+
+def build_application(token: str, updater: bool = True, shard: int = 0, shards: int = 1) -> Application:
+    """Build the Application with all handlers; sharded workers get no Updater of their own"""
+    builder = (
+        Application.builder()
+        .token(token)
+        .base_url(f"{TELEGRAM_API_BASE}/bot")
+        .base_file_url(f"{TELEGRAM_API_BASE}/file/bot")
+        .post_init(on_startup)
+        .post_stop(on_stop)
+        .post_shutdown(on_shutdown)
+    )
+    if PERSISTENCE_PATH:
+        # user_data / chat_data survive restarts; each chat's data is read on its first update.
+        # Each shard owns its own file, so two processes never overwrite each other's entries
+        builder.persistence(SQLitePersistence(
+            jobs.shard_path(PERSISTENCE_PATH, shard if shards > 1 else None),
+            update_interval=PERSISTENCE_UPDATE_INTERVAL, flush_delay=PERSISTENCE_FLUSH_DELAY,
+        ))
+    if not updater:
+        # Updates arrive through our own HTTP server or the shard ingress, no getUpdates loop needed
+        builder.updater(None)
+    if BOT_CONCURRENT_UPDATES > 1:
+        # Different chats run in parallel, updates of one chat stay in order
+        builder.concurrent_updates(PerChatUpdateProcessor(BOT_CONCURRENT_UPDATES, BOT_MAX_PENDING_UPDATES))
+    if TG_RATE_LIMIT_ENABLED:
+        # Every outbound Bot API call is paced against Telegram's flood limits; shards split the global budget
+        builder.rate_limiter(PriorityRateLimiter(
+            global_rate=TG_RATE_GLOBAL / shards,
+            per_chat=TG_RATE_PER_CHAT,
+            group_per_minute=TG_RATE_GROUP_PER_MINUTE,
+            burst=TG_RATE_CHAT_BURST,
+            max_retries=TG_MAX_RETRIES,
+        ))
+    app = builder.build()
+    if shards > 1:
+        app.bot_data["shard"] = shard
+        if TRACE_EXPORT_PATH:
+            # A rotating file must have a single writer: traces-shard2.jsonl, ...
+            tracer.path = jobs.shard_path(TRACE_EXPORT_PATH, shard)
+
+    # Handler modules are imported on their first update, not at startup
+    start_command = lazy_callback("bot.handlers.start:start_command")
 
     # Register command handlers
     app.add_handler(CommandHandler("start", start_command))
@@ -50,20 +186,66 @@ def main():
     app.add_handler(CommandHandler("menu", start_command))  # /menu shows main menu
 
     # Register callback query handler for inline keyboards
-    app.add_handler(CallbackQueryHandler(button_callback))
+    app.add_handler(CallbackQueryHandler(lazy_callback("bot.handlers.callbacks:button_callback")))
+
+    # Register one message handler per modality (text, photos, documents, voice/audio),
+    # each served by its own worker pool
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, lazy_callback("bot.handlers.chat:text_message")))
+    app.add_handler(MessageHandler(filters.PHOTO, lazy_callback("bot.handlers.chat:photo_message")))
+    app.add_handler(MessageHandler(filters.Document.ALL, lazy_callback("bot.handlers.chat:document_message")))
+    app.add_handler(MessageHandler(filters.VOICE | filters.AUDIO, lazy_callback("bot.handlers.chat:voice_message")))
+    return app
+
+
+def run_shard_worker(index: int, queue, shards: int):
+    """Entry point of one sharded worker process"""
+    from .utils.sharding import serve_shard
+
+    setup_logger()
+    app = build_application(get_bot_token(), updater=False, shard=index, shards=shards)
+    logging.info(f"Shard {index}/{shards} is serving updates...")
+    asyncio.run(serve_shard(app, queue))
+
+
+def main():
+    if "--startup-profile" in sys.argv[1:]:
+        print(profile_startup(build_application, STARTUP_STEPS, (on_stop, on_shutdown)))
+        return
+    setup_logger()
+    logging.info("Starting Telegram bot...")
+    token = get_bot_token()
+    if BOT_MODE not in ("polling", "webhook"):
+        raise ValueError(f"BOT_MODE must be 'polling' or 'webhook', not '{BOT_MODE}'")
+    if BOT_MODE == "webhook" and not WEBHOOK_URL:
+        raise ValueError("WEBHOOK_URL not set in environment variables.")
+    secret = WEBHOOK_SECRET or secrets.token_urlsafe(32)
+
+    if BOT_SHARDS > 1:
+        from .utils.sharding import run_sharded
+
+        logging.info(f"Bot is running {BOT_SHARDS} shards ({BOT_MODE})...")
+        asyncio.run(run_sharded(
+            token, BOT_SHARDS, run_shard_worker, TELEGRAM_API_BASE,
+            mode=BOT_MODE, queue_size=SHARD_QUEUE_SIZE,
+            webhook_url=WEBHOOK_URL, webhook_path=WEBHOOK_PATH, webhook_secret=secret,
+            host=WEBHOOK_HOST, port=WEBHOOK_PORT, max_connections=WEBHOOK_MAX_CONNECTIONS,
+        ))
+        return
 
-    # Register message handler for regular chat (text, audio, voice, documents)
-    app.add_handler(MessageHandler(
-        (filters.TEXT | filters.VOICE | filters.AUDIO | filters.Document.ALL) & ~filters.COMMAND,
-        chat_message
-    ))
+    app = build_application(token, updater=BOT_MODE == "polling")
+    if BOT_MODE == "webhook":
+        from .utils.webhook import run_webhook
 
-    # Set bot commands
-    app.job_queue.run_once(lambda context: set_bot_commands(app), when=1)
+        logging.info("Bot is serving webhook updates...")
+        asyncio.run(run_webhook(
+            app, WEBHOOK_URL, WEBHOOK_PATH, secret,
+            host=WEBHOOK_HOST, port=WEBHOOK_PORT, max_connections=WEBHOOK_MAX_CONNECTIONS,
+        ))
+        return
 
     logging.info("Bot is polling...")
     app.run_polling()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -0,0 +1,284 @@
+"""
+In-process and on-disk caches for RAG answers
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+# Zero-width characters that Burmese keyboards (and copy/paste) scatter through text
+_ZERO_WIDTH = dict.fromkeys(map(ord, "\u200b\u200c\u200d\u2060\ufeff"))
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a user question for cache lookups.
+
+    Applies NFKC (so composed/decomposed Burmese and full-width forms compare equal),
+    strips zero-width characters, case-folds, turns every punctuation character
+    (including Burmese ၊ and ။) into a space and collapses whitespace.
+    """
+    text = unicodedata.normalize("NFKC", query).translate(_ZERO_WIDTH).casefold()
+    text = "".join(" " if unicodedata.category(ch).startswith("P") else ch for ch in text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def _default_sizeof(key: Hashable, value: Any) -> int:
+    return sys.getsizeof(key) + sys.getsizeof(value)
+
+
+class LRUCache:
+    """
+    Least-recently-used cache with a per-entry TTL and entry/memory caps.
+
+    `max_bytes` is enforced against the estimate returned by `sizeof(key, value)`;
+    the default uses `sys.getsizeof`, which is exact enough for the string answers we store.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 16 * 1024 * 1024,
+        ttl: float = 3600.0,
+        sizeof: Callable[[Hashable, Any], int] = _default_sizeof,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._sizeof = sizeof
+        # key -> (expires_at, size, value)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        if entry[0] <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        size = self._sizeof(key, value)
+        if size > self.max_bytes:
+            return
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), size, value)
+        self.bytes += size
+        while len(self._data) > self.max_entries or self.bytes > self.max_bytes:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        self._remove(key)
+        return entry[2]
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.bytes = 0
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._data.pop(key)
+        self.bytes -= size
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._data),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class DiskResultStore:
+    """
+    SQLite-backed JSON store that keeps cached results across restarts.
+
+    Runs in WAL mode so several bot processes can share one file. Entries expire after
+    `ttl` seconds, and the least recently used entries are deleted once the stored JSON
+    exceeds `max_bytes`, down to `low_water` of it so eviction runs in batches.
+
+    `bytes` is a running total, summed once at open and kept up to date on every write
+    and delete, so a write does not scan the table. It only counts this process's
+    writes: when it crosses `max_bytes` it is summed again before evicting, which picks
+    up what other processes sharing the file wrote.
+
+    The methods block on disk I/O; FileResultCache calls them on a worker thread.
+    """
+
+    def __init__(
+        self, path: str, max_bytes: int = 256 * 1024 * 1024, ttl: float = 7 * 86400.0, low_water: float = 0.9
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.low_water = low_water
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " expires REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results(accessed)")
+        # One connection, used from several worker threads; also guards `bytes`
+        self._lock = threading.Lock()
+        self.bytes = self._total()
+        self.evictions = 0
+
+    def _total(self) -> int:
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def get(self, key: str) -> Any:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, size, expires FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[2] <= now:
+                if self._db.execute("DELETE FROM results WHERE key = ?", (key,)).rowcount:
+                    self.bytes -= row[1]
+                return None
+            self._db.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        data = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            old = self._db.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT INTO results (key, value, size, expires, accessed) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size,"
+                " expires = excluded.expires, accessed = excluded.accessed",
+                (key, data, len(data), now + self.ttl, now),
+            )
+            self.bytes += len(data) - (old[0] if old else 0)
+            if self.bytes > self.max_bytes:
+                self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        """Delete expired, then least recently used entries down to `low_water` of `max_bytes`"""
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            self._db.execute("DELETE FROM results WHERE expires <= ?", (now,))
+            total = self._total()
+            target = int(self.max_bytes * self.low_water)
+            doomed = []
+            if total > target:
+                excess = total - target
+                freed = 0
+                for key, size in self._db.execute("SELECT key, size FROM results ORDER BY accessed"):
+                    doomed.append((key,))
+                    freed += size
+                    if freed >= excess:
+                        break
+                total -= freed
+                self._db.executemany("DELETE FROM results WHERE key = ?", doomed)
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self.bytes = total
+        self.evictions += len(doomed)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class FileResultCache:
+    """
+    Results of /file and /speech calls, addressed by what was sent.
+
+    Each result is stored under two keys: Telegram's file_unique_id (known before
+    anything is downloaded, so repeat forwards skip getFile, download and upload) and
+    the SHA-256 of the content (catches the same bytes re-sent under another id).
+    Both are combined with the kind of call and the normalized caption query. A memory
+    LRU sits in front of the optional on-disk tier, which is read and written on a
+    worker thread so SQLite never blocks the event loop.
+    """
+
+    def __init__(self, memory: LRUCache, disk: Optional[DiskResultStore] = None):
+        self.memory = memory
+        self.disk = disk
+
+    @staticmethod
+    def _key(kind: str, ident: str, query: str) -> str:
+        return f"{kind}:{ident}:{normalize_query(query)}"
+
+    async def _get(self, key: str) -> Any:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            try:
+                value = await asyncio.get_running_loop().run_in_executor(None, self.disk.get, key)
+            except sqlite3.Error as e:
+                logging.error(f"File result store read failed: {e}")
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    async def get(self, kind: str, file_unique_id: str, query: str = "") -> Any:
+        return await self._get(self._key(kind, file_unique_id, query))
+
+    async def get_by_digest(self, kind: str, digest: str, query: str = "") -> Any:
+        return await self._get(self._key(kind, "sha256=" + digest, query))
+
+    async def set(self, kind: str, file_unique_id: Optional[str], digest: Optional[str], query: str, value: Any) -> None:
+        keys = []
+        if file_unique_id:
+            keys.append(self._key(kind, file_unique_id, query))
+        if digest:
+            keys.append(self._key(kind, "sha256=" + digest, query))
+        for key in keys:
+            self.memory.set(key, value)
+        if self.disk is not None and keys:
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self._write, keys, value)
+            except sqlite3.Error as e:
+                logging.error(f"File result store write failed: {e}")
+
+    def _write(self, keys: list, value: Any) -> None:
+        for key in keys:
+            self.disk.set(key, value)
+
+    def stats(self) -> dict:
+        return self.memory.stats()
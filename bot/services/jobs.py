@@ -0,0 +1,274 @@
+"""
+Durable queue for long-running file and speech jobs
+
+A job is written to SQLite before the user is told it is being processed, so it
+survives a restart or crash of the bot. Only Telegram file ids are stored, never the
+file itself; the worker fetches the file when it runs the job.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+DEAD = "dead"
+
+
+class RetryableJobError(Exception):
+    """Raised by a job handler for a transient failure (backend busy or down): the job runs again later"""
+
+
+class Job:
+    __slots__ = ("id", "kind", "payload", "attempts", "max_attempts")
+
+    def __init__(self, id: int, kind: str, payload: dict, attempts: int, max_attempts: int = 1):
+        self.id = id
+        self.kind = kind
+        self.payload = payload
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+
+    @property
+    def last_attempt(self) -> bool:
+        return self.attempts >= self.max_attempts
+
+
+class JobStore:
+    """
+    SQLite (WAL) table of jobs with at-least-once delivery.
+
+    `claim` hands out the oldest visible job of a kind and hides it for
+    `visibility_timeout` seconds. A job that is neither completed nor failed within that
+    time (the worker crashed, the process was killed) becomes visible again and is run
+    once more; a worker that is still busy with a job keeps it hidden with `extend`.
+    Jobs that fail `max_attempts` times move to the dead-letter list.
+    """
+
+    def __init__(self, path: str, visibility_timeout: float = 180.0, max_attempts: int = 3):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, payload TEXT NOT NULL,"
+            " status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, visible_at REAL NOT NULL,"
+            " created REAL NOT NULL, error TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs(kind, status, visible_at)")
+
+    def enqueue(self, kind: str, payload: dict) -> int:
+        now = time.time()
+        cursor = self._db.execute(
+            "INSERT INTO jobs (kind, payload, status, visible_at, created) VALUES (?, ?, ?, ?, ?)",
+            (kind, json.dumps(payload, ensure_ascii=False), PENDING, now, now),
+        )
+        return cursor.lastrowid
+
+    def claim(self, kind: str) -> Optional[Job]:
+        now = time.time()
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._db.execute(
+                "SELECT id, payload, attempts FROM jobs WHERE kind = ? AND status IN (?, ?) AND visible_at <= ?"
+                " ORDER BY visible_at, id LIMIT 1",
+                (kind, PENDING, RUNNING, now),
+            ).fetchone()
+            if row is None:
+                self._db.execute("COMMIT")
+                return None
+            job_id, payload, attempts = row
+            if attempts >= self.max_attempts:
+                # Its last run never reported back: the process died while running it
+                self._db.execute(
+                    "UPDATE jobs SET status = ?, error = ? WHERE id = ?", (DEAD, "visibility timeout", job_id)
+                )
+                self._db.execute("COMMIT")
+                logger.error(f"Job {job_id} ({kind}) moved to dead letters after {attempts} attempts")
+                return self.claim(kind)
+            self._db.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, visible_at = ? WHERE id = ?",
+                (RUNNING, now + self.visibility_timeout, job_id),
+            )
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        return Job(job_id, kind, json.loads(payload), attempts + 1, self.max_attempts)
+
+    def extend(self, job: Job) -> None:
+        """Renew the lease of a job that is still running, so it is not handed out again meanwhile"""
+        self._db.execute(
+            "UPDATE jobs SET visible_at = ? WHERE id = ? AND status = ?",
+            (time.time() + self.visibility_timeout, job.id, RUNNING),
+        )
+
+    def complete(self, job: Job) -> None:
+        self._db.execute("DELETE FROM jobs WHERE id = ?", (job.id,))
+
+    def fail(self, job: Job, error: str, retry_delay: float = 10.0) -> bool:
+        """Record a failed run; returns True if the job was moved to the dead letters"""
+        dead = job.attempts >= self.max_attempts
+        self._db.execute(
+            "UPDATE jobs SET status = ?, visible_at = ?, error = ? WHERE id = ?",
+            (DEAD if dead else PENDING, time.time() + retry_delay * job.attempts, error, job.id),
+        )
+        return dead
+
+    def release_running(self) -> int:
+        """Make jobs left running by a previous run of this process visible again at once"""
+        return self._db.execute(
+            "UPDATE jobs SET status = ?, visible_at = ? WHERE status = ?", (PENDING, time.time(), RUNNING)
+        ).rowcount
+
+    def dead_letters(self, limit: int = 100) -> List[dict]:
+        rows = self._db.execute(
+            "SELECT id, kind, payload, attempts, created, error FROM jobs WHERE status = ? ORDER BY id LIMIT ?",
+            (DEAD, limit),
+        ).fetchall()
+        return [
+            {"id": r[0], "kind": r[1], "payload": json.loads(r[2]), "attempts": r[3], "created": r[4], "error": r[5]}
+            for r in rows
+        ]
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def close(self) -> None:
+        self._db.close()
+
+
+JobHandler = Callable[[Job], Awaitable[None]]
+
+
+class JobRunner:
+    """
+    Worker tasks that drain a JobStore, `workers[kind]` of them per kind of job.
+
+    Workers are independent of the update dispatcher: the handler only enqueues a job
+    and returns. A handler that raises is retried with a growing delay; after the last
+    attempt `on_dead(job, error)` is called so the user can be told. While a handler
+    runs, the job's lease is renewed every third of the visibility timeout.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        handlers: Dict[str, JobHandler],
+        workers: Dict[str, int],
+        on_dead: Optional[Callable[[Job, str], Awaitable[None]]] = None,
+        poll_interval: float = 1.0,
+        retry_delay: float = 10.0,
+    ):
+        self.store = store
+        self.handlers = handlers
+        self.workers = workers
+        self.on_dead = on_dead
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.completed = 0
+        self.failed = 0
+        self._wakeup: Dict[str, asyncio.Event] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        released = self.store.release_running()
+        if released:
+            logger.info(f"Resuming {released} jobs interrupted by the last shutdown")
+        for kind, count in self.workers.items():
+            self._wakeup[kind] = asyncio.Event()
+            for i in range(count):
+                self._tasks.append(asyncio.create_task(self._work(kind), name=f"job-{kind}-{i}"))
+
+    async def stop(self) -> None:
+        """Stop the workers; jobs they were running stay in the store and run on next start"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def submit(self, kind: str, payload: dict) -> int:
+        job_id = self.store.enqueue(kind, payload)
+        event = self._wakeup.get(kind)
+        if event is not None:
+            event.set()
+        return job_id
+
+    async def _work(self, kind: str) -> None:
+        wakeup = self._wakeup[kind]
+        while True:
+            try:
+                job = self.store.claim(kind)
+            except sqlite3.Error as e:
+                logger.error(f"Job store claim failed: {e}")
+                job = None
+            if job is None:
+                wakeup.clear()
+                try:
+                    await asyncio.wait_for(wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._execute(job)
+
+    async def _heartbeat(self, job: Job) -> None:
+        while True:
+            await asyncio.sleep(self.store.visibility_timeout / 3)
+            try:
+                self.store.extend(job)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not extend the lease of job {job.id}: {e}")
+
+    async def _execute(self, job: Job) -> None:
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            await self.handlers[job.kind](job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            error = f"{type(e).__name__}: {e}"
+            log = logger.warning if isinstance(e, RetryableJobError) else logger.error
+            log(f"Job {job.id} ({job.kind}) attempt {job.attempts} failed: {error}")
+            if self.store.fail(job, error, self.retry_delay) and self.on_dead is not None:
+                logger.error(f"Job {job.id} ({job.kind}) moved to dead letters")
+                try:
+                    await self.on_dead(job, error)
+                except Exception as notify_error:
+                    logger.error(f"Could not report dead job {job.id}: {notify_error}")
+            return
+        finally:
+            heartbeat.cancel()
+        self.completed += 1
+        self.store.complete(job)
+
+    def stats(self) -> dict:
+        return {"completed": self.completed, "failed": self.failed, **self.store.counts()}
+
+
+def shard_path(path: str, shard: Optional[int]) -> str:
+    """Each shard process keeps its own queue file: jobs.sqlite3 -> jobs-shard2.sqlite3"""
+    if shard is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}-shard{shard}{ext}"
+
+
+# Started by the application's post_init when JOB_QUEUE_ENABLED; None means jobs run inline
+runner: Optional[JobRunner] = None
@@ -0,0 +1,162 @@
+"""
+Adaptive concurrency limiter for outbound RAG calls
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LimiterShedError(Exception):
+    """Raised when a call could not get a slot within the bounded queue wait"""
+
+
+class Slot:
+    """One admitted call; mark it overloaded when the backend signalled saturation"""
+
+    __slots__ = ("started", "overloaded", "latency")
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.overloaded = False
+        self.latency: Optional[float] = None
+
+    def sample(self) -> None:
+        """Take the latency sample now rather than on exit, e.g. once a streamed reply has started"""
+        if self.latency is None:
+            self.latency = time.monotonic() - self.started
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit that follows the latency the backend actually delivers.
+
+    Latency is compared with a baseline: the fastest call seen in the previous
+    `window` seconds. A call slower than `tolerance` x baseline, or one marked
+    overloaded (timeout, 429/503), shrinks the limit multiplicatively by `backoff`,
+    at most once per baseline period so one burst of slow replies is not punished
+    many times over. Fast calls grow it additively by 1/limit, i.e. about +1 per
+    round of calls, but only while the limit is actually being used.
+
+    Calls over the limit wait in a FIFO queue of at most `max_queue` entries for up to
+    `max_wait` seconds; anything beyond that is shed with LimiterShedError.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 128,
+        tolerance: float = 2.0,
+        backoff: float = 0.8,
+        window: float = 30.0,
+        max_queue: int = 64,
+        max_wait: float = 10.0,
+    ):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.window = window
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.in_flight = 0
+        self.shed = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._baseline: Optional[float] = None
+        self._window_min = float("inf")
+        self._window_start = time.monotonic()
+        self._last_decrease = 0.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.shed += 1
+            raise LimiterShedError(f"limiter '{self.name}' queue full")
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_wait)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            self.shed += 1
+            raise LimiterShedError(f"limiter '{self.name}' wait exceeded {self.max_wait}s")
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        if waiter.done() and not waiter.cancelled():
+            # The slot was handed over just as we gave up: pass it on
+            self._release_slot()
+        else:
+            waiter.cancel()
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+
+    def release(self, latency: Optional[float] = None, overloaded: bool = False) -> None:
+        if latency is not None or overloaded:
+            self._adjust(latency, overloaded)
+        self._release_slot()
+
+    def _release_slot(self) -> None:
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _adjust(self, latency: Optional[float], overloaded: bool) -> None:
+        now = time.monotonic()
+        if latency is not None and self._baseline is None:
+            self._baseline = latency
+        congested = overloaded or (latency is not None and latency > self._baseline * self.tolerance)
+
+        if latency is not None:
+            self._window_min = min(self._window_min, latency)
+            if now - self._window_start >= self.window:
+                self._baseline = self._window_min
+                self._window_min = float("inf")
+                self._window_start = now
+        if congested:
+            if now - self._last_decrease >= min(self.window, self._baseline or self.window):
+                old = self.limit
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = now
+                if int(old) != int(self.limit):
+                    logger.info(f"Limiter '{self.name}' limit {old:.1f} -> {self.limit:.1f}")
+        elif self.in_flight >= int(self.limit) or self._waiters:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[Slot]:
+        """Hold one slot; latency is sampled on exit (unless the body raised) or when `slot.sample()` is called"""
+        await self.acquire()
+        slot = Slot()
+        try:
+            yield slot
+        except BaseException:
+            self.release(slot.latency, overloaded=slot.overloaded)
+            raise
+        slot.sample()
+        self.release(slot.latency, slot.overloaded)
+
+    def stats(self) -> dict:
+        return {"limit": int(self.limit), "in_flight": self.in_flight, "queued": len(self._waiters), "shed": self.shed}
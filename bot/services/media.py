@@ -0,0 +1,137 @@
+"""
+Registry of the bot's own images (menu pictures) and the Telegram file_ids they got
+
+The first send of an image uploads it, from the local asset directory if the file is
+there and from its URL otherwise, and records the file_id Telegram returns. Every
+later send passes that file_id, so Telegram serves the image from its own storage
+instead of fetching it again. The ids are kept in a small JSON file so they survive
+restarts; an id Telegram no longer accepts is dropped and the image uploaded again.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, Iterable, Optional, Union
+
+from telegram import InputFile, Message
+from telegram.error import BadRequest
+
+from bot.config import MEDIA_ASSET_DIR, MEDIA_CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+
+class MediaRegistry:
+    """
+    Asset name -> file_id, loaded from and saved to `path` (in memory only if empty).
+
+    The images the bot sends are read from `asset_dir` into memory by `preload` so an
+    upload never waits on the disk. Shard processes share the file; each writes it whole with an atomic
+    rename, so at worst an id another shard just learned is lost and that image is
+    uploaded once more.
+    """
+
+    def __init__(self, path: str = "", asset_dir: str = ""):
+        self.path = path
+        self.asset_dir = asset_dir
+        self.uploads = 0
+        self.reused = 0
+        self._ids: Dict[str, str] = {}
+        self._assets: Dict[str, bytes] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable media id file {self.path}: {e}")
+            return
+        if isinstance(data, dict):
+            self._ids = {k: v for k, v in data.items() if isinstance(k, str) and isinstance(v, str)}
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._ids, f, ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save media ids to {self.path}: {e}")
+
+    @staticmethod
+    def asset_name(url: str) -> str:
+        """Local name of the image at `url`: the last part of the URL"""
+        return url.rsplit("/", 1)[-1]
+
+    def preload(self, names: Iterable[str]) -> int:
+        """Read the named files of the asset directory into memory, skipping missing ones; returns how many were read"""
+        if not self.asset_dir:
+            return 0
+        for name in names:
+            file_path = os.path.join(self.asset_dir, name)
+            if os.path.isfile(file_path):
+                with open(file_path, "rb") as f:
+                    self._assets[name] = f.read()
+        return len(self._assets)
+
+    def file_id(self, name: str) -> Optional[str]:
+        return self._ids.get(name)
+
+    def remember(self, name: str, file_id: str) -> None:
+        if self._ids.get(name) != file_id:
+            self._ids[name] = file_id
+            self._save()
+
+    def forget(self, name: str) -> None:
+        if self._ids.pop(name, None) is not None:
+            self._save()
+
+    def _upload_source(self, name: str, url: str) -> Union[InputFile, str]:
+        data = self._assets.get(name)
+        if data is not None:
+            return InputFile(data, filename=name)
+        return url
+
+    async def send_photo(self, message: Message, url: str, name: Optional[str] = None, **kwargs) -> Message:
+        """
+        Reply to `message` with the image at `url`, known locally as `name` (by default
+        the last part of the URL). Extra keyword arguments go to reply_photo.
+        """
+        name = name or self.asset_name(url)
+        file_id = self._ids.get(name)
+        if file_id is not None:
+            try:
+                sent = await message.reply_photo(photo=file_id, **kwargs)
+                self.reused += 1
+                return sent
+            except BadRequest as e:
+                # e.g. the bot token changed or Telegram dropped the file
+                logger.warning(f"Stored file_id of {name} was rejected ({e}), uploading it again")
+                self.forget(name)
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            file_id = self._ids.get(name)
+            if file_id is not None:
+                # Another click uploaded it while this one waited
+                return await message.reply_photo(photo=file_id, **kwargs)
+            sent = await message.reply_photo(photo=self._upload_source(name, url), **kwargs)
+            self.uploads += 1
+            if sent is not None and sent.photo:
+                self.remember(name, sent.photo[-1].file_id)
+            return sent
+
+    def stats(self) -> dict:
+        return {"known": len(self._ids), "preloaded": len(self._assets), "uploads": self.uploads, "reused": self.reused}
+
+
+media = MediaRegistry(MEDIA_CACHE_PATH, MEDIA_ASSET_DIR)
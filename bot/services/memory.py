@@ -0,0 +1,133 @@
+"""
+Per-chat conversation memory sent along with RAG requests
+
+Each chat keeps a ring of its last few turns so follow-up questions ("and what about
+PDPA?") reach the backend with the context they refer to. Memory is bounded three
+ways: turns per chat, idle time per chat and bytes across all chats.
+"""
+
+import sys
+from collections import deque
+from typing import Deque, Dict, Hashable, List, Optional
+
+from bot.config import (
+    CONVERSATION_MAX_BYTES,
+    CONVERSATION_MAX_CHATS,
+    CONVERSATION_MAX_TURN_CHARS,
+    CONVERSATION_MAX_TURNS,
+    CONVERSATION_MEMORY_ENABLED,
+    CONVERSATION_TOKEN_BUDGET,
+    CONVERSATION_TTL,
+)
+from bot.services.cache import LRUCache
+
+USER = sys.intern("user")
+ASSISTANT = sys.intern("assistant")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count: a third of the UTF-8 length. About right for Burmese, where a
+    character is 3 bytes and close to one token; generous for English (~4 chars/token).
+    """
+    return (len(text.encode("utf-8")) + 2) // 3
+
+
+class Turn:
+    __slots__ = ("role", "text", "tokens", "size")
+
+    def __init__(self, role: str, text: str):
+        self.role = sys.intern(role)
+        self.text = text
+        self.tokens = estimate_tokens(text)
+        self.size = sys.getsizeof(text) + 72
+
+
+class Conversation:
+    """Ring of the last `max_turns` turns of one chat and their total size in bytes"""
+
+    __slots__ = ("turns", "size")
+
+    def __init__(self, max_turns: int):
+        self.turns: Deque[Turn] = deque(maxlen=max_turns)
+        self.size = 200
+
+    def append(self, turn: Turn) -> None:
+        if len(self.turns) == self.turns.maxlen:
+            self.size -= self.turns[0].size
+        self.turns.append(turn)
+        self.size += turn.size
+
+
+class ConversationMemory:
+    """
+    Conversations by chat id in an LRU with a TTL.
+
+    A chat's TTL restarts with each turn, so idle chats expire while active ones stay.
+    When `max_chats` or `max_bytes` is reached the least recently active chats are
+    dropped. `history` returns the newest turns that fit into `token_budget`.
+    """
+
+    def __init__(
+        self,
+        max_turns: int = 6,
+        token_budget: int = 1000,
+        max_turn_chars: int = 2000,
+        ttl: float = 1800.0,
+        max_chats: int = 20000,
+        max_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.max_turn_chars = max_turn_chars
+        self._chats = LRUCache(max_chats, max_bytes, ttl, sizeof=lambda key, conversation: conversation.size)
+
+    def add(self, chat_id: Hashable, role: str, text: str) -> None:
+        text = text.strip()
+        if not text:
+            return
+        if len(text) > self.max_turn_chars:
+            text = text[:self.max_turn_chars - 1] + "…"
+        conversation = self._chats.get(chat_id)
+        if conversation is None:
+            conversation = Conversation(self.max_turns)
+        conversation.append(Turn(role, text))
+        # Setting it again re-measures its size and restarts its TTL
+        self._chats.set(chat_id, conversation)
+
+    def record(self, chat_id: Hashable, question: str, answer: str) -> None:
+        """Remember one question and the answer it got"""
+        self.add(chat_id, USER, question)
+        self.add(chat_id, ASSISTANT, answer)
+
+    def history(self, chat_id: Hashable) -> List[Dict[str, str]]:
+        """Earlier turns, oldest first, as [{"role": ..., "content": ...}] within the token budget"""
+        conversation = self._chats.get(chat_id)
+        if conversation is None:
+            return []
+        picked = []
+        budget = self.token_budget
+        for turn in reversed(conversation.turns):
+            if turn.tokens > budget:
+                break
+            budget -= turn.tokens
+            picked.append({"role": turn.role, "content": turn.text})
+        picked.reverse()
+        return picked
+
+    def forget(self, chat_id: Hashable) -> None:
+        self._chats.pop(chat_id)
+
+    def stats(self) -> dict:
+        return self._chats.stats()
+
+
+# None when CONVERSATION_MEMORY_ENABLED is off
+conversations: Optional[ConversationMemory] = ConversationMemory(
+    max_turns=CONVERSATION_MAX_TURNS,
+    token_budget=CONVERSATION_TOKEN_BUDGET,
+    max_turn_chars=CONVERSATION_MAX_TURN_CHARS,
+    ttl=CONVERSATION_TTL,
+    max_chats=CONVERSATION_MAX_CHATS,
+    max_bytes=CONVERSATION_MAX_BYTES,
+) if CONVERSATION_MEMORY_ENABLED else None
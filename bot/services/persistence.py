@@ -0,0 +1,237 @@
+"""
+SQLite persistence for user_data, chat_data and conversation states
+
+Unlike PicklePersistence, which rewrites one file with everything on each save, this
+writes only the entries that changed, as row upserts in one transaction, and reads a
+user's or chat's data only when an update for them first arrives.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+logger = logging.getLogger(__name__)
+
+USER = "user"
+CHAT = "chat"
+BOT = "bot"
+CALLBACK = "callback"
+_CONVERSATION = "conversation:"
+
+# Marks a pending delete in the write buffer
+_DELETED = object()
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    db = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=30)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+
+class SQLitePersistence(BasePersistence):
+    """
+    BasePersistence on one SQLite (WAL) table of pickled values keyed by (kind, key).
+
+    - Lazy loading: get_user_data/get_chat_data return nothing at startup; the first
+      refresh_user_data/refresh_chat_data for an id (which PTB calls before handling
+      its update) fills that id's dict from the database.
+    - Dirty tracking: Application.update_persistence hands over every entry touched
+      since its last run; entries whose pickled form did not change are skipped.
+    - Batched flushes: changed entries are buffered and written `flush_delay` seconds
+      after the first of them, in one transaction on a worker thread, so one
+      update_persistence run costs one commit. `flush` writes whatever is left.
+
+    bot_data is not stored by default: the application keeps per-process values in it
+    (the shard index) that must not be replaced from the database.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        store_data: Optional[PersistenceInput] = None,
+        update_interval: float = 60,
+        flush_delay: float = 1.0,
+    ):
+        super().__init__(store_data or PersistenceInput(bot_data=False), update_interval)
+        self.path = path
+        self.flush_delay = flush_delay
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Reads happen on the event loop, writes on a worker thread; WAL lets them overlap
+        self._reader = _connect(path)
+        self._writer = _connect(path)
+        self._reader.execute(
+            "CREATE TABLE IF NOT EXISTS data ("
+            " kind TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, updated REAL NOT NULL,"
+            " PRIMARY KEY (kind, key)) WITHOUT ROWID"
+        )
+        self._write_lock = threading.Lock()
+        self._loaded = {USER: set(), CHAT: set()}
+        # Pickled form last written (or read) per (kind, key), to skip unchanged entries
+        self._digests: Dict[Tuple[str, str], int] = {}
+        self._pending: Dict[Tuple[str, str], Any] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self.loads = 0
+        self.writes = 0
+        self.skipped = 0
+
+    # ----- reading ----- #
+    def _read(self, kind: str, key: str) -> Any:
+        pending = self._pending.get((kind, key))
+        if pending is not None:
+            return None if pending is _DELETED else pickle.loads(pending)
+        row = self._reader.execute("SELECT value FROM data WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+        if row is None:
+            return None
+        self._digests[(kind, key)] = hash(row[0])
+        return pickle.loads(row[0])
+
+    def _refresh(self, kind: str, entity_id: int, data: dict) -> None:
+        loaded = self._loaded[kind]
+        if entity_id in loaded:
+            return
+        loaded.add(entity_id)
+        stored = self._read(kind, str(entity_id))
+        self.loads += 1
+        if stored:
+            # Anything a handler put there before this first refresh wins
+            for name, value in stored.items():
+                data.setdefault(name, value)
+
+    async def get_user_data(self) -> Dict[int, dict]:
+        return {}
+
+    async def get_chat_data(self) -> Dict[int, dict]:
+        return {}
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        self._refresh(USER, user_id, user_data)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        self._refresh(CHAT, chat_id, chat_data)
+
+    async def get_bot_data(self) -> dict:
+        return self._read(BOT, "") or {}
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    async def get_callback_data(self):
+        return self._read(CALLBACK, "")
+
+    async def get_conversations(self, name: str) -> dict:
+        kind = _CONVERSATION + name
+        rows = self._reader.execute("SELECT key, value FROM data WHERE kind = ?", (kind,)).fetchall()
+        conversations = {}
+        for key, value in rows:
+            self._digests[(kind, key)] = hash(value)
+            conversations[tuple(json.loads(key))] = pickle.loads(value)
+        return conversations
+
+    # ----- writing ----- #
+    def _put(self, kind: str, key: str, value: Any) -> None:
+        blob = _DELETED if value is _DELETED else pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        digest = None if blob is _DELETED else hash(blob)
+        if (kind, key) not in self._pending and digest is not None and self._digests.get((kind, key)) == digest:
+            self.skipped += 1
+            return
+        self._pending[(kind, key)] = blob
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self._put(USER, str(user_id), data)
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        self._put(CHAT, str(chat_id), data)
+
+    async def update_bot_data(self, data: dict) -> None:
+        self._put(BOT, "", data)
+
+    async def update_callback_data(self, data) -> None:
+        self._put(CALLBACK, "", data)
+
+    async def update_conversation(self, name: str, key: tuple, new_state: Optional[object]) -> None:
+        self._put(_CONVERSATION + name, json.dumps(list(key)), _DELETED if new_state is None else new_state)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._loaded[USER].discard(user_id)
+        self._put(USER, str(user_id), _DELETED)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._loaded[CHAT].discard(chat_id)
+        self._put(CHAT, str(chat_id), _DELETED)
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_delay)
+        # A write that has begun is finished even if flush() cancels this task
+        await asyncio.shield(self._write_pending())
+
+    async def _write_pending(self) -> None:
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self._write, batch)
+            except sqlite3.Error as e:
+                logger.error(f"Persistence flush of {len(batch)} entries failed: {e}")
+                # Keep them for the next flush unless newer values arrived meanwhile
+                for item, blob in batch.items():
+                    self._pending.setdefault(item, blob)
+                return
+        for (kind, key), blob in batch.items():
+            if blob is _DELETED:
+                self._digests.pop((kind, key), None)
+            else:
+                self._digests[(kind, key)] = hash(blob)
+
+    def _write(self, batch: Dict[Tuple[str, str], Any]) -> None:
+        now = time.time()
+        upserts = [(kind, key, blob, now) for (kind, key), blob in batch.items() if blob is not _DELETED]
+        deletes = [item for item, blob in batch.items() if blob is _DELETED]
+        with self._write_lock:
+            db = self._writer
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.executemany(
+                    "INSERT INTO data (kind, key, value, updated) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT(kind, key) DO UPDATE SET value = excluded.value, updated = excluded.updated",
+                    upserts,
+                )
+                db.executemany("DELETE FROM data WHERE kind = ? AND key = ?", deletes)
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        self.writes += len(batch)
+
+    async def flush(self) -> None:
+        """Write everything still buffered; called by the Application when it shuts down"""
+        # Waits for a write in progress through the flush lock, then writes what is left
+        task, self._flush_task = self._flush_task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await self._write_pending()
+
+    def close(self) -> None:
+        self._reader.close()
+        self._writer.close()
+
+    def stats(self) -> dict:
+        return {"loads": self.loads, "writes": self.writes, "skipped": self.skipped, "pending": len(self._pending)}
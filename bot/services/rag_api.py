@@ -1,72 +1,605 @@
+import asyncio
+import codecs
+import json
 import logging
 import httpx
 import os
+import sys
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Union
+
+from bot.config import (
+    ANSWER_CACHE_ENABLED,
+    ANSWER_CACHE_MAX_BYTES,
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_TTL,
+    RAG_BREAKER_FAILURES,
+    RAG_BREAKER_RESET,
+    RAG_RETRY_ATTEMPTS,
+    RAG_RETRY_BASE_DELAY,
+    RAG_RETRY_MAX_DELAY,
+    FILE_CACHE_DISK_MAX_BYTES,
+    FILE_CACHE_ENABLED,
+    FILE_CACHE_MAX_BYTES,
+    FILE_CACHE_MAX_ENTRIES,
+    FILE_CACHE_PATH,
+    FILE_CACHE_TTL,
+    RAG_HTTP2,
+    RAG_KEEPALIVE_EXPIRY,
+    RAG_LIMIT_INITIAL,
+    RAG_LIMIT_MAX,
+    RAG_LIMIT_MAX_QUEUE,
+    RAG_LIMIT_MAX_WAIT,
+    RAG_MAX_CONNECTIONS,
+    RAG_MAX_KEEPALIVE_CONNECTIONS,
+    RAG_COALESCE,
+    RAG_PRECONNECT,
+    RAG_STREAM_PATH,
+)
+from bot.services.cache import DiskResultStore, FileResultCache, LRUCache, normalize_query
+from bot.services.limiter import AdaptiveLimiter, LimiterShedError
+from bot.services.resilience import CircuitBreaker, CircuitOpenError, RetryPolicy
+from bot.services.singleflight import SingleFlight
+from bot.services.uploads import TelegramDownloadError, UploadSource, as_source, multipart_stream
+from bot.utils.metrics import RAG_IN_FLIGHT, RAG_REQUESTS, RAG_REQUEST_SECONDS
+from bot.utils.tracing import add_span, span, trace_headers
 
 # Base URL for your RAG API
 RAG_API_BASE = os.getenv("RAG_API_URL", "http://127.0.0.1:8000/api/v2/telegram")
 
+# Process-wide pooled client, created in init_client() and closed in close_client()
+_client: Optional[httpx.AsyncClient] = None
+
 # Friendly messages to show to end users
 USER_FRIENDLY_ERRORS = {
     404: "Sorry, the service is temporarily unavailable. Please try again later.",
     500: "Our system had an internal issue. We’re fixing it, please try again soon.",
     "http": "There was a network issue. Please check your connection and try again.",
-    "unknown": "Something went wrong. Please try again later."
+    "unknown": "Something went wrong. Please try again later.",
+    "unavailable": "The assistant is temporarily overloaded. Please try again in a minute.",
+    "busy": "Many people are asking right now. Please try again in a moment."
+}
+
+_FRIENDLY_ERROR_TEXTS = frozenset(USER_FRIENDLY_ERRORS.values())
+
+# Answers to text questions, keyed by normalize_query()
+answer_cache = LRUCache(
+    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    max_bytes=ANSWER_CACHE_MAX_BYTES,
+    ttl=ANSWER_CACHE_TTL,
+)
+
+# /file and /speech results, keyed by file_unique_id and content digest
+file_results = FileResultCache(
+    LRUCache(
+        max_entries=FILE_CACHE_MAX_ENTRIES,
+        max_bytes=FILE_CACHE_MAX_BYTES,
+        ttl=FILE_CACHE_TTL,
+        sizeof=lambda key, value: sys.getsizeof(key) + len(json.dumps(value, ensure_ascii=False)),
+    ),
+    DiskResultStore(FILE_CACHE_PATH, FILE_CACHE_DISK_MAX_BYTES, FILE_CACHE_TTL) if FILE_CACHE_ENABLED and FILE_CACHE_PATH else None,
+)
+
+# Identical in-flight requests share one upstream call (results are shared, treat them as read-only)
+inflight = SingleFlight()
+
+
+# One breaker per endpoint, so a stuck Whisper model does not fail text questions
+breakers = {
+    name: CircuitBreaker(name, RAG_BREAKER_FAILURES, RAG_BREAKER_RESET)
+    for name in ("text", "file", "speech")
+}
+retry_policy = RetryPolicy(RAG_RETRY_ATTEMPTS, RAG_RETRY_BASE_DELAY, RAG_RETRY_MAX_DELAY)
+
+# Adaptive cap on concurrent calls per endpoint; excess calls queue briefly, then are shed
+limiters = {
+    name: AdaptiveLimiter(
+        name,
+        initial=RAG_LIMIT_INITIAL,
+        max_limit=RAG_LIMIT_MAX,
+        max_queue=RAG_LIMIT_MAX_QUEUE,
+        max_wait=RAG_LIMIT_MAX_WAIT,
+    )
+    for name in ("text", "file", "speech")
 }
 
+# Replies that mean the backend is saturated
+_OVERLOAD_STATUSES = frozenset({429, 503})
+# Failures where the backend cannot have processed the request, so a retry is always safe
+_RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# Gateway statuses that are retried when the request body can be sent again
+_RETRYABLE_STATUSES = frozenset({502, 503})
+
+
 def format_status_error(resp: httpx.Response) -> str:
     """Return a friendly error for the user based on status code."""
     return USER_FRIENDLY_ERRORS.get(resp.status_code, USER_FRIENDLY_ERRORS["unknown"])
 
 
+async def _send(endpoint: str, request: Callable[[], Awaitable[httpx.Response]], replayable: bool = True) -> httpx.Response:
+    """
+    Run `request` through the endpoint's circuit breaker with jittered retries, recording
+    its time (calls rejected by the breaker or limiter only count as an outcome) as a
+    metric and as a span of the current trace.
+    """
+    in_flight = RAG_IN_FLIGHT.labels(endpoint)
+    in_flight.inc()
+    started = time.perf_counter()
+    outcome = "error"
+    step = span(f"rag.{endpoint}")
+    try:
+        with step:
+            resp = await _send_with_retries(endpoint, request, replayable)
+        outcome = str(resp.status_code)
+        return resp
+    except CircuitOpenError:
+        outcome = "unavailable"
+        raise
+    except LimiterShedError:
+        outcome = "busy"
+        raise
+    except TelegramDownloadError:
+        outcome = "download_error"
+        raise
+    finally:
+        step.set(outcome=outcome)
+        in_flight.dec()
+        RAG_REQUESTS.labels(endpoint, outcome).inc()
+        if outcome not in ("unavailable", "busy", "download_error"):
+            RAG_REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - started)
+
+
+async def _send_with_retries(
+    endpoint: str, request: Callable[[], Awaitable[httpx.Response]], replayable: bool = True
+) -> httpx.Response:
+    """
+    Run `request` through the endpoint's circuit breaker with jittered retries.
+
+    Each attempt holds a slot of the endpoint's adaptive limiter. Connect-phase errors
+    and 502/503 are retried when the body is `replayable`. Other errors and 5xx replies
+    count against the breaker without a retry. Raises CircuitOpenError while the circuit
+    is open and LimiterShedError when no slot frees up in time. A TelegramDownloadError
+    from a piped upload body is passed on without touching the breaker or the limit.
+    """
+    breaker = breakers[endpoint]
+    attempt = 0
+    while True:
+        trial = False
+        try:
+            async with limiters[endpoint].slot() as slot:
+                # Checked once a slot is held, so a probe cannot be lost to a shed wait
+                trial = breaker.before_call()
+                try:
+                    resp = await request()
+                except httpx.TransportError:
+                    slot.overloaded = True
+                    raise
+                slot.overloaded = resp.status_code in _OVERLOAD_STATUSES
+        except TelegramDownloadError:
+            # Telegram's failure, not the backend's
+            if trial:
+                breaker.release_trial()
+            raise
+        except _RETRYABLE_ERRORS as e:
+            breaker.record_failure()
+            if not replayable or attempt + 1 >= retry_policy.attempts:
+                raise
+            logging.warning(f"RAG /{endpoint} connect failed ({e!r}), retrying")
+        except (httpx.HTTPError, OSError):
+            breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelled or failed before the backend gave a verdict
+            if trial:
+                breaker.release_trial()
+            raise
+        else:
+            if resp.status_code < 500:
+                breaker.record_success()
+                return resp
+            breaker.record_failure()
+            if resp.status_code not in _RETRYABLE_STATUSES or not replayable or attempt + 1 >= retry_policy.attempts:
+                return resp
+            logging.warning(f"RAG /{endpoint} returned {resp.status_code}, retrying")
+        await asyncio.sleep(retry_policy.delay(attempt))
+        attempt += 1
+
+
+# ----- Shared HTTP client ----- #
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _build_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    http2 = RAG_HTTP2
+    if http2 and not _http2_available():
+        logging.warning("RAG_HTTP2 is enabled but the 'h2' package is missing; falling back to HTTP/1.1")
+        http2 = False
+    limits = httpx.Limits(
+        max_connections=RAG_MAX_CONNECTIONS,
+        max_keepalive_connections=RAG_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=RAG_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(limits=limits, http2=http2, transport=transport)
+
+
+async def _preconnect(client: httpx.AsyncClient, count: int) -> None:
+    """Open `count` keep-alive connections to the RAG host so the first users skip TCP/TLS setup."""
+    async def _touch():
+        try:
+            await client.head(RAG_API_BASE, timeout=5)
+        except httpx.HTTPError as e:
+            logging.warning(f"RAG pre-connect failed: {e}")
+
+    await asyncio.gather(*(_touch() for _ in range(count)))
+
+
+async def init_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    """Create the shared RAG client and warm its connection pool. Call from Application.post_init."""
+    global _client
+    if _client is None:
+        _client = _build_client(transport)
+        if RAG_PRECONNECT > 0:
+            await _preconnect(_client, min(RAG_PRECONNECT, RAG_MAX_KEEPALIVE_CONNECTIONS))
+        logging.info(f"RAG client ready: {pool_stats()}")
+    return _client
+
+
+async def close_client() -> None:
+    """Close the shared RAG client. Call from Application.post_shutdown."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it lazily (without pre-connect) outside the bot lifecycle."""
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+def pool_stats() -> dict:
+    """Snapshot of the shared connection pool: total, in-use and idle connections."""
+    stats = {"connections": 0, "in_use": 0, "idle": 0, "max_connections": RAG_MAX_CONNECTIONS}
+    pool = getattr(getattr(_client, "_transport", None), "_pool", None)
+    if pool is None:
+        return stats
+    for conn in pool.connections:
+        stats["connections"] += 1
+        if conn.is_idle():
+            stats["idle"] += 1
+        elif not conn.is_closed():
+            stats["in_use"] += 1
+    return stats
+
+
+def backend_stats() -> dict:
+    """Monitoring snapshot of the pool, limiters, circuit breakers and caches."""
+    return {
+        "pool": pool_stats(),
+        "limiters": {name: limiter.stats() for name, limiter in limiters.items()},
+        "breakers": {name: breaker.stats() for name, breaker in breakers.items()},
+        "answer_cache": answer_cache.stats(),
+        "file_cache": file_results.stats(),
+        "inflight": inflight.stats(),
+    }
+
+
+History = List[Dict[str, str]]
+
+
+def _history_field(history: Optional[History]) -> Dict[str, str]:
+    """Earlier turns of the chat as the optional `history` form field (a JSON list)"""
+    return {"history": json.dumps(history, ensure_ascii=False)} if history else {}
+
+
 # Text Query Handler
-async def query_text(query: str) -> str:
+async def _fetch_text(query: str, history: Optional[History] = None) -> tuple:
+    """POST /text. Returns (answer, ok) where ok is False for any error reply."""
     url = f"{RAG_API_BASE}/text"
-    data = {"query": query}
-    async with httpx.AsyncClient() as client:
-        try:
-            resp = await client.post(url, data=data, timeout=30)
-            if resp.status_code == 200:
-                return resp.json().get("response", "[No response from RAG API]")
-            else:
-                logging.error(f"RAG API error {resp.status_code}: {resp.text}")
-                return resp.json().get("detail", format_status_error(resp))
-        except Exception as e:
-            logging.error(f"Unexpected error: {e}")
-            return USER_FRIENDLY_ERRORS["unknown"]
+    data = {"query": query, **_history_field(history)}
+    client = get_client()
+    try:
+        resp = await _send("text", lambda: client.post(url, data=data, headers=trace_headers(), timeout=30))
+        if resp.status_code == 200:
+            answer = resp.json().get("response")
+            if answer is None:
+                return "[No response from RAG API]", False
+            return answer, answer not in _FRIENDLY_ERROR_TEXTS
+        else:
+            logging.error(f"RAG API error {resp.status_code}: {resp.text}")
+            return resp.json().get("detail", format_status_error(resp)), False
+    except CircuitOpenError:
+        return USER_FRIENDLY_ERRORS["unavailable"], False
+    except LimiterShedError:
+        return USER_FRIENDLY_ERRORS["busy"], False
+    except Exception as e:
+        logging.error(f"Unexpected error: {e}")
+        return USER_FRIENDLY_ERRORS["unknown"], False
+
+
+async def _query_text_uncached(query: str, key: str) -> str:
+    answer, ok = await _fetch_text(query)
+    if ANSWER_CACHE_ENABLED and key and ok:
+        answer_cache.set(key, answer)
+    return answer
+
+
+async def query_text(query: str, history: Optional[History] = None) -> str:
+    """Answer a question; with `history` the answer depends on the chat, so it is neither cached nor shared"""
+    if history:
+        answer, _ = await _fetch_text(query, history)
+        return answer
+    key = normalize_query(query)
+    if ANSWER_CACHE_ENABLED and key:
+        cached = answer_cache.get(key)
+        if cached is not None:
+            return cached
+
+    if not RAG_COALESCE:
+        return await _query_text_uncached(query, key)
+    return await inflight.do(("text", key or query), lambda: _query_text_uncached(query, key))
+
+
+class RAGStreamError(Exception):
+    """Raised by query_text_stream when the backend fails; str(e) is safe to show users."""
+
+
+def _sse_token(data: str) -> Optional[str]:
+    """Extract the text of one SSE `data:` payload; None marks the end of the stream."""
+    if data == "[DONE]":
+        return None
+    try:
+        event = json.loads(data)
+    except ValueError:
+        return data
+    if isinstance(event, dict):
+        return event.get("token") or event.get("delta") or event.get("response") or ""
+    return str(event)
+
+
+async def query_text_stream(query: str, history: Optional[History] = None) -> AsyncIterator[str]:
+    """
+    Yield answer text as the backend produces it.
+
+    Understands both `text/event-stream` (one token per `data:` line, JSON
+    `{"token": ...}` or plain text, `[DONE]` to finish) and plain chunked text.
+    Cached answers are yielded in one piece, and a fully streamed answer is cached,
+    unless `history` makes the answer specific to one chat.
+    """
+    key = normalize_query(query) if not history else ""
+    if ANSWER_CACHE_ENABLED and key:
+        cached = answer_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    url = f"{RAG_API_BASE}{RAG_STREAM_PATH}"
+    parts = []
+    breaker = breakers["text"]
+    client = get_client()
+    in_flight = RAG_IN_FLIGHT.labels("text_stream")
+    in_flight.inc()
+    started = time.perf_counter()
+    outcome = "error"
+    # A half-open trial must end in a success or failure, or be handed back
+    trial = settled = False
+    try:
+        async with limiters["text"].slot() as slot:
+            trial = breaker.before_call()
+            async with client.stream(
+                "POST", url, data={"query": query, **_history_field(history)}, headers=trace_headers(),
+                timeout=httpx.Timeout(30, read=60),
+            ) as resp:
+                # The backend's latency is the time to the response head; the rest of the
+                # stream is paced by the reader's Telegram edits, which must not shrink the limit
+                slot.sample()
+                outcome = str(resp.status_code)
+                settled = True
+                if resp.status_code >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                if resp.status_code != 200:
+                    slot.overloaded = resp.status_code in _OVERLOAD_STATUSES
+                    body = await resp.aread()
+                    logging.error(f"RAG API stream error {resp.status_code}: {body[:500]!r}")
+                    raise RAGStreamError(format_status_error(resp))
+
+                if resp.headers.get("content-type", "").startswith("text/event-stream"):
+                    async for line in resp.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        token = _sse_token(line[5:].lstrip())
+                        if token is None:
+                            break
+                        if token:
+                            parts.append(token)
+                            yield token
+                else:
+                    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+                    async for chunk in resp.aiter_bytes():
+                        token = decoder.decode(chunk)
+                        if token:
+                            parts.append(token)
+                            yield token
+    except CircuitOpenError as e:
+        outcome = "unavailable"
+        raise RAGStreamError(USER_FRIENDLY_ERRORS["unavailable"]) from e
+    except LimiterShedError as e:
+        outcome = "busy"
+        raise RAGStreamError(USER_FRIENDLY_ERRORS["busy"]) from e
+    except httpx.HTTPError as e:
+        logging.error(f"RAG API stream failed: {e}")
+        outcome = "error"
+        settled = True
+        breaker.record_failure()
+        raise RAGStreamError(USER_FRIENDLY_ERRORS["http"]) from e
+    finally:
+        if trial and not settled:
+            breaker.release_trial()
+        # Whole stream, up to its last token (or until the reader stopped early)
+        add_span("rag.text_stream", started, outcome=outcome, chars=sum(map(len, parts)))
+        in_flight.dec()
+        RAG_REQUESTS.labels("text_stream", outcome).inc()
+        if outcome not in ("busy", "unavailable"):
+            RAG_REQUEST_SECONDS.labels("text_stream").observe(time.perf_counter() - started)
+
+    answer = "".join(parts)
+    if ANSWER_CACHE_ENABLED and key and answer and answer not in _FRIENDLY_ERROR_TEXTS:
+        answer_cache.set(key, answer)
+
+
+def _result_ok(result: dict) -> bool:
+    return isinstance(result, dict) and "detail" not in result and "error" not in result
+
+
+def _error_result(detail: str, retryable: bool = False) -> dict:
+    """A failed file or speech result; `retryable` marks failures that may pass if tried again later"""
+    return {"detail": detail, "retryable": retryable}
+
+
+def _status_result(resp: httpx.Response) -> dict:
+    """The result for an error reply: the backend's `detail` if it sent one; 5xx and 429 are retryable"""
+    try:
+        detail = resp.json().get("detail")
+    except (ValueError, AttributeError):
+        detail = None
+    return _error_result(detail or format_status_error(resp), resp.status_code >= 500 or resp.status_code == 429)
+
+
+def is_retryable(result) -> bool:
+    """True for a file or speech result that failed for a transient reason (busy, down, 5xx)"""
+    return isinstance(result, dict) and bool(result.get("retryable"))
+
+
+async def _upload(
+    kind: str, query: str, source: UploadSource, post: Callable[[UploadSource], Awaitable[dict]], store: bool = True
+) -> dict:
+    """
+    Open `source` and POST it, unless a result for the same content digest is cached.
+    A result is only stored if `store` (False for answers that depend on the chat).
+    """
+    opened = await source.open()
+    if FILE_CACHE_ENABLED and opened.digest:
+        cached = await file_results.get_by_digest(kind, opened.digest, query)
+        if cached is not None:
+            await file_results.set(kind, source.key, None, query, cached)
+            return cached
+    result = await post(opened)
+    if FILE_CACHE_ENABLED and store and _result_ok(result):
+        await file_results.set(kind, source.key, opened.digest, query, result)
+    return result
 
 
 # File + Text Query Handler
-async def query_text_with_file(query: str, file_bytes: bytes, filename: str) -> dict:
+async def _post_file(query: str, source: UploadSource, filename: str, history: Optional[History] = None) -> dict:
     url = f"{RAG_API_BASE}/file"
-    files = {"file": (filename, file_bytes)}
-    data = {"query": query}
-    async with httpx.AsyncClient() as client:
-        try:
-            resp = await client.post(url, data=data, files=files, timeout=60)
-            if resp.status_code == 200:
-                return resp.json()
-            else:
-                logging.error(f"RAG API error {resp.status_code}: {resp.text}")
-                return {"detail": resp.json().get("detail", format_status_error(resp))}
-        except Exception as e:
-            logging.error(f"Unexpected error: {e}")
-            return {"detail": USER_FRIENDLY_ERRORS["unknown"]}
+    client = get_client()
+
+    def request():
+        headers, body = multipart_stream({"query": query, **_history_field(history)}, "file", filename, source)
+        return client.post(url, content=body, headers={**headers, **trace_headers()}, timeout=60)
+
+    try:
+        resp = await _send("file", request, replayable=source.replayable)
+        if resp.status_code == 200:
+            return resp.json()
+        else:
+            logging.error(f"RAG API error {resp.status_code}: {resp.text}")
+            return _status_result(resp)
+    except CircuitOpenError:
+        return _error_result(USER_FRIENDLY_ERRORS["unavailable"], True)
+    except LimiterShedError:
+        return _error_result(USER_FRIENDLY_ERRORS["busy"], True)
+    except httpx.HTTPError as e:
+        logging.error(f"RAG API request failed: {e}")
+        return _error_result(USER_FRIENDLY_ERRORS["http"], True)
+    except TelegramDownloadError:
+        # Not a RAG result: the caller (a job, or the handler) deals with Telegram failures
+        raise
+    except Exception as e:
+        logging.error(f"Unexpected error: {e}")
+        return {"detail": USER_FRIENDLY_ERRORS["unknown"]}
+
+
+async def query_text_with_file(
+    query: str, file_bytes: Union[bytes, UploadSource], filename: str, history: Optional[History] = None
+) -> dict:
+    """
+    Ask a question about a file; `file_bytes` may be raw bytes or a streaming UploadSource.
+    A cached result for the same file and question is served even with `history`; otherwise
+    the history goes to the backend and that result is neither cached nor shared.
+    """
+    source = as_source(file_bytes)
+    if FILE_CACHE_ENABLED:
+        cached = await file_results.get("file", source.key, query)
+        if cached is not None:
+            return cached
+
+    def run():
+        return _upload("file", query, source, lambda opened: _post_file(query, opened, filename, history), not history)
+
+    if history or not RAG_COALESCE:
+        return await run()
+    return await inflight.do(("file", normalize_query(query), filename, source.key), run)
 
 
 # Speech Query Handler
-async def speech_to_text(audio_bytes: bytes, filename: str) -> dict:
+async def _post_speech(source: UploadSource, filename: str, history: Optional[History] = None) -> dict:
     url = f"{RAG_API_BASE}/speech"
-    files = {"audio_file": (filename, audio_bytes)}
-    async with httpx.AsyncClient() as client:
-        try:
-            resp = await client.post(url, files=files, timeout=60)
-            if resp.status_code == 200:
-                return resp.json()
-            else:
-                logging.error(f"RAG API error {resp.status_code}: {resp.text}")
-                return {"detail": resp.json().get("detail", format_status_error(resp))}
-        except Exception as e:
-            logging.error(f"Unexpected error: {e}")
-            return {"detail": USER_FRIENDLY_ERRORS["unknown"]}
+    client = get_client()
+
+    def request():
+        headers, body = multipart_stream(_history_field(history), "audio_file", filename, source)
+        return client.post(url, content=body, headers={**headers, **trace_headers()}, timeout=60)
+
+    try:
+        resp = await _send("speech", request, replayable=source.replayable)
+        if resp.status_code == 200:
+            return resp.json()
+        else:
+            logging.error(f"RAG API error {resp.status_code}: {resp.text}")
+            return _status_result(resp)
+    except CircuitOpenError:
+        return _error_result(USER_FRIENDLY_ERRORS["unavailable"], True)
+    except LimiterShedError:
+        return _error_result(USER_FRIENDLY_ERRORS["busy"], True)
+    except httpx.HTTPError as e:
+        logging.error(f"RAG API request failed: {e}")
+        return _error_result(USER_FRIENDLY_ERRORS["http"], True)
+    except TelegramDownloadError:
+        # Not a RAG result: the caller (a job, or the handler) deals with Telegram failures
+        raise
+    except Exception as e:
+        logging.error(f"Unexpected error: {e}")
+        return {"detail": USER_FRIENDLY_ERRORS["unknown"]}
+
+
+async def speech_to_text(
+    audio_bytes: Union[bytes, UploadSource], filename: str, history: Optional[History] = None
+) -> dict:
+    """
+    Transcribe and answer a voice note; `audio_bytes` may be raw bytes or a streaming UploadSource.
+    A cached result for the same audio is served even with `history`; otherwise the history
+    goes to the backend and that result is neither cached nor shared.
+    """
+    source = as_source(audio_bytes)
+    if FILE_CACHE_ENABLED:
+        cached = await file_results.get("speech", source.key)
+        if cached is not None:
+            return cached
 
+    def run():
+        return _upload("speech", "", source, lambda opened: _post_speech(opened, filename, history), not history)
 
+    if history or not RAG_COALESCE:
+        return await run()
+    return await inflight.do(("speech", filename, source.key), run)
@@ -0,0 +1,94 @@
+"""
+Circuit breaker and retry policy for calls to the RAG backend
+"""
+
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit breaker for one endpoint.
+
+    After `failure_threshold` consecutive failures the circuit opens and every call fails
+    fast for `recovery_timeout` seconds. Then it goes half-open and lets up to
+    `half_open_max_calls` trial calls through: a success closes it, a failure opens it again.
+    A trial that ends without either (cancelled, shed, a non-HTTP error) must be handed back
+    with `release_trial`, or the circuit would stay half-open with no trials left.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0, half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trials = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._trials = 0
+            logger.info(f"Circuit '{self.name}' half-open, probing backend")
+        return self._state
+
+    def before_call(self) -> bool:
+        """Raise CircuitOpenError unless a call may go through now; True if the call is a half-open trial"""
+        state = self.state
+        if state == self.CLOSED:
+            return False
+        if state == self.HALF_OPEN and self._trials < self.half_open_max_calls:
+            self._trials += 1
+            return True
+        self.rejected += 1
+        raise CircuitOpenError(f"circuit '{self.name}' is {state}")
+
+    def release_trial(self) -> None:
+        """Give back a half-open trial whose call ended without a success or failure"""
+        if self._state == self.HALF_OPEN and self._trials > 0:
+            self._trials -= 1
+
+    def record_success(self) -> None:
+        if self._state != self.CLOSED:
+            logger.info(f"Circuit '{self.name}' closed")
+        self._state = self.CLOSED
+        self._failures = 0
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                logger.warning(f"Circuit '{self.name}' opened after {self._failures} failures")
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {"state": self.state, "failures": self._failures, "rejected": self.rejected}
+
+
+class RetryPolicy:
+    """Bounded attempts with "full jitter" exponential backoff"""
+
+    def __init__(self, attempts: int = 3, base_delay: float = 0.25, max_delay: float = 2.0):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait before retry number `attempt` (0-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
@@ -0,0 +1,114 @@
+"""
+Per-modality worker pools with priority queues
+
+Text, file and speech jobs run in separate bounded pools, so a burst of voice notes
+or large uploads can only ever occupy their own slots. Within a pool, waiting jobs
+are served by priority first and arrival order second.
+"""
+
+import asyncio
+import heapq
+import itertools
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Tuple
+
+from bot.config import (
+    SCHED_FILE_QUEUE,
+    SCHED_FILE_WORKERS,
+    SCHED_SPEECH_QUEUE,
+    SCHED_SPEECH_WORKERS,
+    SCHED_TEXT_QUEUE,
+    SCHED_TEXT_WORKERS,
+    TEXT_PRIORITY_MAX_CHARS,
+)
+from bot.utils.priorities import PRIORITY_HIGH, PRIORITY_NORMAL
+
+
+class SchedulerBusyError(Exception):
+    """Raised when a pool's wait queue is full"""
+
+
+class PriorityPool:
+    """At most `size` jobs run at once; at most `max_queue` more may wait for a slot"""
+
+    def __init__(self, name: str, size: int, max_queue: int):
+        self.name = name
+        self.size = size
+        self.max_queue = max_queue
+        self.running = 0
+        self.rejected = 0
+        self._heap: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        return len(self._heap)
+
+    async def _acquire(self, priority: int) -> None:
+        if self.running < self.size and not self._heap:
+            self.running += 1
+            return
+        if len(self._heap) >= self.max_queue:
+            self.rejected += 1
+            raise SchedulerBusyError(f"{self.name} pool is full")
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._seq), waiter)
+        heapq.heappush(self._heap, entry)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            else:
+                try:
+                    self._heap.remove(entry)
+                except ValueError:
+                    # _release popped it (and skipped it) before this task resumed
+                    pass
+                else:
+                    heapq.heapify(self._heap)
+            raise
+
+    def _release(self) -> None:
+        self.running -= 1
+        while self._heap and self.running < self.size:
+            _, _, waiter = heapq.heappop(self._heap)
+            if not waiter.done():
+                self.running += 1
+                waiter.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_NORMAL) -> AsyncIterator[None]:
+        await self._acquire(priority)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def stats(self) -> dict:
+        return {"size": self.size, "running": self.running, "queued": len(self._heap), "rejected": self.rejected}
+
+
+class ModalityScheduler:
+    """One PriorityPool per modality ("text", "file", "speech")"""
+
+    def __init__(self, pools: Dict[str, PriorityPool]):
+        self.pools = pools
+
+    def slot(self, modality: str, priority: int = PRIORITY_NORMAL):
+        return self.pools[modality].slot(priority)
+
+    def stats(self) -> dict:
+        return {name: pool.stats() for name, pool in self.pools.items()}
+
+
+def text_priority(text: str) -> int:
+    """Short questions jump ahead of long ones"""
+    return PRIORITY_HIGH if len(text) <= TEXT_PRIORITY_MAX_CHARS else PRIORITY_NORMAL
+
+
+scheduler = ModalityScheduler({
+    "text": PriorityPool("text", SCHED_TEXT_WORKERS, SCHED_TEXT_QUEUE),
+    "file": PriorityPool("file", SCHED_FILE_WORKERS, SCHED_FILE_QUEUE),
+    "speech": PriorityPool("speech", SCHED_SPEECH_WORKERS, SCHED_SPEECH_QUEUE),
+})
@@ -0,0 +1,274 @@
+"""
+Upload sources and a streaming multipart encoder for sending files to the RAG API
+
+A Telegram download is piped straight into the multipart request body, so a file is
+never held in memory as a whole. Files above FILE_SPOOL_THRESHOLD are first spooled to
+a temporary file, which frees the Telegram connection early and lets the upload be
+replayed (e.g. on retry).
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import secrets
+import tempfile
+import time
+from typing import AsyncIterator, Dict, Optional, Tuple
+from urllib import parse as urllib_parse
+
+import httpx
+from telegram import File
+from telegram._utils.files import is_local_file
+
+from bot.config import FILE_CHUNK_SIZE, FILE_SPOOL_DIR, FILE_SPOOL_THRESHOLD, RAG_STREAM_UPLOADS
+from bot.utils.metrics import TELEGRAM_DOWNLOAD_SECONDS
+from bot.utils.tracing import add_span, span
+
+logger = logging.getLogger(__name__)
+
+# Separate pool for api.telegram.org downloads, so they never compete with RAG calls
+_download_client: Optional[httpx.AsyncClient] = None
+
+
+def get_download_client() -> httpx.AsyncClient:
+    global _download_client
+    if _download_client is None:
+        _download_client = httpx.AsyncClient(timeout=httpx.Timeout(30, read=60))
+    return _download_client
+
+
+async def close_download_client() -> None:
+    global _download_client
+    if _download_client is not None:
+        await _download_client.aclose()
+        _download_client = None
+
+
+class TelegramDownloadError(Exception):
+    """
+    Downloading a Telegram file failed while it was being uploaded. Raised from the upload
+    body, so the RAG call can tell a Telegram failure apart from one of its own backend.
+    """
+
+
+class UploadSource:
+    """
+    Bytes to upload, produced chunk by chunk.
+
+    `key` identifies the content for coalescing and caching (a content digest or
+    Telegram's file_unique_id), `size` is the byte length if known, and `replayable`
+    tells whether `chunks()` may be iterated more than once. `digest` is the SHA-256 of
+    the content once known: up front for in-memory and spooled data, after the first
+    full pass for piped downloads.
+    """
+
+    key: str = ""
+    size: Optional[int] = None
+    replayable: bool = True
+    digest: Optional[str] = None
+
+    async def open(self) -> "UploadSource":
+        """Return the source to actually read from; lazy sources download or spool here"""
+        return self
+
+    def chunks(self) -> AsyncIterator[bytes]:
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        """Release temporary resources"""
+
+
+class BytesSource(UploadSource):
+    """An in-memory payload, yielded as a single chunk without copying"""
+
+    def __init__(self, data: bytes, key: Optional[str] = None):
+        self.data = data
+        self.size = len(data)
+        self.digest = hashlib.sha256(data).hexdigest()
+        self.key = key or self.digest
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        yield self.data
+
+
+class FileSource(UploadSource):
+    """A file on disk, read in chunks off the event loop; optionally deleted on close"""
+
+    def __init__(self, path: str, key: str, delete: bool = False, digest: Optional[str] = None):
+        self.path = path
+        self.key = key
+        self.size = os.path.getsize(path)
+        self.delete = delete
+        self.digest = digest
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        with open(self.path, "rb") as f:
+            while True:
+                chunk = await asyncio.to_thread(f.read, FILE_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    async def aclose(self) -> None:
+        if self.delete:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+
+class TelegramFileSource(UploadSource):
+    """
+    A Telegram file streamed from the Bot API while it is being uploaded; single use.
+    `mode` labels its download time ("piped" into an upload or "spooled" to disk).
+    """
+
+    replayable = False
+
+    def __init__(self, file: File, mode: str = "piped"):
+        self.file = file
+        self.mode = mode
+        self.key = file.file_unique_id
+        self.size = file.file_size
+        self._consumed = False
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        if self._consumed:
+            raise RuntimeError("Telegram file stream can only be consumed once")
+        self._consumed = True
+        hasher = hashlib.sha256()
+        started = time.perf_counter()
+        try:
+            async with get_download_client().stream("GET", _file_url(self.file)) as resp:
+                resp.raise_for_status()
+                async for chunk in resp.aiter_bytes(FILE_CHUNK_SIZE):
+                    hasher.update(chunk)
+                    yield chunk
+        except httpx.HTTPError as e:
+            raise TelegramDownloadError(f"Telegram file download failed: {e!r}") from e
+        TELEGRAM_DOWNLOAD_SECONDS.labels(self.mode).observe(time.perf_counter() - started)
+        add_span("download", started, mode=self.mode, size=self.file.file_size)
+        self.digest = hasher.hexdigest()
+
+
+class TelegramAttachmentSource(UploadSource):
+    """
+    A Document, PhotoSize, Voice or Audio that has not been fetched yet.
+
+    `key` and `size` come from the attachment itself, so caches and coalescing can be
+    consulted before any Bot API call. `open()` calls getFile and picks the download
+    strategy; `aclose()` releases whatever `open()` created.
+    """
+
+    def __init__(self, attachment):
+        self.attachment = attachment
+        self.key = attachment.file_unique_id
+        self.size = attachment.file_size
+        self._opened: Optional[UploadSource] = None
+
+    async def open(self) -> UploadSource:
+        if self._opened is None:
+            with span("get_file"):
+                file = await self.attachment.get_file()
+            self._opened = await open_telegram_file(file)
+        return self._opened
+
+    @property
+    def digest(self) -> Optional[str]:
+        return self._opened.digest if self._opened else None
+
+    @property
+    def replayable(self) -> bool:
+        return self._opened.replayable if self._opened else False
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        async for chunk in (await self.open()).chunks():
+            yield chunk
+
+    async def aclose(self) -> None:
+        if self._opened is not None:
+            await self._opened.aclose()
+
+
+def _file_url(file: File) -> str:
+    """file_path with any non-ASCII path characters percent-encoded"""
+    parts = urllib_parse.urlsplit(str(file.file_path))
+    return urllib_parse.urlunsplit(parts._replace(path=urllib_parse.quote(parts.path)))
+
+
+async def _spool(file: File) -> FileSource:
+    fd, path = tempfile.mkstemp(prefix="tg-upload-", dir=FILE_SPOOL_DIR or None)
+    download = TelegramFileSource(file, mode="spooled")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            async for chunk in download.chunks():
+                await asyncio.to_thread(out.write, chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return FileSource(path, key=file.file_unique_id, delete=True, digest=download.digest)
+
+
+async def open_telegram_file(file: File) -> UploadSource:
+    """
+    Wrap a Telegram file for upload without reading it into memory.
+
+    Small files are piped straight from the download into the upload; files larger than
+    FILE_SPOOL_THRESHOLD are downloaded to a temporary file first. Files served by a
+    local Bot API server are read from disk directly. With RAG_STREAM_UPLOADS off the
+    file is buffered in memory as before.
+    """
+    if not file.file_path:
+        raise RuntimeError("No `file_path` available for this file. Can not download.")
+    if not RAG_STREAM_UPLOADS:
+        with TELEGRAM_DOWNLOAD_SECONDS.labels("buffered").time(), span("download", mode="buffered", size=file.file_size):
+            data = bytes(await file.download_as_bytearray())
+        return BytesSource(data, key=file.file_unique_id)
+    if is_local_file(file.file_path):
+        return FileSource(str(file.file_path), key=file.file_unique_id)
+    if file.file_size is not None and file.file_size > FILE_SPOOL_THRESHOLD:
+        return await _spool(file)
+    return TelegramFileSource(file)
+
+
+def as_source(payload) -> UploadSource:
+    return payload if isinstance(payload, UploadSource) else BytesSource(bytes(payload))
+
+
+def _quote(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', "%22").replace("\r", "%0D").replace("\n", "%0A")
+
+
+def multipart_stream(
+    fields: Dict[str, str], file_field: str, filename: str, source: UploadSource
+) -> Tuple[Dict[str, str], AsyncIterator[bytes]]:
+    """
+    Encode form fields plus one file part as a streaming multipart/form-data body.
+
+    Returns request headers and the body iterator. Content-Length is set when the
+    source size is known, otherwise the body goes out with chunked transfer encoding.
+    """
+    boundary = secrets.token_hex(16)
+    head = b"".join(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{_quote(name)}"\r\n\r\n'.encode("utf-8")
+        + value.encode("utf-8") + b"\r\n"
+        for name, value in fields.items()
+    )
+    head += (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{_quote(file_field)}"; '
+        f'filename="{_quote(filename)}"\r\nContent-Type: application/octet-stream\r\n\r\n'
+    ).encode("utf-8")
+    tail = f"\r\n--{boundary}--\r\n".encode("ascii")
+
+    headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    if source.size is not None:
+        headers["Content-Length"] = str(len(head) + source.size + len(tail))
+
+    async def body() -> AsyncIterator[bytes]:
+        yield head
+        async for chunk in source.chunks():
+            yield chunk
+        yield tail
+
+    return headers, body()
@@ -0,0 +1,209 @@
+"""
+Minimal asyncio HTTP/1.1 server used for local endpoints and offline stand-in servers
+"""
+
+import asyncio
+import json
+import logging
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger(__name__)
+
+MAX_HEADER_BYTES = 64 * 1024
+
+_REASONS = {
+    200: "OK", 204: "No Content", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden",
+    404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+    429: "Too Many Requests", 500: "Internal Server Error", 502: "Bad Gateway",
+    503: "Service Unavailable", 504: "Gateway Timeout",
+}
+
+
+class Request:
+    """A parsed request; `body` is fully read before the handler runs"""
+
+    __slots__ = ("method", "path", "query", "headers", "body")
+
+    def __init__(self, method: str, target: str, headers: Dict[str, str], body: bytes):
+        parts = urlsplit(target)
+        self.method = method
+        self.path = parts.path
+        self.query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body or b"null")
+
+    def form(self) -> Dict[str, str]:
+        """Decode an application/x-www-form-urlencoded body"""
+        return {k: v[-1] for k, v in parse_qs(self.body.decode("utf-8")).items()}
+
+
+class Response:
+    """
+    A response with either a bytes body or an async iterator of chunks.
+
+    Iterator bodies are sent with chunked transfer encoding and flushed chunk by chunk.
+    """
+
+    __slots__ = ("status", "body", "headers")
+
+    def __init__(
+        self,
+        body: Union[bytes, str, AsyncIterator[bytes]] = b"",
+        status: int = 200,
+        headers: Optional[Dict[str, str]] = None,
+        content_type: str = "text/plain; charset=utf-8",
+    ):
+        self.status = status
+        self.body = body.encode("utf-8") if isinstance(body, str) else body
+        self.headers = {"Content-Type": content_type}
+        if headers:
+            self.headers.update(headers)
+
+    @classmethod
+    def json(cls, data, status: int = 200) -> "Response":
+        return cls(json.dumps(data, ensure_ascii=False), status, content_type="application/json")
+
+
+Handler = Callable[[Request], Awaitable[Response]]
+
+
+class HTTPServer:
+    """
+    Route `(method, path)` pairs to async handlers.
+
+    Supports keep-alive, Content-Length and chunked request bodies and streaming
+    responses. It is deliberately small: no TLS, no HTTP/2, no pipelining guarantees.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, max_body: int = 50 * 1024 * 1024):
+        self.host = host
+        self.port = port
+        self.max_body = max_body
+        self._routes: Dict[Tuple[str, str], Handler] = {}
+        self._prefix_routes: Dict[str, Handler] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def route(self, method: str, path: str, handler: Handler) -> None:
+        """Register a handler; a path ending in '*' matches every path with that prefix"""
+        if path.endswith("*"):
+            self._prefix_routes[f"{method.upper()} {path[:-1]}"] = handler
+        else:
+            self._routes[(method.upper(), path)] = handler
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"HTTP server listening on {self.host}:{self.port}")
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def _find(self, method: str, path: str) -> Optional[Handler]:
+        handler = self._routes.get((method, path))
+        if handler is not None:
+            return handler
+        for key, candidate in self._prefix_routes.items():
+            prefix_method, prefix = key.split(" ", 1)
+            if prefix_method == method and path.startswith(prefix):
+                return candidate
+        return None
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                handler = self._find(request.method, request.path)
+                if handler is None:
+                    response = Response(b"not found", 404)
+                else:
+                    try:
+                        response = await handler(request)
+                    except Exception as e:
+                        logger.error(f"HTTP handler error on {request.path}: {e}")
+                        response = Response(b"internal error", 500)
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                await self._write_response(writer, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Request]:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            raise ValueError("request head too large")
+        if len(head) > MAX_HEADER_BYTES:
+            raise ValueError("request head too large")
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, _ = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            total = 0
+            while True:
+                size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readuntil(b"\r\n")
+                    break
+                total += size
+                if total > self.max_body:
+                    raise ValueError("request body too large")
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body = b"".join(chunks)
+        else:
+            length = int(headers.get("content-length", 0))
+            if length > self.max_body:
+                raise ValueError("request body too large")
+            body = await reader.readexactly(length) if length else b""
+        return Request(method.upper(), target, headers, body)
+
+    async def _write_response(self, writer: asyncio.StreamWriter, response: Response, keep_alive: bool) -> None:
+        status_line = f"HTTP/1.1 {response.status} {_REASONS.get(response.status, 'OK')}\r\n"
+        headers = dict(response.headers)
+        headers["Connection"] = "keep-alive" if keep_alive else "close"
+        streaming = not isinstance(response.body, bytes)
+        if streaming:
+            headers["Transfer-Encoding"] = "chunked"
+        else:
+            headers["Content-Length"] = str(len(response.body))
+        head = status_line + "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+        writer.write(head.encode("latin-1"))
+        if not streaming:
+            writer.write(response.body)
+            await writer.drain()
+            return
+        await writer.drain()
+        async for chunk in response.body:
+            if chunk:
+                writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
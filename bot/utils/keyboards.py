@@ -2,14 +2,25 @@
 Keyboard utilities for creating inline and reply keyboards
 """
 
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup
+from functools import lru_cache
 from typing import List
 
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup
+
+# Markups kept per builder that takes arguments, so callers with dynamic values cannot grow it unbounded
+_KEYED_CACHE_SIZE = 128
+
 
 class InlineKeyboards:
-    """Utility class for creating inline keyboards"""
+    """
+    Utility class for creating inline keyboards
+
+    Markups are immutable once built, so each one is built on first use and shared;
+    builders with arguments keep only the most recently used markups.
+    """
 
     @staticmethod
+    @lru_cache(maxsize=None)
     def main_menu() -> InlineKeyboardMarkup:
         """Create main menu inline keyboard in Burmese"""
         keyboard = [
@@ -28,6 +39,7 @@ class InlineKeyboards:
         return InlineKeyboardMarkup(keyboard)
 
     @staticmethod
+    @lru_cache(maxsize=None)
     def help_menu() -> InlineKeyboardMarkup:
         """Create help menu inline keyboard"""
         keyboard = [
@@ -40,6 +52,7 @@ class InlineKeyboards:
  
 
     @staticmethod
+    @lru_cache(maxsize=_KEYED_CACHE_SIZE)
     def confirmation_menu(action: str) -> InlineKeyboardMarkup:
         """Create confirmation menu for destructive actions"""
         keyboard = [
@@ -51,12 +64,20 @@ class InlineKeyboards:
         return InlineKeyboardMarkup(keyboard)
 
     @staticmethod
+    @lru_cache(maxsize=_KEYED_CACHE_SIZE)
     def back_button(callback_data: str = "main_menu") -> InlineKeyboardMarkup:
         """Create a simple back button"""
         keyboard = [[InlineKeyboardButton("🔙 Back", callback_data=callback_data)]]
         return InlineKeyboardMarkup(keyboard)
 
     @staticmethod
+    @lru_cache(maxsize=_KEYED_CACHE_SIZE)
+    def back_to(label: str, callback_data: str) -> InlineKeyboardMarkup:
+        """Create a single "Back to <label>" button"""
+        return InlineKeyboardMarkup([[InlineKeyboardButton(f"⬅️ Back to {label}", callback_data=callback_data)]])
+
+    @staticmethod
+    @lru_cache(maxsize=None)
     def cybersecurity_menu() -> InlineKeyboardMarkup:
         """Create cybersecurity submenu"""
         keyboard = [
@@ -76,6 +97,7 @@ class InlineKeyboards:
         return InlineKeyboardMarkup(keyboard)
 
     @staticmethod
+    @lru_cache(maxsize=None)
     def legal_menu() -> InlineKeyboardMarkup:
         """Create legal compliance submenu"""
         keyboard = [
@@ -95,6 +117,7 @@ class InlineKeyboards:
         return InlineKeyboardMarkup(keyboard)
 
     @staticmethod
+    @lru_cache(maxsize=None)
     def privacy_menu() -> InlineKeyboardMarkup:
         """Create privacy & data protection submenu"""
         keyboard = [
@@ -117,6 +140,7 @@ class InlineKeyboards:
         return InlineKeyboardMarkup(keyboard)
 
     @staticmethod
+    @lru_cache(maxsize=None)
     def quick_actions_menu() -> InlineKeyboardMarkup:
         """Create quick actions submenu"""
         keyboard = [
@@ -139,6 +163,7 @@ class InlineKeyboards:
         return InlineKeyboardMarkup(keyboard)
 
     @staticmethod
+    @lru_cache(maxsize=None)
     def emergency_menu() -> InlineKeyboardMarkup:
         """Create emergency response submenu"""
         keyboard = [
@@ -157,6 +182,7 @@ class InlineKeyboards:
         return InlineKeyboardMarkup(keyboard)
 
     @staticmethod
+    @lru_cache(maxsize=None)
     def better_apps_menu() -> InlineKeyboardMarkup:
         """Create better apps menu with external links"""
         return InlineKeyboardMarkup([
@@ -168,9 +194,10 @@ class InlineKeyboards:
 
 
 class ReplyKeyboards:
-    """Utility class for creating reply keyboards"""
+    """Utility class for creating reply keyboards, built once and shared like InlineKeyboards"""
 
     @staticmethod
+    @lru_cache(maxsize=None)
     def main_menu() -> ReplyKeyboardMarkup:
         """Create main menu reply keyboard in Burmese"""
         keyboard = [
@@ -187,6 +214,7 @@ class ReplyKeyboards:
         )
 
     @staticmethod
+    @lru_cache(maxsize=None)
     def quick_actions() -> ReplyKeyboardMarkup:
         """Create quick actions reply keyboard"""
         keyboard = [
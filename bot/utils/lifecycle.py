@@ -0,0 +1,44 @@
+"""
+Application lifecycle for entry points that do not go through run_polling
+"""
+
+import asyncio
+import signal
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Iterable
+
+from telegram.ext import Application
+
+
+def stop_on_signals(stop: asyncio.Event, signals: Iterable[int] = (signal.SIGINT, signal.SIGTERM)) -> None:
+    """Set `stop` when the process receives one of `signals`"""
+    loop = asyncio.get_running_loop()
+    for sig in signals:
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+
+@asynccontextmanager
+async def application_running(app: Application) -> AsyncIterator[Application]:
+    """
+    Initialize and start `app` for the duration of the block.
+
+    Mirrors Application.run_polling: post_init after initialize, post_stop after
+    stop and post_shutdown after shutdown.
+    """
+    await app.initialize()
+    try:
+        if app.post_init:
+            await app.post_init(app)
+        await app.start()
+        yield app
+    finally:
+        if app.running:
+            await app.stop()
+            if app.post_stop:
+                await app.post_stop(app)
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
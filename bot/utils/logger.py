@@ -1,5 +1,25 @@
+"""
+Logging setup: records are queued on the event loop and written by a background thread
+
+- `setup_logger` puts a QueueHandler on the root logger; a QueueListener thread does
+  the formatting (timestamps, tracebacks, JSON) and the writes to stdout
+- LOG_FORMAT=json writes one JSON object per line, with the trace id when there is one
+- LOG_SAMPLE_RATES keeps only a share of the DEBUG/INFO records of busy loggers
+- `lazy(fn, *args)` defers building an expensive log argument until a record is written
+"""
+
+import atexit
+import copy
+import json
 import logging
+import queue
+import random
 import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from bot.config import LOG_FORMAT, LOG_LEVEL, LOG_SAMPLE_RATES
+from bot.utils.tracing import current_trace_id
 
 # ANSI color codes
 RESET = "\033[0m"
@@ -11,20 +31,164 @@ COLORS = {
     "CRITICAL": "\033[1;31m" # Bold Red
 }
 
+TEXT_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+
+# Attributes every LogRecord has; anything else was passed in `extra`
+_RECORD_FIELDS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "trace_id"}
+
+
+class lazy:
+    """Log argument computed only if the record is written: logger.debug("%s", lazy(describe, obj))"""
+
+    __slots__ = ("fn", "args")
+
+    def __init__(self, fn, *args):
+        self.fn = fn
+        self.args = args
+
+    def __str__(self) -> str:
+        return str(self.fn(*self.args))
+
+
 class ColorFormatter(logging.Formatter):
+    """Colors the level name of a copy of the record, so other handlers still see the plain name"""
+
     def format(self, record):
         log_color = COLORS.get(record.levelname, "")
-        record.levelname = f"{log_color}{record.levelname}{RESET}"
-        return super().format(record)
+        colored = copy.copy(record)
+        colored.levelname = f"{log_color}{record.levelname}{RESET}"
+        return super().format(colored)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, trace id, `extra` fields, traceback"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id:
+            entry["trace_id"] = trace_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """{"httpx": 0.1, ...} from "httpx=0.1, bot.handlers.chat=0.5"; malformed parts are ignored"""
+    rates = {}
+    for part in spec.split(","):
+        name, _, rate = part.partition("=")
+        try:
+            rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            continue
+    return rates
 
-def setup_logger():
+
+class SamplingFilter(logging.Filter):
+    """
+    Pass a share of the DEBUG and INFO records of the configured loggers (and their
+    children); warnings and errors always pass. Rates are looked up once per logger name.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._by_logger: Dict[str, float] = {}
+        self.dropped = 0
+
+    def _rate(self, name: str) -> float:
+        rate = self._by_logger.get(name)
+        if rate is None:
+            rate = 1.0
+            prefix = name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._by_logger[name] = rate
+        return rate
+
+    def filter(self, record) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        self.dropped += 1
+        return False
+
+
+class LoopQueueHandler(QueueHandler):
+    """
+    Enqueue records for the listener thread, doing as little as possible on the caller's side.
+
+    Only the message is resolved here (its arguments may change once the call returns) and
+    the trace id is taken from the caller's context. Timestamps, tracebacks and JSON are
+    formatted by the listener.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        record.trace_id = current_trace_id()
+        return record
+
+
+_listener: Optional[QueueListener] = None
+
+
+def build_handler(stream=None, json_mode: bool = False) -> logging.Handler:
+    """The handler that actually writes: colored text on a terminal, plain text or JSON otherwise"""
+    stream = stream or sys.stdout
+    handler = logging.StreamHandler(stream)
+    if json_mode:
+        handler.setFormatter(JsonFormatter())
+    elif getattr(stream, "isatty", lambda: False)():
+        handler.setFormatter(ColorFormatter(TEXT_FORMAT))
+    else:
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    return handler
+
+
+def setup_logger(level: str = LOG_LEVEL, json_mode: bool = LOG_FORMAT == "json", sample_rates: str = LOG_SAMPLE_RATES, stream=None) -> QueueListener:
+    """Route all logging through a queue to one writer thread; safe to call again (e.g. in a shard process)"""
+    global _listener
+    stop_logger()
     # Remove default handlers so we can customize
     for handler in logging.root.handlers[:]:
         logging.root.removeHandler(handler)
 
-    handler = logging.StreamHandler(sys.stdout)
-    handler.setFormatter(ColorFormatter(
-        "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
-    ))
+    records = queue.SimpleQueue()
+    handler = LoopQueueHandler(records)
+    rates = parse_sample_rates(sample_rates)
+    if rates:
+        handler.addFilter(SamplingFilter(rates))
+    _listener = QueueListener(records, build_handler(stream, json_mode), respect_handler_level=True)
+    _listener.start()
+    logging.root.addHandler(handler)
+    logging.root.setLevel(getattr(logging, level.upper(), logging.INFO))
+    return _listener
+
+
+def stop_logger() -> None:
+    """Write out what is queued and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        listener, _listener = _listener, None
+        listener.stop()
+
 
-    logging.basicConfig(level=logging.INFO, handlers=[handler])
+atexit.register(stop_logger)
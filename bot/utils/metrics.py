@@ -0,0 +1,294 @@
+"""
+Counters, gauges and histograms served at /metrics in the Prometheus text format
+
+Recording is plain arithmetic on objects resolved once per label set: no locks (all
+of it happens on the event loop) and no formatting until a scrape. Each process, and
+so each shard, serves its own numbers.
+"""
+
+import bisect
+import logging
+import math
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from bot.utils.http_server import HTTPServer, Request, Response
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; from a cached answer (a few ms) to a slow file upload
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, int) or value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class CounterValue:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+
+class GaugeValue:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _Timer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram: "HistogramValue"):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+
+class HistogramValue:
+    """Per-bucket counts (not cumulative until rendered) plus the sum of observations"""
+
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # The last slot is the +Inf bucket
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        # bisect_left puts a value equal to a bound into that bound's bucket (le is inclusive)
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def time(self) -> _Timer:
+        """Context manager observing the time spent inside it"""
+        return _Timer(self)
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry: "Optional[Registry]" = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[tuple, object] = {}
+        if not self.labelnames:
+            self._default = self.labels()
+        (REGISTRY if registry is None else registry).register(self)
+
+    def _new(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """The value for one combination of label values, created on first use"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            child = self._children[values] = self._new()
+        return child
+
+    def _samples(self, values: tuple, child) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, values)} {_number(child.value)}"]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {_escape_help(self.documentation)}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            lines += self._samples(values, child)
+        return lines
+
+
+class Counter(_Metric):
+    """A total that only goes up; by convention the name ends in _total"""
+
+    kind = "counter"
+
+    def _new(self) -> CounterValue:
+        return CounterValue()
+
+    def inc(self, amount: float = 1) -> None:
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, e.g. requests in flight"""
+
+    kind = "gauge"
+
+    def _new(self) -> GaugeValue:
+        return GaugeValue()
+
+    def inc(self, amount: float = 1) -> None:
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self._default.dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+
+class Histogram(_Metric):
+    """Observations counted into fixed buckets, rendered as _bucket/_sum/_count series"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        registry: "Optional[Registry]" = None,
+    ):
+        self.buckets = tuple(sorted(float(b) for b in buckets if b != math.inf))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new(self) -> HistogramValue:
+        return HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def time(self) -> _Timer:
+        return self._default.time()
+
+    def _samples(self, values: tuple, child: HistogramValue) -> List[str]:
+        lines = []
+        total = 0
+        for bound, count in zip(self.buckets + (math.inf,), list(child.counts)):
+            total += count
+            le = f'le="{_number(bound)}"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, values, le)} {total}")
+        labels = _labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_number(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {total}")
+        return lines
+
+
+class Registry:
+    """The metrics of one process, rendered together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ----- What the bot records ----- #
+RAG_REQUEST_SECONDS = Histogram(
+    "rag_request_seconds", "RAG API call time by endpoint, retries included", ("endpoint",)
+)
+RAG_REQUESTS = Counter(
+    "rag_requests_total", "RAG API calls by endpoint and outcome (HTTP status, error, unavailable, busy)",
+    ("endpoint", "outcome"),
+)
+RAG_IN_FLIGHT = Gauge("rag_requests_in_flight", "RAG API calls under way by endpoint", ("endpoint",))
+TELEGRAM_DOWNLOAD_SECONDS = Histogram(
+    "telegram_file_download_seconds",
+    "Telegram file download time; piped downloads also wait on the upload they feed",
+    ("mode",),
+)
+REPLY_SEND_SECONDS = Histogram(
+    "telegram_reply_seconds", "Time to send (or edit in) the message with an answer, rate limiting included",
+    ("method",),
+)
+UPDATE_SECONDS = Histogram("update_handling_seconds", "Time to handle one message by modality", ("modality",))
+UPDATES = Counter(
+    "updates_total", "Handled messages by modality and outcome (answered, queued, busy, flooded, failed)",
+    ("modality", "outcome"),
+)
+UPDATES_IN_PROGRESS = Gauge("updates_in_progress", "Messages being handled by modality", ("modality",))
+
+# The /metrics server of this process while the bot runs, see `start_server`
+server: Optional[HTTPServer] = None
+
+
+def build_metrics_server(host: str, port: int, registry: Registry = REGISTRY) -> HTTPServer:
+    async def metrics(request: Request) -> Response:
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+    http = HTTPServer(host, port, max_body=0)
+    http.route("GET", "/metrics", metrics)
+    return http
+
+
+async def start_server(host: str, port: int) -> Optional[HTTPServer]:
+    """Serve /metrics on host:port; a port already in use is logged, not fatal"""
+    global server
+    if server is None:
+        candidate = build_metrics_server(host, port)
+        try:
+            await candidate.start()
+        except OSError as e:
+            logger.warning(f"Metrics endpoint not started on {host}:{port}: {e}")
+            return None
+        server = candidate
+    return server
+
+
+async def stop_server() -> None:
+    global server
+    if server is not None:
+        running, server = server, None
+        await running.stop()
@@ -0,0 +1,173 @@
+"""
+Splitting long answers into pages and paging through them with ◀ / ▶ buttons
+
+An answer longer than one Telegram message is cut at the best boundary available
+(paragraph, line, sentence, word) that does not fall inside an entity. The pages are
+kept in a bounded, expiring store; the buttons carry "pg:<token>:<page>" and edit the
+same message to show another page.
+"""
+
+import bisect
+import secrets
+from typing import List, Optional, Tuple
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, MessageEntity
+from telegram.constants import MessageLimit
+
+from bot.config import PAGE_STORE_MAX_BYTES, PAGE_STORE_MAX_ENTRIES, PAGE_STORE_TTL
+from bot.services.cache import LRUCache
+from bot.utils.rendering import Rendered
+
+CALLBACK_PREFIX = "pg:"
+
+# Preferred cut points, best first; "။" ends a sentence in Burmese
+_SEPARATORS = ("\n\n", "\n", ". ", "! ", "? ", "။ ", "။", "; ", ", ", " ")
+
+# A page should be at least this share of the limit before a weaker separator is tried
+_MIN_FILL = 0.5
+
+# Entities stored as (type, offset, length, url, language)
+PageData = Tuple[str, Tuple[tuple, ...]]
+
+
+def _utf16_prefix(text: str) -> List[int]:
+    """prefix[i] = UTF-16 length of text[:i]"""
+    prefix = [0] * (len(text) + 1)
+    total = 0
+    for i, c in enumerate(text):
+        total += 2 if ord(c) > 0xFFFF else 1
+        prefix[i + 1] = total
+    return prefix
+
+
+def split_rendered(answer: Rendered, limit: int = MessageLimit.MAX_TEXT_LENGTH) -> List[Rendered]:
+    """
+    Cut `answer` into pages of at most `limit` UTF-16 units.
+
+    Cuts go at the strongest separator that still fills at least half a page and lies
+    outside every entity. Only when no such point exists (e.g. one code block longer
+    than a page) is an entity cut, preferably at a line break, and continued on the
+    next page.
+    """
+    text = answer.text
+    prefix = _utf16_prefix(text)
+    if prefix[-1] <= limit:
+        return [answer]
+    # Entity bounds in str indices
+    spans = [
+        (bisect.bisect_left(prefix, e.offset), bisect.bisect_left(prefix, e.offset + e.length), e)
+        for e in answer.entities
+    ]
+
+    def inside_entity(pos: int) -> bool:
+        return any(start < pos < end for start, end, _ in spans)
+
+    pages = []
+    pos = 0
+    n = len(text)
+    while pos < n:
+        while pos < n and text[pos].isspace():
+            pos += 1
+        if pos >= n:
+            break
+        hard_end = bisect.bisect_right(prefix, prefix[pos] + limit) - 1
+        end = hard_end if hard_end >= n else _cut(text, pos, hard_end, int(limit * _MIN_FILL), prefix, inside_entity)
+        pages.append(_slice(text, pos, end, spans, prefix))
+        pos = end
+    return pages
+
+
+def _cut(text: str, pos: int, hard_end: int, min_fill: int, prefix: List[int], inside_entity) -> int:
+    # Outside entities if at all possible; otherwise still at a line or word boundary
+    for outside_only in (True, False):
+        for separator in _SEPARATORS:
+            at = text.rfind(separator, pos, hard_end)
+            while at != -1 and prefix[at] - prefix[pos] >= min_fill:
+                cut = at + len(separator)
+                if cut <= hard_end and not (outside_only and inside_entity(cut)):
+                    return cut
+                at = text.rfind(separator, pos, at)
+    return hard_end
+
+
+def _slice(text: str, start: int, end: int, spans, prefix: List[int]) -> Rendered:
+    piece = text[start:end].rstrip()
+    end = start + len(piece)
+    entities = []
+    for s, e, entity in spans:
+        s, e = max(s, start), min(e, end)
+        if e > s:
+            entities.append(MessageEntity(
+                entity.type, prefix[s] - prefix[start], prefix[e] - prefix[s], url=entity.url, language=entity.language
+            ))
+    return Rendered(piece, entities)
+
+
+def _pack(page: Rendered) -> PageData:
+    return page.text, tuple((e.type, e.offset, e.length, e.url, e.language) for e in page.entities)
+
+
+def _unpack(data: PageData) -> Rendered:
+    text, entities = data
+    return Rendered(text, [MessageEntity(t, o, l, url=u, language=lang) for t, o, l, u, lang in entities])
+
+
+def _pages_size(key, pages) -> int:
+    return sum(len(text.encode("utf-8")) + 40 * len(entities) for text, entities in pages) + 64
+
+
+class PageStore:
+    """Pages of long answers by token, in a bounded LRU whose entries expire after `ttl` seconds"""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024, ttl: float = 86400.0):
+        self._cache = LRUCache(max_entries, max_bytes, ttl, sizeof=_pages_size)
+
+    def add(self, pages: List[Rendered]) -> str:
+        token = secrets.token_urlsafe(6)
+        self._cache.set(token, tuple(_pack(page) for page in pages))
+        return token
+
+    def get(self, token: str, index: int) -> Optional[Tuple[Rendered, int]]:
+        """Page `index` and the page count, or None once the answer has expired"""
+        pages = self._cache.get(token)
+        if pages is None or not 0 <= index < len(pages):
+            return None
+        return _unpack(pages[index]), len(pages)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+def page_markup(token: str, index: int, total: int) -> InlineKeyboardMarkup:
+    row = []
+    if index > 0:
+        row.append(InlineKeyboardButton("◀", callback_data=f"{CALLBACK_PREFIX}{token}:{index - 1}"))
+    row.append(InlineKeyboardButton(f"{index + 1}/{total}", callback_data=f"{CALLBACK_PREFIX}{token}:{index}"))
+    if index < total - 1:
+        row.append(InlineKeyboardButton("▶", callback_data=f"{CALLBACK_PREFIX}{token}:{index + 1}"))
+    return InlineKeyboardMarkup([row])
+
+
+def page_content(page: Rendered, token: str, index: int, total: int) -> dict:
+    """Keyword arguments for send/edit calls showing one page with its buttons"""
+    return {"text": page.text, "entities": page.entities, "reply_markup": page_markup(token, index, total)}
+
+
+def first_page(answer: Rendered) -> dict:
+    """Keyword arguments for sending `answer`: all of it, or its first page plus ◀ / ▶ buttons"""
+    pages = split_rendered(answer)
+    if len(pages) == 1:
+        return {"text": pages[0].text, "entities": pages[0].entities}
+    token = page_store.add(pages)
+    return page_content(pages[0], token, 0, len(pages))
+
+
+def parse_callback(data: str) -> Optional[Tuple[str, int]]:
+    """("token", page) from "pg:<token>:<page>" callback data, None if malformed"""
+    token, _, index = data[len(CALLBACK_PREFIX):].rpartition(":")
+    if not token or not index.isdigit():
+        return None
+    return token, int(index)
+
+
+page_store = PageStore(PAGE_STORE_MAX_ENTRIES, PAGE_STORE_MAX_BYTES, PAGE_STORE_TTL)
@@ -0,0 +1,7 @@
+"""
+Priority levels shared by the worker pools and the outbound rate limiter
+"""
+
+# Lower value runs first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
@@ -0,0 +1,243 @@
+"""
+Outbound Bot API rate limiter with flood-control handling
+
+Plugged into the Application builder, so every reply, edit and chat action goes through
+it, whichever handler sends it.
+"""
+
+import asyncio
+import contextlib
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Tuple, Union
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from bot.utils.priorities import PRIORITY_HIGH, PRIORITY_NORMAL
+
+logger = logging.getLogger(__name__)
+
+# Cosmetic calls: sent only when there is spare capacity, dropped otherwise
+LOW_PRIORITY_ENDPOINTS = frozenset({"sendChatAction"})
+# Not subject to flood control; holding these back would only delay incoming updates
+UNLIMITED_ENDPOINTS = frozenset({"getUpdates"})
+
+# Idle chat buckets are swept once this many are tracked
+_MAX_IDLE_BUCKETS = 1024
+
+
+def retry_after_seconds(error: RetryAfter) -> float:
+    """RetryAfter.retry_after as seconds, whether PTB reports an int or a timedelta"""
+    value = error.retry_after
+    return value.total_seconds() if hasattr(value, "total_seconds") else float(value)
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `capacity`"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Seconds until a token is available"""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def reserve(self) -> float:
+        """Take a token now, possibly on credit; returns how long to wait before using it"""
+        self._refill()
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    @property
+    def idle(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+JSONResult = Union[bool, Dict[str, Any], List[Dict[str, Any]]]
+
+
+class PriorityRateLimiter(BaseRateLimiter):
+    """
+    Keep outbound requests under Telegram's flood limits.
+
+    Requests addressed to a chat first wait for that chat's bucket (`per_chat` per
+    second, plus `group_per_minute` for groups and channels), then for the global
+    bucket (`global_rate` per second). The global bucket is handed out by priority:
+    requests replayed after a RetryAfter go first, in their original order, then
+    everything else in arrival order. Low-priority endpoints such as sendChatAction
+    never wait; they are dropped when they cannot go out right away.
+
+    A RetryAfter pauses all limited traffic for the given time, then the request is
+    replayed, up to `max_retries` times.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        per_chat: float = 1.0,
+        group_per_minute: float = 20.0,
+        burst: int = 3,
+        max_retries: int = 3,
+    ):
+        self.burst = burst
+        self.per_chat = per_chat
+        self.group_per_minute = group_per_minute
+        self.max_retries = max_retries
+        self.dropped = 0
+        self.flood_waits = 0
+        self._global = TokenBucket(global_rate, max(1.0, global_rate))
+        self._chats: Dict[Union[int, str], TokenBucket] = {}
+        self._groups: Dict[Union[int, str], TokenBucket] = {}
+        self._heap: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._pump_task: Optional[asyncio.Task] = None
+
+    async def initialize(self) -> None:
+        self._ensure_pump()
+
+    async def shutdown(self) -> None:
+        if self._pump_task is not None:
+            self._pump_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._pump_task
+            self._pump_task = None
+        for _, _, waiter in self._heap:
+            waiter.cancel()
+        self._heap.clear()
+
+    def _ensure_pump(self) -> None:
+        if self._pump_task is None or self._pump_task.done():
+            self._wakeup = asyncio.Event()
+            self._pump_task = asyncio.create_task(self._pump())
+
+    async def _pump(self) -> None:
+        """Hand out global tokens to queued requests, best priority first"""
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+            delay = self._global.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            _, _, waiter = heapq.heappop(self._heap)
+            if not waiter.done():
+                self._global.take()
+                waiter.set_result(None)
+
+    async def _global_slot(self, priority: int, seq: int) -> None:
+        self._ensure_pump()
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (priority, seq, waiter))
+        self._wakeup.set()
+        await waiter
+
+    def _try_now(self, chat_id) -> bool:
+        """Take a global token only if it is free right now and the chat is not backlogged"""
+        if self._heap or time.monotonic() < self._paused_until or self._global.delay() > 0:
+            return False
+        chat = self._chats.get(chat_id)
+        if chat is not None and chat.delay() > 0:
+            return False
+        self._global.take()
+        return True
+
+    def _bucket(self, buckets: Dict, chat_id, rate: float) -> TokenBucket:
+        bucket = buckets.get(chat_id)
+        if bucket is None:
+            if len(buckets) >= _MAX_IDLE_BUCKETS:
+                for key in [key for key, b in buckets.items() if b.idle]:
+                    del buckets[key]
+            bucket = buckets[chat_id] = TokenBucket(rate, self.burst)
+        return bucket
+
+    async def _wait_for_chat(self, chat_id) -> None:
+        delay = self._bucket(self._chats, chat_id, self.per_chat).reserve()
+        # String chat ids only work for channels and supergroups
+        if isinstance(chat_id, str) or chat_id < 0:
+            delay = max(delay, self._bucket(self._groups, chat_id, self.group_per_minute / 60).reserve())
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _wait_for_pause(self) -> None:
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, JSONResult]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[int],
+    ) -> JSONResult:
+        if endpoint in UNLIMITED_ENDPOINTS:
+            return await callback(*args, **kwargs)
+        max_retries = self.max_retries if rate_limit_args is None else rate_limit_args
+        chat_id = data.get("chat_id")
+        with contextlib.suppress(ValueError, TypeError):
+            chat_id = int(chat_id)
+        low_priority = endpoint in LOW_PRIORITY_ENDPOINTS
+        seq = next(self._seq)
+
+        for attempt in itertools.count():
+            if low_priority:
+                if not self._try_now(chat_id):
+                    self.dropped += 1
+                    return True
+            elif chat_id is None:
+                # getUpdates, answerCallbackQuery, getFile, ...: only the flood pause applies
+                await self._wait_for_pause()
+            else:
+                if attempt == 0:
+                    await self._wait_for_chat(chat_id)
+                await self._global_slot(PRIORITY_HIGH if attempt else PRIORITY_NORMAL, seq)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                self.flood_waits += 1
+                retry_after = retry_after_seconds(e)
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after + 0.1)
+                if low_priority:
+                    self.dropped += 1
+                    return True
+                if attempt == max_retries:
+                    logger.error(f"Flood control on {endpoint} persisted after {max_retries} retries")
+                    raise
+                logger.warning(f"Flood control on {endpoint}, replaying in {retry_after:.1f}s")
+
+    def stats(self) -> dict:
+        return {
+            "queued": len(self._heap),
+            "chats": len(self._chats),
+            "dropped": self.dropped,
+            "flood_waits": self.flood_waits,
+            "paused": max(0.0, self._paused_until - time.monotonic()),
+        }
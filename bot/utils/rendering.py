@@ -0,0 +1,269 @@
+"""
+Rendering RAG answers for Telegram
+
+`render_markdown` turns the markdown the RAG backend writes into plain text plus a list
+of MessageEntity objects, in one left-to-right pass. Sending entities instead of a
+MarkdownV2 string means no escaping at all, so an odd character in an answer can never
+make Telegram reject the message. `escape_markdown_v2` remains for the few places that
+still build MarkdownV2 strings.
+"""
+
+import re
+from typing import List, Optional, Tuple
+
+from telegram import MessageEntity
+
+# Characters MarkdownV2 requires to be escaped outside entities, plus the escape itself,
+# which has to come first so the escapes added later are not escaped again
+_MDV2_SPECIAL = "\\_*[]()~`>#+-=|{}.!"
+_MDV2_ESCAPES = tuple((c, "\\" + c) for c in _MDV2_SPECIAL)
+
+# Characters that may start markup; everything between them is copied as one piece
+_INTERESTING = re.compile(r"[\n\\`\[*_~]")
+
+_LINK_SCHEMES = ("http://", "https://", "tg://", "mailto:")
+
+_PAIRED = (
+    ("**", MessageEntity.BOLD),
+    ("__", MessageEntity.BOLD),
+    ("~~", MessageEntity.STRIKETHROUGH),
+    ("*", MessageEntity.ITALIC),
+    ("_", MessageEntity.ITALIC),
+)
+
+
+def escape_markdown_v2(text: str) -> str:
+    """
+    Escape all Telegram MarkdownV2 special characters to prevent parsing errors.
+    """
+    if not isinstance(text, str):
+        text = str(text)
+    # str.replace runs at memchr speed; str.translate with a dict table is ~10x slower
+    for char, escaped in _MDV2_ESCAPES:
+        if char in text:
+            text = text.replace(char, escaped)
+    return text
+
+
+def utf16_len(text: str) -> int:
+    """Length in UTF-16 code units, the unit of MessageEntity offsets"""
+    if text.isascii():
+        return len(text)
+    return len(text.encode("utf-16-le")) // 2
+
+
+class Rendered:
+    """Plain message text and the entities that format it"""
+
+    __slots__ = ("text", "entities")
+
+    def __init__(self, text: str = "", entities: Optional[List[MessageEntity]] = None):
+        self.text = text
+        self.entities = entities or []
+
+    def __add__(self, other) -> "Rendered":
+        if isinstance(other, str):
+            other = Rendered(other)
+        shift = utf16_len(self.text)
+        moved = [
+            MessageEntity(e.type, e.offset + shift, e.length, url=e.url, language=e.language)
+            for e in other.entities
+        ]
+        return Rendered(self.text + other.text, self.entities + moved)
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Rendered) and (self.text, self.entities) == (other.text, other.entities)
+
+    def __repr__(self) -> str:
+        return f"Rendered({self.text!r}, {self.entities!r})"
+
+
+def _word_char(c: str) -> bool:
+    return c.isalnum()
+
+
+class _Parser:
+    """
+    One pass over the source. Output goes into `pieces`; a marker that opens an entity
+    is kept as its own piece so it can stay literal if it is never closed (inline
+    markers do not span lines). Entities refer to piece indices until the end, when a
+    single walk over the pieces turns those into UTF-16 offsets.
+    """
+
+    def __init__(self, src: str):
+        self.src = src
+        self.pieces: List[str] = []
+        # [type, first piece, end piece, url, language]
+        self.spans: List[list] = []
+        # (marker, entity type, index of the marker piece)
+        self.open: List[Tuple[str, str, int]] = []
+        self.no_more = set()
+
+    def emit(self, text: str) -> None:
+        self.pieces.append(text)
+
+    def _find(self, token: str, start: int, same_line: bool = False) -> int:
+        """Position of the next `token`, remembering misses so each token is searched at most once in vain"""
+        if token in self.no_more:
+            return -1
+        end = self.src.find("\n", start) if same_line else -1
+        pos = self.src.find(token, start, end if end != -1 else len(self.src))
+        if pos == -1 and not same_line:
+            self.no_more.add(token)
+        return pos
+
+    def end_line(self) -> None:
+        """Unclosed inline markers stay as literal text"""
+        self.open.clear()
+
+    def toggle(self, marker: str, kind: str, i: int) -> bool:
+        src = self.src
+        before = src[i - 1] if i > 0 else " "
+        after = src[i + len(marker)] if i + len(marker) < len(src) else " "
+        for depth in range(len(self.open) - 1, -1, -1):
+            if self.open[depth][0] == marker:
+                if before.isspace() or (marker == "_" and _word_char(after)):
+                    return False
+                _, _, start = self.open[depth]
+                # Markers opened inside this one and still open stay literal
+                del self.open[depth:]
+                self.pieces[start] = ""
+                if len(self.pieces) > start + 1:
+                    self.spans.append([kind, start + 1, len(self.pieces), None, None])
+                return True
+        if after.isspace() or (marker == "_" and _word_char(before)):
+            return False
+        self.open.append((marker, kind, len(self.pieces)))
+        self.emit(marker)
+        return True
+
+    def parse(self) -> Rendered:
+        src = self.src
+        n = len(src)
+        i = 0
+        line_start = True
+        heading_from: Optional[int] = None
+        while i < n:
+            c = src[i]
+            if line_start:
+                line_start = False
+                hashes = 0
+                while c == "#" and hashes < 7 and src.startswith("#", i + hashes):
+                    hashes += 1
+                if 1 <= hashes <= 6 and src[i + hashes:i + hashes + 1] == " ":
+                    i += hashes + 1
+                    heading_from = len(self.pieces)
+                    continue
+                if c in "-*+" and src[i + 1:i + 2] == " ":
+                    self.emit("• ")
+                    i += 2
+                    continue
+            if c == "\n":
+                self.end_line()
+                if heading_from is not None:
+                    if len(self.pieces) > heading_from:
+                        self.spans.append([MessageEntity.BOLD, heading_from, len(self.pieces), None, None])
+                    heading_from = None
+                self.emit("\n")
+                line_start = True
+                i += 1
+                continue
+            if c == "\\" and i + 1 < n and src[i + 1] in _MDV2_SPECIAL:
+                self.emit(src[i + 1])
+                i += 2
+                continue
+            if c == "`":
+                if src.startswith("```", i):
+                    close = self._find("```", i + 3)
+                    if close != -1:
+                        body = src[i + 3:close]
+                        language = None
+                        first, sep, rest = body.partition("\n")
+                        if sep and first and " " not in first.strip():
+                            language, body = first.strip(), rest
+                        elif sep and not first.strip():
+                            body = rest
+                        body = body.rstrip("\n")
+                        if body:
+                            start = len(self.pieces)
+                            self.emit(body)
+                            self.spans.append([MessageEntity.PRE, start, start + 1, None, language])
+                        i = close + 3
+                        continue
+                    self.emit("```")
+                    i += 3
+                    continue
+                close = self._find("`", i + 1, same_line=True)
+                if close > i + 1:
+                    start = len(self.pieces)
+                    self.emit(src[i + 1:close])
+                    self.spans.append([MessageEntity.CODE, start, start + 1, None, None])
+                    i = close + 1
+                    continue
+                self.emit(c)
+                i += 1
+                continue
+            if c == "[":
+                close = self._find("](", i + 1, same_line=True)
+                end = self._find(")", close + 2, same_line=True) if close != -1 else -1
+                if end != -1:
+                    label, url = src[i + 1:close], src[close + 2:end].strip()
+                    if label and url.startswith(_LINK_SCHEMES):
+                        start = len(self.pieces)
+                        self.emit(label)
+                        self.spans.append([MessageEntity.TEXT_LINK, start, start + 1, url, None])
+                    else:
+                        self.emit(f"{label} ({url})" if label else url)
+                    i = end + 1
+                    continue
+            matched = False
+            for marker, kind in _PAIRED:
+                if src.startswith(marker, i):
+                    if self.toggle(marker, kind, i):
+                        i += len(marker)
+                        matched = True
+                    break
+            if matched:
+                continue
+            # Copy the run of ordinary characters in one go
+            found = _INTERESTING.search(src, i + 1)
+            j = found.start() if found else n
+            self.emit(src[i:j])
+            i = j
+        self.end_line()
+        if heading_from is not None and len(self.pieces) > heading_from:
+            self.spans.append([MessageEntity.BOLD, heading_from, len(self.pieces), None, None])
+        return self._finish()
+
+    def _finish(self) -> Rendered:
+        offsets = [0] * (len(self.pieces) + 1)
+        total = 0
+        for index, piece in enumerate(self.pieces):
+            offsets[index] = total
+            total += utf16_len(piece)
+        offsets[-1] = total
+        entities = []
+        for kind, first, end, url, language in self.spans:
+            offset = offsets[first]
+            length = offsets[end] - offset
+            if length > 0:
+                entities.append(MessageEntity(kind, offset, length, url=url, language=language))
+        entities.sort(key=lambda e: (e.offset, -e.length))
+        return Rendered("".join(self.pieces), entities)
+
+
+def render_markdown(text: str) -> Rendered:
+    """
+    Convert RAG markdown into plain text plus Telegram entities.
+
+    Understands **bold** / __bold__, *italic* / _italic_, ~~strike~~, `code`, fenced
+    ``` blocks (with language), [links](https://...), # headings (shown bold) and
+    -/*/+ bullets (shown as •). Anything that does not form a complete construct is
+    kept as literal text.
+    """
+    if not isinstance(text, str):
+        text = str(text)
+    return _Parser(text.strip()).parse()
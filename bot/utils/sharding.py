@@ -0,0 +1,273 @@
+"""
+Multi-process runtime: one ingress process fans updates out to N worker processes
+
+The ingress (a getUpdates loop or the webhook server) only reads raw update JSON and
+forwards it to the worker that owns the chat, chosen by chat id. All updates of a chat
+therefore land in the same worker, in order, and each worker runs a full Application
+with its own handlers, dispatcher and Bot API connection.
+
+State is per shard unless noted:
+- answer cache, in-flight coalescing, file/speech memory cache: per shard; a chat always
+  hits the same shard, so repeat questions of one chat stay cached
+- file/speech disk cache (FILE_CACHE_PATH): shared, SQLite in WAL mode is multi-process safe
+- worker pools, RAG concurrency limiters and circuit breakers: per shard
+- per-chat Telegram rate limits: consistent, a chat is only ever served by one shard
+- global Telegram rate limit: split evenly, each shard gets TG_RATE_GLOBAL / shards
+- durable jobs (JOB_QUEUE_PATH) and user_data / chat_data / bot_data (PERSISTENCE_PATH):
+  one SQLite file per shard. chat_data follows its chat; user_data and bot_data are per
+  shard too, so a user writing in chats of two shards has two separate user_data. After
+  BOT_SHARDS changes, chats move to other shards and start with empty data there.
+- exported traces (TRACE_EXPORT_PATH): one rotated file per shard, traces-shard2.jsonl
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import queue as queue_module
+import signal
+import time
+from typing import Callable, List, Optional
+
+import httpx
+from telegram import Update
+from telegram.ext import Application
+
+from bot.utils.lifecycle import application_running, stop_on_signals
+from bot.utils.webhook import build_ingress_server
+
+logger = logging.getLogger(__name__)
+
+# Seconds a Telegram long poll is held open
+POLL_TIMEOUT = 50
+# A worker that dies sooner than this after starting is restarted with a growing delay
+_STABLE_AFTER = 30.0
+_MAX_RESTART_DELAY = 60.0
+
+
+def shard_key(data: dict) -> int:
+    """The chat id of a raw update, falling back to the user id, like effective_chat/user"""
+    for name, value in data.items():
+        if name == "update_id" or not isinstance(value, dict):
+            continue
+        for holder in (value, value.get("message")):
+            if isinstance(holder, dict) and isinstance(holder.get("chat"), dict):
+                return int(holder["chat"].get("id", 0))
+        for field in ("from", "user"):
+            if isinstance(value.get(field), dict):
+                return int(value[field].get("id", 0))
+    return 0
+
+
+def shard_for(data: dict, shards: int) -> int:
+    return shard_key(data) % shards
+
+
+class _Worker:
+    __slots__ = ("index", "queue", "process", "started", "restarts", "next_start")
+
+    def __init__(self, index: int, queue):
+        self.index = index
+        self.queue = queue
+        self.process: Optional[multiprocessing.Process] = None
+        self.started = 0.0
+        self.restarts = 0
+        self.next_start = 0.0
+
+
+class ShardSupervisor:
+    """
+    Start `shards` worker processes running `target(index, queue, shards)` and keep them up.
+
+    Each worker reads raw updates from its own bounded queue. A worker that exits is
+    restarted with the same queue, so updates still waiting for it are not lost; one
+    that keeps crashing right after start is restarted with exponential backoff.
+    """
+
+    def __init__(self, shards: int, target: Callable, queue_size: int = 1000, put_timeout: float = 5.0):
+        self.shards = shards
+        self.target = target
+        self.put_timeout = put_timeout
+        self._ctx = multiprocessing.get_context("spawn")
+        self._workers: List[_Worker] = [_Worker(i, self._ctx.Queue(queue_size)) for i in range(shards)]
+        self._stopping = False
+        self.dispatched = 0
+
+    def _spawn(self, worker: _Worker) -> None:
+        worker.process = self._ctx.Process(
+            target=self.target, args=(worker.index, worker.queue, self.shards), name=f"shard-{worker.index}", daemon=False
+        )
+        worker.process.start()
+        worker.started = time.monotonic()
+        logger.info(f"Shard {worker.index} started (pid {worker.process.pid})")
+
+    def start(self) -> None:
+        for worker in self._workers:
+            self._spawn(worker)
+
+    async def dispatch(self, data: dict) -> bool:
+        """Queue a raw update for its shard; False if that shard's queue stayed full"""
+        worker = self._workers[shard_for(data, self.shards)]
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, worker.queue.put, data, True, self.put_timeout)
+        except queue_module.Full:
+            logger.warning(f"Shard {worker.index} queue full, update {data.get('update_id')} refused")
+            return False
+        self.dispatched += 1
+        return True
+
+    def check(self) -> None:
+        """Restart workers that have exited"""
+        now = time.monotonic()
+        for worker in self._workers:
+            if self._stopping or worker.process is None or worker.process.is_alive():
+                continue
+            if worker.next_start == 0.0:
+                lived = now - worker.started
+                delay = 0.0 if lived >= _STABLE_AFTER else min(_MAX_RESTART_DELAY, 2.0 ** min(worker.restarts, 6))
+                worker.next_start = now + delay
+                logger.error(
+                    f"Shard {worker.index} exited with code {worker.process.exitcode} after {lived:.0f}s, "
+                    f"restarting in {delay:.0f}s"
+                )
+            if now >= worker.next_start:
+                worker.restarts += 1
+                worker.next_start = 0.0
+                self._spawn(worker)
+
+    async def supervise(self, stop: asyncio.Event, interval: float = 1.0) -> None:
+        while not stop.is_set():
+            self.check()
+            try:
+                await asyncio.wait_for(stop.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Ask every worker to finish its queue and exit; kill those that do not"""
+        self._stopping = True
+        for worker in self._workers:
+            if worker.process is not None and worker.process.is_alive():
+                worker.queue.put(None)
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            if worker.process is None:
+                continue
+            worker.process.join(max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                logger.warning(f"Shard {worker.index} did not stop in time, killing it")
+                worker.process.kill()
+                worker.process.join()
+
+    def stats(self) -> dict:
+        return {
+            "shards": self.shards,
+            "dispatched": self.dispatched,
+            "alive": sum(1 for w in self._workers if w.process is not None and w.process.is_alive()),
+            "restarts": sum(w.restarts for w in self._workers),
+        }
+
+
+async def bot_api(client: httpx.AsyncClient, api_base: str, token: str, method: str, **params):
+    """Call a Bot API method and return its `result`"""
+    resp = await client.post(f"{api_base}/bot{token}/{method}", json=params, timeout=POLL_TIMEOUT + 10)
+    data = resp.json()
+    if not data.get("ok"):
+        raise RuntimeError(f"{method} failed: {data.get('description', resp.status_code)}")
+    return data.get("result")
+
+
+async def poll_updates(client: httpx.AsyncClient, api_base: str, token: str, dispatch, stop: asyncio.Event) -> None:
+    """getUpdates loop that forwards raw updates; the offset only advances past delivered ones"""
+    await bot_api(client, api_base, token, "deleteWebhook")
+    offset = None
+    failures = 0
+    while not stop.is_set():
+        try:
+            updates = await bot_api(
+                client, api_base, token, "getUpdates",
+                offset=offset, timeout=POLL_TIMEOUT, allowed_updates=Update.ALL_TYPES,
+            )
+            failures = 0
+        except (httpx.HTTPError, RuntimeError, ValueError) as e:
+            failures += 1
+            logger.error(f"getUpdates failed: {e}")
+            await asyncio.sleep(min(30.0, 2.0 ** failures))
+            continue
+        for data in updates:
+            while not await dispatch(data):
+                if stop.is_set():
+                    return
+            offset = data["update_id"] + 1
+
+
+async def run_sharded(
+    token: str,
+    shards: int,
+    target: Callable,
+    api_base: str,
+    mode: str = "polling",
+    queue_size: int = 1000,
+    webhook_url: str = "",
+    webhook_path: str = "/telegram",
+    webhook_secret: str = "",
+    host: str = "0.0.0.0",
+    port: int = 8443,
+    max_connections: int = 40,
+) -> None:
+    """Run the ingress in this process and `shards` supervised workers next to it"""
+    stop = asyncio.Event()
+    stop_on_signals(stop)
+    supervisor = ShardSupervisor(shards, target, queue_size)
+    supervisor.start()
+    supervise = asyncio.create_task(supervisor.supervise(stop))
+    try:
+        async with httpx.AsyncClient() as client:
+            if mode == "webhook":
+                server = build_ingress_server(supervisor.dispatch, webhook_path, webhook_secret, host, port)
+                await server.start()
+                try:
+                    await bot_api(
+                        client, api_base, token, "setWebhook",
+                        url=webhook_url.rstrip("/") + webhook_path, secret_token=webhook_secret,
+                        allowed_updates=Update.ALL_TYPES, max_connections=max_connections,
+                    )
+                    logger.info(f"Webhook set, fanning out to {shards} shards")
+                    await stop.wait()
+                finally:
+                    await server.stop()
+            else:
+                logger.info(f"Polling, fanning out to {shards} shards")
+                poll = asyncio.create_task(poll_updates(client, api_base, token, supervisor.dispatch, stop))
+                await asyncio.wait([poll, asyncio.create_task(stop.wait())], return_when=asyncio.FIRST_COMPLETED)
+                poll.cancel()
+                try:
+                    await poll
+                except asyncio.CancelledError:
+                    pass
+    finally:
+        stop.set()
+        await supervise
+        await asyncio.get_running_loop().run_in_executor(None, supervisor.stop)
+
+
+async def serve_shard(app: Application, queue, poll_interval: float = 1.0) -> None:
+    """Worker side: feed raw updates from the ingress into `app` until told to stop"""
+    # Shutdown is driven by the ingress process, which sends None once it stops accepting
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, signal.SIG_IGN)
+    loop = asyncio.get_running_loop()
+    parent = multiprocessing.parent_process()
+    async with application_running(app):
+        while True:
+            try:
+                data = await loop.run_in_executor(None, queue.get, True, poll_interval)
+            except queue_module.Empty:
+                if parent is not None and not parent.is_alive():
+                    logger.error("Ingress process is gone, shard exiting")
+                    break
+                continue
+            if data is None:
+                break
+            update = Update.de_json(data, app.bot)
+            if update is not None:
+                app.update_queue.put_nowait(update)
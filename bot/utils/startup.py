@@ -0,0 +1,154 @@
+"""
+Keeping cold starts short
+
+- `lazy_callback` defers importing a handler module until its first update
+- `push_commands_if_changed` calls setMyCommands only when the command list changed
+- `profile_startup` (python -m bot.main --startup-profile) shows where startup time goes
+
+Only the standard library is imported here, so the profile can time everything else.
+"""
+
+import asyncio
+import hashlib
+import importlib
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from typing import Awaitable, Callable, Iterable, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Modules `main` registers through lazy_callback, imported on first use
+LAZY_MODULES = ("bot.handlers.start", "bot.handlers.callbacks", "bot.handlers.chat")
+
+_MARKER = "--- lazy handler modules ---"
+
+
+def lazy_callback(target: str) -> Callable[..., Awaitable]:
+    """Coroutine function calling "package.module:function", importing the module on first call"""
+    module_name, _, name = target.partition(":")
+    resolved = None
+
+    async def call(*args, **kwargs):
+        nonlocal resolved
+        if resolved is None:
+            resolved = getattr(importlib.import_module(module_name), name)
+        return await resolved(*args, **kwargs)
+
+    call.__name__ = call.__qualname__ = name
+    return call
+
+
+def commands_digest(bot_id: int, commands: Sequence[Tuple[str, str]]) -> str:
+    return hashlib.sha256(json.dumps([bot_id, list(commands)], ensure_ascii=False).encode()).hexdigest()
+
+
+async def push_commands_if_changed(bot, commands: Sequence[Tuple[str, str]], state_path: str) -> bool:
+    """
+    setMyCommands, unless the digest of the same list for the same bot is stored in
+    `state_path` already. Returns whether the commands were sent. Delete the file to
+    force a push, e.g. after editing the commands in BotFather.
+    """
+    digest = commands_digest(bot.id, commands)
+    if state_path:
+        try:
+            with open(state_path, encoding="utf-8") as f:
+                if f.read().strip() == digest:
+                    return False
+        except OSError:
+            pass
+    await bot.set_my_commands(list(commands))
+    if state_path:
+        try:
+            directory = os.path.dirname(state_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(state_path, "w", encoding="utf-8") as f:
+                f.write(digest)
+        except OSError as e:
+            logger.warning(f"Could not save the bot command digest to {state_path}: {e}")
+    return True
+
+
+def parse_importtime(lines: Iterable[str]) -> List[Tuple[str, int, int]]:
+    """(module, self µs, cumulative µs) from `python -X importtime` output, in import order"""
+    rows = []
+    for line in lines:
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        rows.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    return rows
+
+
+def _import_report(title: str, rows: List[Tuple[str, int, int]], top: int) -> List[str]:
+    total = sum(own for _, own, _ in rows)
+    lines = [f"{title}: {len(rows)} modules, {total / 1000:.1f} ms"]
+    packages = {}
+    for module, own, _ in rows:
+        root = module.split(".")[0] if not module.startswith("bot.") else ".".join(module.split(".")[:3])
+        packages[root] = packages.get(root, 0) + own
+    for name, own in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        lines.append(f"  {own / 1000:8.1f} ms  {name}")
+    return lines
+
+
+async def _time_startup(build, steps, teardown, token: str, online: bool) -> List[str]:
+    lines = ["initialization:"]
+    started = time.perf_counter()
+    app = build(token)
+    lines.append(f"  {(time.perf_counter() - started) * 1000:8.1f} ms  build_application")
+    initialized = False
+    try:
+        if online:
+            started = time.perf_counter()
+            await app.initialize()
+            initialized = True
+            lines.append(f"  {(time.perf_counter() - started) * 1000:8.1f} ms  Application.initialize (getMe)")
+        for label, step, needs_network in steps:
+            if needs_network and not online:
+                lines.append(f"  {'skipped':>11}  {label} (needs TELEGRAM_BOT_TOKEN)")
+                continue
+            started = time.perf_counter()
+            await step(app)
+            lines.append(f"  {(time.perf_counter() - started) * 1000:8.1f} ms  {label}")
+    finally:
+        for step in teardown:
+            await step(app)
+        if initialized:
+            await app.shutdown()
+    return lines
+
+
+def profile_startup(build, steps, teardown, top: int = 12) -> str:
+    """
+    Startup time by package, measured in a fresh interpreter with -X importtime:
+    what `import bot.main` costs, what the lazily loaded handler modules add on the
+    first update. Then `build(token)` and each (label, step, needs_network) of `steps`
+    timed in this process; getMe and network steps only run with a real token.
+    """
+    code = (
+        "import sys, bot.main; "
+        f"print({_MARKER!r}, file=sys.stderr, flush=True); "
+        + "; ".join(f"import {module}" for module in LAZY_MODULES)
+    )
+    started = time.perf_counter()
+    child = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=False
+    )
+    wall = (time.perf_counter() - started) * 1000
+    if child.returncode != 0:
+        return f"profiling interpreter failed:\n{child.stderr[-2000:]}"
+    before, _, after = child.stderr.partition(_MARKER)
+    report = [f"interpreter start + imports: {wall:.0f} ms wall"]
+    report += _import_report("import bot.main", parse_importtime(before.splitlines()), top)
+    report += _import_report("first update (lazy)", parse_importtime(after.splitlines()), top)
+
+    token = os.getenv("TELEGRAM_BOT_TOKEN", "")
+    report += asyncio.run(_time_startup(build, steps, teardown, token or "123456:startup-profile", bool(token)))
+    return "\n".join(report)
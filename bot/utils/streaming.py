@@ -0,0 +1,142 @@
+"""
+Progressive rendering of streamed answers by editing one Telegram message in place
+"""
+
+import asyncio
+import logging
+import time
+from typing import Callable, List, Optional, Union
+
+from telegram import Message
+from telegram.constants import MessageLimit
+from telegram.error import BadRequest, RetryAfter
+
+from bot.config import STREAM_EDIT_INTERVAL, STREAM_EDIT_INTERVAL_GROUP
+from bot.utils.rate_limiter import retry_after_seconds
+from bot.utils.pagination import first_page
+from bot.utils.rendering import Rendered, utf16_len
+
+logger = logging.getLogger(__name__)
+
+CURSOR = " ▌"
+
+
+class StreamingReply:
+    """
+    Post a placeholder reply and keep editing it with the text received so far.
+
+    Every edit re-renders the whole accumulated plain text with `render` (e.g.
+    render_markdown, or the MarkdownV2 escaper together with `parse_mode`), so each
+    intermediate message is valid on its own. Edits are
+    throttled to `min_interval` seconds; tokens arriving in between are batched into the
+    next edit. A flood-control error postpones the next edit instead of stalling the stream.
+    """
+
+    def __init__(
+        self,
+        message: Message,
+        render: Callable[[str], Union[str, Rendered]] = str,
+        parse_mode: Optional[str] = None,
+        placeholder: str = "⏳",
+        min_interval: Optional[float] = None,
+    ):
+        self.message = message
+        self.render = render
+        self.parse_mode = parse_mode
+        self.placeholder = placeholder
+        if min_interval is None:
+            is_group = getattr(message.chat, "type", "private") != "private"
+            min_interval = STREAM_EDIT_INTERVAL_GROUP if is_group else STREAM_EDIT_INTERVAL
+        self.min_interval = min_interval
+        self.edits = 0
+        self._parts: List[str] = []
+        self._sent: Optional[Message] = None
+        self._shown = ""
+        self._next_edit_at = 0.0
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    async def start(self) -> None:
+        self._sent = await self.message.reply_text(self.placeholder)
+        self._next_edit_at = time.monotonic() + self.min_interval
+
+    async def feed(self, chunk: str) -> None:
+        self._parts.append(chunk)
+        if time.monotonic() >= self._next_edit_at:
+            await self._edit(self._fit(self.text, reserve=utf16_len(CURSOR)) + CURSOR)
+
+    async def finish(self, text: Optional[str] = None) -> None:
+        """
+        Show the complete answer. A rendered answer longer than one message is paged with
+        ◀ / ▶ buttons in the same message; plain text beyond it goes into follow-up replies.
+        """
+        if text is not None:
+            self._parts = [text]
+        remaining = self.text or self.placeholder
+        rendered = self.render(remaining)
+        if isinstance(rendered, Rendered) and utf16_len(rendered.text) > MessageLimit.MAX_TEXT_LENGTH:
+            await self._edit(remaining, final=True, content=first_page(rendered))
+            return
+        first = True
+        while remaining:
+            # Always move on, even if not a single character fits after rendering
+            piece = self._fit(remaining) or remaining[:1]
+            remaining = remaining[len(piece):]
+            if first:
+                await self._edit(piece, final=True)
+                first = False
+            else:
+                await self.message.reply_text(**self._content(piece))
+
+    def _content(self, text: str) -> dict:
+        rendered = self.render(text)
+        if isinstance(rendered, Rendered):
+            return {"text": rendered.text, "entities": rendered.entities}
+        return {"text": rendered, "parse_mode": self.parse_mode}
+
+    def _rendered_len(self, text: str) -> int:
+        """Length of the rendering of `text` in UTF-16 units, the unit of Telegram's limit"""
+        rendered = self.render(text)
+        return utf16_len(rendered.text if isinstance(rendered, Rendered) else rendered)
+
+    def _fit(self, text: str, reserve: int = 0) -> str:
+        """Longest prefix of `text` whose rendering fits into one message"""
+        limit = MessageLimit.MAX_TEXT_LENGTH - reserve
+        if self._rendered_len(text) <= limit:
+            return text
+        # Rendering only ever grows text, so the plain length is an upper bound to shrink from
+        end = min(len(text), limit)
+        excess = self._rendered_len(text[:end]) - limit
+        while end > 0 and excess > 0:
+            end = max(0, end - max(1, excess // 2))
+            excess = self._rendered_len(text[:end]) - limit
+        return text[:end]
+
+    async def _edit(self, text: str, final: bool = False, content: Optional[dict] = None) -> None:
+        if text == self._shown:
+            return
+        for attempt in range(2 if final else 1):
+            try:
+                await self._sent.edit_text(**(content or self._content(text)))
+                self._shown = text
+                self.edits += 1
+                break
+            except RetryAfter as e:
+                retry_after = retry_after_seconds(e)
+                self._next_edit_at = time.monotonic() + retry_after
+                if final and attempt == 0:
+                    await asyncio.sleep(retry_after)
+                    continue
+                return
+            except BadRequest as e:
+                if "not modified" in str(e).lower():
+                    self._shown = text
+                    break
+                if not final:
+                    # An intermediate edit is only a preview: skip it, the next one may pass
+                    logger.warning(f"Stream edit rejected: {e}")
+                    break
+                raise
+        self._next_edit_at = time.monotonic() + self.min_interval
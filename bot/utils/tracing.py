@@ -0,0 +1,256 @@
+"""
+Per-update traces: where the time of one message went
+
+A trace starts when a message is picked up and lives in a context variable, so every
+coroutine and task working on that message adds its spans (typing action, getFile,
+download, RAG call, rendering, reply) to it without passing it around. The trace id
+goes to the RAG API in the X-Trace-Id header. Finished traces are written as JSON
+lines: a sampled share of them, and every trace slower than the threshold. Like log
+records, they are queued and written by a background thread, to a size-capped file
+that is rotated.
+"""
+
+import json
+import logging
+import os
+import queue
+import random
+import secrets
+import time
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, List, Optional, Tuple
+
+from bot.config import (
+    TRACE_ENABLED,
+    TRACE_EXPORT_BACKUPS,
+    TRACE_EXPORT_MAX_BYTES,
+    TRACE_EXPORT_PATH,
+    TRACE_SAMPLE_RATE,
+    TRACE_SLOW_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+TRACE_HEADER = "X-Trace-Id"
+
+
+class Trace:
+    """One unit of work: an id, attributes and the spans recorded while it ran"""
+
+    __slots__ = ("trace_id", "name", "attrs", "spans", "started_at", "started")
+
+    def __init__(self, name: str, trace_id: Optional[str] = None, **attrs):
+        self.trace_id = trace_id or secrets.token_hex(8)
+        self.name = name
+        self.attrs = attrs
+        # (name, started, ended, attrs) with perf_counter times
+        self.spans: List[Tuple[str, float, float, dict]] = []
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def to_dict(self, duration: float) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "start": round(self.started_at, 3),
+            "duration_ms": round(duration * 1000, 1),
+            **self.attrs,
+            "spans": [
+                {
+                    "name": name,
+                    "start_ms": round((started - self.started) * 1000, 1),
+                    "duration_ms": round((ended - started) * 1000, 1),
+                    **attrs,
+                }
+                for name, started, ended, attrs in self.spans
+            ],
+        }
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+def current_trace_id() -> Optional[str]:
+    trace = _current.get()
+    return trace.trace_id if trace is not None else None
+
+
+def trace_headers() -> Dict[str, str]:
+    """The X-Trace-Id header for outgoing requests, empty outside a trace"""
+    trace = _current.get()
+    return {TRACE_HEADER: trace.trace_id} if trace is not None else {}
+
+
+class _Span:
+    __slots__ = ("trace", "name", "attrs", "started")
+
+    def __init__(self, trace: Trace, name: str, attrs: dict):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.trace.spans.append((self.name, self.started, time.perf_counter(), self.attrs))
+        return False
+
+
+class _NoSpan:
+    """Stands in for spans and traces when nothing is traced; does nothing"""
+
+    __slots__ = ()
+    trace_id = None
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str, **attrs):
+    """Context manager timing one step of the current trace; a no-op outside a trace"""
+    trace = _current.get()
+    if trace is None:
+        return _NO_SPAN
+    return _Span(trace, name, attrs)
+
+
+def add_span(name: str, started: float, **attrs) -> None:
+    """Record a step that began at perf_counter() `started` and ends now, for code that can't use `span`"""
+    trace = _current.get()
+    if trace is not None:
+        trace.spans.append((name, started, time.perf_counter(), attrs))
+
+
+class _TraceScope:
+    __slots__ = ("tracer", "trace", "token")
+
+    def __init__(self, tracer: "Tracer", trace: Trace):
+        self.tracer = tracer
+        self.trace = trace
+
+    def __enter__(self) -> Trace:
+        self.token = _current.set(self.trace)
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self.token)
+        if exc_type is not None:
+            self.trace.attrs.setdefault("error", exc_type.__name__)
+        self.tracer.finish(self.trace, time.perf_counter() - self.trace.started)
+        return False
+
+
+class Tracer:
+    """
+    Starts traces and exports finished ones to `path` as JSON lines (to the log if empty).
+
+    A trace is exported when it took at least `slow` seconds, or otherwise with
+    probability `sample_rate`. Lines are handed to a writer thread; the file is rotated
+    at `max_bytes`, keeping `backups` older files.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        sample_rate: float = 0.05,
+        slow: float = 10.0,
+        path: str = "",
+        max_bytes: int = 64 * 1024 * 1024,
+        backups: int = 3,
+    ):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.slow = slow
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.exported = 0
+        self.dropped = 0
+        self._writer: Optional[logging.Logger] = None
+        self._listener: Optional[QueueListener] = None
+
+    def trace(self, name: str, trace_id: Optional[str] = None, **attrs):
+        """Context manager running its body inside a new trace; yields the Trace"""
+        if not self.enabled:
+            return _NO_SPAN
+        return _TraceScope(self, Trace(name, trace_id, **attrs))
+
+    def finish(self, trace: Trace, duration: float) -> None:
+        if duration < self.slow and random.random() >= self.sample_rate:
+            self.dropped += 1
+            return
+        self.exported += 1
+        record = trace.to_dict(duration)
+        if duration >= self.slow:
+            record["slow"] = True
+        self.export(json.dumps(record, ensure_ascii=False, default=str))
+
+    def _open(self) -> logging.Logger:
+        """A private logger whose records go through a queue to a rotating file"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handler = RotatingFileHandler(self.path, maxBytes=self.max_bytes, backupCount=self.backups, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        records = queue.SimpleQueue()
+        self._listener = QueueListener(records, handler)
+        self._listener.start()
+        writer = logging.getLogger(f"{__name__}.export.{id(self)}")
+        writer.propagate = False
+        writer.setLevel(logging.INFO)
+        writer.handlers[:] = [QueueHandler(records)]
+        return writer
+
+    def export(self, line: str) -> None:
+        if not self.path:
+            logger.info(line)
+            return
+        try:
+            if self._writer is None:
+                self._writer = self._open()
+        except OSError as e:
+            logger.warning(f"Could not write trace to {self.path}: {e}")
+            return
+        self._writer.info(line)
+
+    def close(self) -> None:
+        """Write out the queued traces and stop the writer thread"""
+        if self._listener is not None:
+            listener, self._listener = self._listener, None
+            listener.stop()
+            for handler in listener.handlers:
+                handler.close()
+            self._writer.handlers.clear()
+            self._writer = None
+
+    def stats(self) -> dict:
+        return {"exported": self.exported, "dropped": self.dropped}
+
+
+tracer = Tracer(
+    TRACE_ENABLED, TRACE_SAMPLE_RATE, TRACE_SLOW_SECONDS, TRACE_EXPORT_PATH, TRACE_EXPORT_MAX_BYTES, TRACE_EXPORT_BACKUPS
+)
@@ -0,0 +1,75 @@
+"""
+Concurrent update processing that keeps updates from the same chat in order
+"""
+
+import asyncio
+from typing import Any, Awaitable, Dict, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+def chat_key(update: object) -> Optional[int]:
+    """Return the chat id an update belongs to, or None for chat-less updates"""
+    if isinstance(update, Update):
+        if update.effective_chat:
+            return update.effective_chat.id
+        if update.effective_user:
+            return update.effective_user.id
+    return None
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """
+    Run up to `max_concurrent_updates` handlers at once while serializing updates per chat.
+
+    An update first waits for its chat's lock (FIFO, so a follow-up never overtakes an
+    earlier question) and only then takes one of the global running slots. Updates waiting
+    behind their own chat therefore do not block other chats. `max_pending` bounds how many
+    updates may be admitted (running or waiting) at any time.
+    """
+
+    __slots__ = ("_running", "_chat_locks", "_chat_waiters")
+
+    def __init__(self, max_concurrent_updates: int, max_pending: Optional[int] = None):
+        if max_concurrent_updates < 1:
+            raise ValueError("`max_concurrent_updates` must be a positive integer!")
+        super().__init__(max(max_pending or max_concurrent_updates * 8, max_concurrent_updates))
+        self._running = asyncio.Semaphore(max_concurrent_updates)
+        self._chat_locks: Dict[int, asyncio.Lock] = {}
+        self._chat_waiters: Dict[int, int] = {}
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = chat_key(update)
+        if key is None:
+            async with self._running:
+                await coroutine
+            return
+
+        lock = self._chat_locks.get(key)
+        if lock is None:
+            lock = self._chat_locks[key] = asyncio.Lock()
+        self._chat_waiters[key] = self._chat_waiters.get(key, 0) + 1
+        try:
+            async with lock:
+                async with self._running:
+                    await coroutine
+        finally:
+            # Drop the lock once nobody else is queued for this chat so the dict stays small
+            remaining = self._chat_waiters[key] - 1
+            if remaining:
+                self._chat_waiters[key] = remaining
+            else:
+                del self._chat_waiters[key]
+                del self._chat_locks[key]
+
+    @property
+    def active_chats(self) -> int:
+        """Number of chats with at least one update running or queued"""
+        return len(self._chat_locks)
+
+    async def initialize(self) -> None:
+        """Nothing to allocate"""
+
+    async def shutdown(self) -> None:
+        """Nothing to free"""
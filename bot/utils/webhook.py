@@ -0,0 +1,111 @@
+"""
+Webhook ingress: Telegram POSTs updates to an embedded HTTP server instead of being polled
+"""
+
+import asyncio
+import hmac
+import logging
+from typing import Awaitable, Callable, Optional
+
+from telegram import Update
+from telegram.ext import Application
+
+from bot.utils.http_server import HTTPServer, Request, Response
+from bot.utils.lifecycle import application_running, stop_on_signals
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+
+# Takes one raw update; False means it could not be accepted right now
+Deliver = Callable[[dict], Awaitable[bool]]
+
+
+def deliver_to(app: Application) -> Deliver:
+    """Parse raw updates and put them on `app`'s update queue"""
+
+    async def deliver(data: dict) -> bool:
+        update = Update.de_json(data, app.bot)
+        if update is None:
+            raise ValueError("empty update")
+        app.update_queue.put_nowait(update)
+        return True
+
+    return deliver
+
+
+class WebhookHandler:
+    """
+    Accept update POSTs and pass them to `deliver`.
+
+    Each update is checked against the secret token and acknowledged as soon as it
+    is handed over; handlers run later on the dispatcher, so a slow RAG call never
+    holds up Telegram's request. A refused delivery answers 503, which Telegram retries.
+    """
+
+    def __init__(self, deliver: Deliver, secret: str):
+        self.deliver = deliver
+        self._secret = secret.encode("utf-8")
+        self.received = 0
+        self.rejected = 0
+
+    async def __call__(self, request: Request) -> Response:
+        token = request.headers.get(SECRET_HEADER, "").encode("utf-8")
+        if not hmac.compare_digest(token, self._secret):
+            self.rejected += 1
+            return Response(b"forbidden", 403)
+        try:
+            data = request.json()
+            if not isinstance(data, dict):
+                raise ValueError("update is not an object")
+            accepted = await self.deliver(data)
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            logger.warning(f"Discarding malformed webhook update: {e}")
+            return Response(b"bad request", 400)
+        if not accepted:
+            return Response(b"busy", 503)
+        self.received += 1
+        return Response(b"", 200)
+
+
+def build_webhook_server(app: Application, path: str, secret: str, host: str, port: int) -> HTTPServer:
+    return build_ingress_server(deliver_to(app), path, secret, host, port)
+
+
+def build_ingress_server(deliver: Deliver, path: str, secret: str, host: str, port: int) -> HTTPServer:
+    server = HTTPServer(host, port)
+    server.route("POST", path, WebhookHandler(deliver, secret))
+    return server
+
+
+async def run_webhook(
+    app: Application,
+    url: str,
+    path: str,
+    secret: str,
+    host: str = "0.0.0.0",
+    port: int = 8443,
+    max_connections: int = 40,
+    stop: Optional[asyncio.Event] = None,
+) -> None:
+    """
+    Serve `app` behind a webhook until SIGINT/SIGTERM (or `stop` is set).
+
+    The webhook is registered with Telegram only after the local server is listening.
+    """
+    stop = stop or asyncio.Event()
+    stop_on_signals(stop)
+    server = build_webhook_server(app, path, secret, host, port)
+    async with application_running(app):
+        await server.start()
+        try:
+            await app.bot.set_webhook(
+                url=url.rstrip("/") + path,
+                secret_token=secret,
+                allowed_updates=Update.ALL_TYPES,
+                max_connections=max_connections,
+            )
+            logger.info(f"Webhook set, serving updates on {host}:{server.port}{path}")
+            await stop.wait()
+        finally:
+            await server.stop()
@@ -0,0 +1,77 @@
+import time
+
+import pytest
+
+from bot.services.cache import DiskResultStore, FileResultCache, LRUCache, normalize_query
+
+
+def test_normalize_query_folds_case_punctuation_and_whitespace():
+    assert normalize_query("  Do I need a Privacy Policy?? ") == "do i need a privacy policy"
+    assert normalize_query("GDPR,  what is it!") == normalize_query("gdpr what is it")
+
+
+def test_normalize_query_burmese():
+    # Burmese full stop and zero-width spaces are dropped, NFC/NFD forms compare equal
+    assert normalize_query("\u1019\u1004\u103a\u1039\u1002\u101c\u102c\u1015\u102b\u104b") == \
+        normalize_query("\u1019\u1004\u103a\u1039\u1002\u101c\u102c\u200b\u1015\u102b")
+    assert normalize_query("\u1026") == normalize_query("\u1025\u102e")
+
+
+def test_lru_eviction_and_counters():
+    cache = LRUCache(max_entries=2, ttl=60)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_ttl_and_memory_cap():
+    cache = LRUCache(max_entries=100, max_bytes=200, ttl=60, sizeof=lambda k, v: len(v))
+    cache.set("short", "x" * 10, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("short") is None
+    assert cache.stats()["expirations"] == 1
+    cache.set("a", "x" * 150)
+    cache.set("b", "x" * 100)
+    assert "a" not in cache and "b" in cache
+    cache.set("huge", "x" * 500)
+    assert "huge" not in cache
+
+
+@pytest.mark.asyncio
+async def test_file_results_survive_restart_via_disk_tier(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    cache = FileResultCache(LRUCache(), DiskResultStore(path))
+    await cache.set("file", "uniq-1", "abc123", "Summarize this!", {"response": "summary"})
+
+    restarted = FileResultCache(LRUCache(), DiskResultStore(path))
+    assert await restarted.get("file", "uniq-1", "summarize this") == {"response": "summary"}
+    assert await restarted.get_by_digest("file", "abc123", "SUMMARIZE THIS") == {"response": "summary"}
+    assert await restarted.get("file", "uniq-1", "another question") is None
+    assert await restarted.get("speech", "uniq-1", "summarize this") is None
+
+
+def test_disk_tier_is_size_bounded(tmp_path):
+    store = DiskResultStore(str(tmp_path / "results.sqlite3"), max_bytes=100)
+    for i in range(10):
+        store.set(f"k{i}", "x" * 30)
+    assert store.get("k9") == "x" * 30
+    assert store.get("k0") is None
+
+
+def test_disk_tier_keeps_a_running_size_total(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    store = DiskResultStore(path, max_bytes=1000)
+    store.set("a", "x" * 30)
+    store.set("b", "x" * 30)
+    store.set("a", "x" * 10)
+    assert store.bytes == 32 + 12
+    store.ttl = -1
+    store.set("c", "x" * 10)
+    assert store.get("c") is None
+    assert store.bytes == 32 + 12
+    # Summed once when the file is opened
+    assert DiskResultStore(path).bytes == 32 + 12
@@ -0,0 +1,63 @@
+import types
+
+import pytest
+
+from bot.handlers import callbacks
+from bot.handlers.callbacks import COMING_SOON_TEXT, button_callback, find_route
+from bot.utils.pagination import page_store
+from bot.utils.rendering import Rendered
+
+
+class Query:
+    def __init__(self, data):
+        self.data = data
+        self.log = []
+        self.message = types.SimpleNamespace(reply_photo=self._reply_photo, reply_text=self._reply_text)
+
+    async def edit_message_text(self, text, reply_markup=None, **kwargs):
+        self.log.append(("edit", text, reply_markup))
+
+    async def answer(self, text=None, show_alert=False):
+        self.log.append(("answer", text))
+
+    async def _reply_photo(self, photo, caption, parse_mode=None):
+        self.log.append(("photo", photo))
+
+    async def _reply_text(self, text, parse_mode=None):
+        self.log.append(("reply", text))
+
+
+async def click(data):
+    query = Query(data)
+    await button_callback(types.SimpleNamespace(callback_query=query), None)
+    return query.log
+
+
+@pytest.mark.asyncio
+async def test_detail_screens_are_routed():
+    for data in ("cyber_threats", "emergency_breach", "quick_actions", "template_gdpr_checklist"):
+        (kind, text, keyboard), = await click(data)
+        assert kind == "edit" and keyboard is not None and text != COMING_SOON_TEXT
+    (_, _, keyboard), = await click("cyber_threats")
+    assert keyboard.inline_keyboard[0][0].callback_data == "cybersecurity"
+
+
+@pytest.mark.asyncio
+async def test_usage_screens_reply_to_the_clicked_message():
+    assert await click("text_usage") == [("photo", "https://pivotaimm.vercel.app/ask.jpg")]
+    (kind, _), = await click("better_experience")
+    assert kind == "reply"
+
+
+@pytest.mark.asyncio
+async def test_unknown_data_gets_coming_soon_alert():
+    assert await click("cyber_policies") == [("answer", COMING_SOON_TEXT)]
+
+
+@pytest.mark.asyncio
+async def test_page_buttons_are_routed_by_prefix():
+    token = page_store.add([Rendered("first"), Rendered("second")])
+    assert find_route(f"pg:{token}:1") is callbacks.show_page
+    (kind, text, keyboard), answer = await click(f"pg:{token}:1")
+    assert (kind, text, answer) == ("edit", "second", ("answer", None))
+    assert (await click("pg:gone:0"))[0][0] == "answer"
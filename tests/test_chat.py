@@ -1,63 +1,119 @@
+import types
+
+import httpx
 import pytest
-import asyncio
-from unittest.mock import AsyncMock, patch
-from bot.services.rag_api import query_rag
+import pytest_asyncio
+
+from bot.handlers import chat as chat_handler
+from bot.services import jobs, rag_api
+from bot.services.rag_api import USER_FRIENDLY_ERRORS
+
+
+async def _with_transport(handler):
+    await rag_api.close_client()
+    rag_api.answer_cache.clear()
+    await rag_api.init_client(transport=httpx.MockTransport(handler))
+
+
+@pytest_asyncio.fixture
+async def rag_client():
+    yield _with_transport
+    await rag_api.close_client()
+
 
 @pytest.mark.asyncio
-async def test_query_rag_success():
-    mock_response = {"response": "Hello!"}
-    with patch("httpx.AsyncClient.post") as mock_post:
-        mock_post.return_value.__aenter__.return_value.json = AsyncMock(return_value=mock_response)
-        mock_post.return_value.__aenter__.return_value.raise_for_status = AsyncMock()
-        result = await query_rag("Hi")
-        assert result == "Hello!"
+async def test_query_text_success(rag_client):
+    await rag_client(lambda request: httpx.Response(200, json={"response": "Hello!"}))
+    assert await rag_api.query_text("Hi") == "Hello!"
+
 
 @pytest.mark.asyncio
-async def test_query_rag_error():
-    with patch("httpx.AsyncClient.post", side_effect=Exception("API down")):
-        result = await query_rag("Hi")
-        assert "RAG API error" in result
+async def test_query_text_error(rag_client):
+    def handler(request):
+        if request.method == "HEAD":
+            return httpx.Response(200)
+        raise RuntimeError("API down")
+
+    await rag_client(handler)
+    assert await rag_api.query_text("Hi") == USER_FRIENDLY_ERRORS["unknown"]
 
-# Test the chat_message handler (integration style)
-import types
-from bot.handlers import chat as chat_handler
 
+# Test the chat_message handler (integration style)
 class DummyMessage:
     def __init__(self, text):
         self.text = text
+        self.caption = None
+        self.voice = self.audio = self.photo = self.document = None
+        self.chat_id = 123
+        self.message_id = 1
         self.replied = None
-    async def reply_text(self, text):
+
+    async def reply_text(self, text, **kwargs):
         self.replied = text
 
+
 class DummyBot:
     async def send_chat_action(self, chat_id, action):
         pass
 
+
 class DummyUpdate:
     def __init__(self, text):
         self.message = DummyMessage(text)
         self.effective_chat = types.SimpleNamespace(id=123)
 
+
 class DummyContext:
     def __init__(self):
         self.bot = DummyBot()
 
+
+@pytest.fixture
+def no_streaming(monkeypatch):
+    monkeypatch.setattr(chat_handler, "RAG_STREAMING", False)
+
+
 @pytest.mark.asyncio
-async def test_chat_message_success(monkeypatch):
-    async def mock_query_rag(query):
+async def test_chat_message_success(monkeypatch, no_streaming):
+    async def mock_query_text(query, history=None):
         return "Test response"
-    monkeypatch.setattr(chat_handler, "query_rag", mock_query_rag)
+    monkeypatch.setattr(chat_handler, "query_text", mock_query_text)
     update = DummyUpdate("Hello")
-    context = DummyContext()
-    await chat_handler.chat_message(update, context)
+    await chat_handler.chat_message(update, DummyContext())
     assert update.message.replied == "Test response"
 
+
 @pytest.mark.asyncio
-async def test_chat_message_error(monkeypatch):
-    async def mock_query_rag(query):
+async def test_chat_message_error(monkeypatch, no_streaming):
+    async def mock_query_text(query, history=None):
         raise Exception("fail")
-    monkeypatch.setattr(chat_handler, "query_rag", mock_query_rag)
+    monkeypatch.setattr(chat_handler, "query_text", mock_query_text)
     update = DummyUpdate("Hello")
-    context = DummyContext()
-    await chat_handler.chat_message(update, context)
-    assert "Sorry, something went wrong" in update.message.replied 
\ No newline at end of file
+    await chat_handler.chat_message(update, DummyContext())
+    assert "Sorry, something went wrong" in update.message.replied
+
+
+class DummyJobBot:
+    def __init__(self):
+        self.edited = []
+
+    async def edit_message_text(self, chat_id, message_id, text, **kwargs):
+        self.edited.append(text)
+
+
+@pytest.mark.asyncio
+async def test_busy_backend_retries_the_job_until_the_last_attempt(monkeypatch):
+    async def busy(query, source, filename, history=None):
+        return {"detail": USER_FRIENDLY_ERRORS["busy"], "retryable": True}
+    monkeypatch.setattr(chat_handler, "query_text_with_file", busy)
+    payload = {
+        "chat_id": 123, "message_id": 1, "ack_message_id": 2, "file_id": "f", "file_unique_id": "u",
+        "file_size": 5, "filename": "doc.pdf", "query": "Summary?",
+    }
+    bot = DummyJobBot()
+    with pytest.raises(jobs.RetryableJobError):
+        await chat_handler.run_job(bot, jobs.Job(1, "file", payload, attempts=1, max_attempts=2))
+    assert bot.edited == []
+
+    await chat_handler.run_job(bot, jobs.Job(1, "file", payload, attempts=2, max_attempts=2))
+    assert bot.edited == [USER_FRIENDLY_ERRORS["busy"]]
@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+import pytest
+
+from bot.services.jobs import JobRunner, JobStore, shard_path
+
+
+def test_claim_hides_job_until_visibility_timeout(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"), visibility_timeout=0.05, max_attempts=3)
+    job_id = store.enqueue("file", {"file_id": "abc"})
+    job = store.claim("file")
+    assert (job.id, job.payload, job.attempts) == (job_id, {"file_id": "abc"}, 1)
+    assert store.claim("file") is None
+    assert store.claim("speech") is None
+    time.sleep(0.06)
+    # The first worker never reported back: the job is handed out again
+    again = store.claim("file")
+    assert (again.id, again.attempts) == (job_id, 2)
+    store.complete(again)
+    assert store.counts() == {}
+
+
+def test_failed_job_goes_to_dead_letters(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"), max_attempts=2)
+    store.enqueue("speech", {"file_id": "v"})
+    assert store.fail(store.claim("speech"), "boom", retry_delay=0) is False
+    assert store.fail(store.claim("speech"), "boom again", retry_delay=0) is True
+    assert store.claim("speech") is None
+    [dead] = store.dead_letters()
+    assert dead["attempts"] == 2 and dead["error"] == "boom again"
+
+
+def test_jobs_survive_reopen(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    store = JobStore(path)
+    store.enqueue("file", {"n": 1})
+    store.claim("file")
+    store.close()
+    reopened = JobStore(path)
+    assert reopened.release_running() == 1
+    assert reopened.claim("file").payload == {"n": 1}
+
+
+def test_shard_path():
+    assert shard_path("data/jobs.sqlite3", None) == "data/jobs.sqlite3"
+    assert shard_path("data/jobs.sqlite3", 2) == "data/jobs-shard2.sqlite3"
+
+
+@pytest.mark.asyncio
+async def test_runner_retries_then_reports_dead_job(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"), max_attempts=2)
+    runs, dead, done = [], [], asyncio.Event()
+
+    async def handler(job):
+        runs.append(job.payload["n"])
+        if job.payload["n"] == 2:
+            raise RuntimeError("upload failed")
+
+    async def on_dead(job, error):
+        dead.append((job.payload["n"], error))
+        done.set()
+
+    runner = JobRunner(store, {"file": handler}, {"file": 2}, on_dead=on_dead, poll_interval=0.01, retry_delay=0)
+    runner.start()
+    runner.submit("file", {"n": 1})
+    runner.submit("file", {"n": 2})
+    await asyncio.wait_for(done.wait(), 5)
+    await runner.stop()
+    assert sorted(runs) == [1, 2, 2]
+    assert dead == [(2, "RuntimeError: upload failed")]
+    assert runner.completed == 1
+    assert store.counts() == {"dead": 1}
+
+
+@pytest.mark.asyncio
+async def test_running_job_keeps_its_lease(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"), visibility_timeout=0.06)
+    started, finish = asyncio.Event(), asyncio.Event()
+
+    async def handler(job):
+        started.set()
+        await finish.wait()
+
+    runner = JobRunner(store, {"file": handler}, {"file": 1}, poll_interval=0.01)
+    runner.start()
+    runner.submit("file", {"n": 1})
+    await asyncio.wait_for(started.wait(), 5)
+    await asyncio.sleep(0.15)
+    # Well past the visibility timeout, but the worker is still on it
+    assert store.claim("file") is None
+    finish.set()
+    await asyncio.sleep(0.05)
+    await runner.stop()
+    assert runner.completed == 1 and store.counts() == {}
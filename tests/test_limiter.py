@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from bot.services.limiter import AdaptiveLimiter, LimiterShedError
+
+
+@pytest.mark.asyncio
+async def test_calls_over_limit_queue_then_shed():
+    limiter = AdaptiveLimiter("text", initial=1, max_queue=1, max_wait=0.05)
+    await limiter.acquire()
+    queued = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    assert limiter.queued == 1
+    # Queue is full: shed immediately
+    with pytest.raises(LimiterShedError):
+        await limiter.acquire()
+    limiter.release()
+    await queued
+    assert limiter.in_flight == 1 and limiter.queued == 0
+    # Nobody releases in time: shed after max_wait
+    with pytest.raises(LimiterShedError):
+        await limiter.acquire()
+    assert limiter.stats()["shed"] == 2
+
+
+def test_limit_grows_when_fast_and_shrinks_when_slow():
+    limiter = AdaptiveLimiter("text", initial=4)
+    for _ in range(20):
+        limiter.in_flight = int(limiter.limit)  # the limit is fully used
+        limiter._adjust(0.1, overloaded=False)
+    grown = limiter.limit
+    assert grown > 5
+
+    # Idle capacity does not inflate the limit
+    limiter.in_flight = 0
+    limiter._adjust(0.1, overloaded=False)
+    assert limiter.limit == grown
+
+    limiter._adjust(1.0, overloaded=False)
+    assert limiter.limit == pytest.approx(grown * 0.8)
+
+    limiter._last_decrease = 0
+    limiter._adjust(0.1, overloaded=True)
+    assert limiter.limit == pytest.approx(grown * 0.64)
+
+
+@pytest.mark.asyncio
+async def test_latency_is_sampled_when_the_reply_starts():
+    limiter = AdaptiveLimiter("text")
+    samples = []
+    limiter._adjust = lambda latency, overloaded: samples.append(latency)
+    async with limiter.slot() as slot:
+        slot.sample()
+        # Time the reader spends on the streamed body is not the backend's
+        await asyncio.sleep(0.1)
+    assert len(samples) == 1 and samples[0] < 0.05
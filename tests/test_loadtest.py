@@ -0,0 +1,72 @@
+import random
+
+import pytest
+import pytest_asyncio
+from telegram import Bot
+from telegram.request import HTTPXRequest
+
+from bot.utils.http_server import HTTPServer
+from tools.fake_rag import Distribution
+from tools.fake_telegram import FakeTelegram
+from tools.loadtest import is_failure, parse_mix, percentile
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(n) for n in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([3.0], 95) == 3.0
+
+
+def test_parse_mix_rejects_unknown_modalities():
+    assert parse_mix("text=0.7, voice=0.3") == {"text": 0.7, "voice": 0.3}
+    with pytest.raises(ValueError):
+        parse_mix("video=1")
+
+
+def test_distributions_are_seeded_and_never_negative():
+    assert Distribution("fixed:0.5").sample() == 0.5
+    first, second = (Distribution("lognormal:0.8:0.5", random.Random(3)) for _ in range(2))
+    assert [first.sample() for _ in range(3)] == [second.sample() for _ in range(3)]
+    normal = Distribution("normal:0:1", random.Random(1))
+    assert min(normal.sample() for _ in range(100)) == 0.0
+    with pytest.raises(ValueError):
+        Distribution("uniform:1")
+
+
+def test_failure_replies():
+    assert is_failure("❌ Sorry, something went wrong. Please try again later.")
+    assert is_failure("⏳ Many people are asking right now. Please try again in a moment.")
+    assert not is_failure("You need a lawful basis ∎")
+
+
+@pytest_asyncio.fixture
+async def fake_telegram():
+    server = HTTPServer()
+    fake = FakeTelegram()
+    fake.install(server)
+    await server.start()
+    bot = Bot("1:fake", base_url=f"{server.url}/bot", base_file_url=f"{server.url}/file/bot",
+              request=HTTPXRequest(), get_updates_request=HTTPXRequest())
+    await bot.initialize()
+    yield fake, bot
+    await bot.shutdown()
+    await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_fake_telegram_roundtrip(fake_telegram):
+    fake, bot = fake_telegram
+    fake.send_text(7, "42")
+    fake.send_document(7, b"%PDF-1.4", "policy.pdf")
+
+    updates = await bot.get_updates(timeout=1)
+    assert updates[0].message.text == "42"
+    document = updates[1].message.document
+    assert document.file_name == "policy.pdf"
+    assert bytes(await (await bot.get_file(document.file_id)).download_as_bytearray()) == b"%PDF-1.4"
+
+    await bot.send_message(7, "true")
+    reply = await fake.replies_for(7).get()
+    assert (reply.method, reply.text) == ("sendMessage", "true")
+    assert await bot.get_updates(offset=updates[-1].update_id + 1, timeout=0) == ()
@@ -0,0 +1,76 @@
+import io
+import json
+import logging
+
+import pytest
+
+from bot.utils import logger as bot_logger
+from bot.utils.logger import ColorFormatter, SamplingFilter, lazy, parse_sample_rates
+from bot.utils.tracing import Tracer
+
+
+@pytest.fixture
+def log_stream():
+    saved_handlers, saved_level = logging.root.handlers[:], logging.root.level
+    stream = io.StringIO()
+    yield stream
+    bot_logger.stop_logger()
+    logging.root.handlers[:] = saved_handlers
+    logging.root.setLevel(saved_level)
+
+
+def test_color_formatter_leaves_the_record_alone():
+    record = logging.LogRecord("bot", logging.WARNING, __file__, 1, "careful", None, None)
+    colored = ColorFormatter("[%(levelname)s] %(message)s").format(record)
+    assert colored.startswith("[\033[33mWARNING")
+    assert record.levelname == "WARNING"
+    assert logging.Formatter("[%(levelname)s] %(message)s").format(record) == "[WARNING] careful"
+
+
+def test_json_lines_carry_trace_id_and_extra_fields(log_stream):
+    bot_logger.setup_logger(json_mode=True, sample_rates="", stream=log_stream)
+    tracer = Tracer(sample_rate=0.0)
+    with tracer.trace("message") as trace:
+        logging.getLogger("bot.test").info("answered %s", "question", extra={"chat_id": 42})
+    bot_logger.stop_logger()
+
+    entry = json.loads(log_stream.getvalue().splitlines()[-1])
+    assert entry["message"] == "answered question"
+    assert entry["level"] == "INFO" and entry["logger"] == "bot.test"
+    assert entry["trace_id"] == trace.trace_id
+    assert entry["chat_id"] == 42
+
+
+def test_arguments_are_resolved_when_logged_and_lazy_ones_only_if_written(log_stream):
+    bot_logger.setup_logger(level="INFO", sample_rates="", stream=log_stream)
+    calls = []
+
+    def describe():
+        calls.append(1)
+        return "expensive"
+
+    payload = ["before"]
+    log = logging.getLogger("bot.test")
+    log.info("payload %s", payload)
+    payload[0] = "after"
+    log.debug("skipped %s", lazy(describe))
+    log.info("kept %s", lazy(describe))
+    bot_logger.stop_logger()
+
+    output = log_stream.getvalue()
+    assert "payload ['before']" in output
+    assert "kept expensive" in output and "skipped" not in output
+    assert calls == [1]
+
+
+def test_sampling_keeps_warnings_and_unlisted_loggers():
+    assert parse_sample_rates("httpx=0.1, bot.handlers=0,broken, x=nope") == {"httpx": 0.1, "bot.handlers": 0.0}
+    sampler = SamplingFilter({"bot.handlers": 0.0})
+
+    def record(name, level):
+        return logging.LogRecord(name, level, __file__, 1, "msg", None, None)
+
+    assert not sampler.filter(record("bot.handlers.chat", logging.INFO))
+    assert sampler.filter(record("bot.handlers.chat", logging.WARNING))
+    assert sampler.filter(record("bot.services", logging.DEBUG))
+    assert sampler.dropped == 1
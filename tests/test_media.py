@@ -0,0 +1,60 @@
+import json
+import types
+
+import pytest
+from telegram.error import BadRequest
+
+from bot.services.media import MediaRegistry
+
+URL = "https://example.com/ask.jpg"
+
+
+class Message:
+    def __init__(self, reject=()):
+        self.sent = []
+        self.reject = set(reject)
+
+    async def reply_photo(self, photo, **kwargs):
+        self.sent.append(photo)
+        if isinstance(photo, str) and photo in self.reject:
+            raise BadRequest("Wrong file identifier/http url specified")
+        return types.SimpleNamespace(photo=[types.SimpleNamespace(file_id="small"), types.SimpleNamespace(file_id="id-1")])
+
+
+@pytest.mark.asyncio
+async def test_first_send_uploads_then_file_id_is_reused_across_restarts(tmp_path):
+    path = tmp_path / "ids.json"
+    registry = MediaRegistry(str(path))
+    message = Message()
+    await registry.send_photo(message, URL, caption="hi")
+    await registry.send_photo(message, URL, caption="hi")
+    assert message.sent == [URL, "id-1"]
+    assert json.loads(path.read_text()) == {"ask.jpg": "id-1"}
+
+    restarted = MediaRegistry(str(path))
+    message = Message()
+    await restarted.send_photo(message, URL)
+    assert message.sent == ["id-1"]
+
+
+@pytest.mark.asyncio
+async def test_local_asset_is_uploaded_instead_of_url(tmp_path):
+    (tmp_path / "ask.jpg").write_bytes(b"\xff\xd8jpeg")
+    (tmp_path / "unused.png").write_bytes(b"\x89PNG")
+    registry = MediaRegistry(asset_dir=str(tmp_path))
+    assert registry.preload(["ask.jpg", "logo.png"]) == 1
+    message = Message()
+    await registry.send_photo(message, URL)
+    assert message.sent[0].input_file_content == b"\xff\xd8jpeg"
+
+
+@pytest.mark.asyncio
+async def test_rejected_file_id_is_revalidated(tmp_path):
+    path = tmp_path / "ids.json"
+    path.write_text(json.dumps({"ask.jpg": "stale"}))
+    registry = MediaRegistry(str(path))
+    message = Message(reject={"stale"})
+    await registry.send_photo(message, URL)
+    assert message.sent == ["stale", URL]
+    assert registry.file_id("ask.jpg") == "id-1"
+    assert json.loads(path.read_text()) == {"ask.jpg": "id-1"}
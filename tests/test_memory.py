@@ -0,0 +1,45 @@
+import time
+
+from bot.services.memory import ASSISTANT, USER, ConversationMemory, estimate_tokens
+
+
+def test_keeps_the_last_turns_per_chat():
+    memory = ConversationMemory(max_turns=4)
+    for i in range(3):
+        memory.record(1, f"question {i}", f"answer {i}")
+    memory.record(2, "other chat", "other answer")
+    assert [t["content"] for t in memory.history(1)] == ["question 1", "answer 1", "question 2", "answer 2"]
+    assert [t["role"] for t in memory.history(1)] == [USER, ASSISTANT, USER, ASSISTANT]
+    assert len(memory.history(2)) == 2
+    assert memory.history(3) == []
+
+
+def test_history_fits_the_token_budget_newest_first():
+    memory = ConversationMemory(max_turns=10, token_budget=estimate_tokens("x" * 300) * 2, max_turn_chars=1000)
+    memory.add(1, USER, "old " * 200)
+    memory.add(1, USER, "x" * 300)
+    memory.add(1, ASSISTANT, "y" * 300)
+    assert [t["content"][0] for t in memory.history(1)] == ["x", "y"]
+
+
+def test_long_turns_are_truncated():
+    memory = ConversationMemory(max_turn_chars=10)
+    memory.add(1, USER, "a" * 50)
+    (turn,) = memory.history(1)
+    assert turn["content"] == "a" * 9 + "…"
+
+
+def test_idle_chats_expire():
+    memory = ConversationMemory(ttl=0.05)
+    memory.record(1, "q", "a")
+    time.sleep(0.06)
+    assert memory.history(1) == []
+
+
+def test_memory_cap_evicts_least_recent_chats():
+    memory = ConversationMemory(max_turns=2, max_bytes=20_000)
+    for chat in range(200):
+        memory.record(chat, "q" * 500, "a" * 500)
+    stats = memory.stats()
+    assert stats["bytes"] <= 20_000 and stats["evictions"] > 0
+    assert memory.history(199) and not memory.history(0)
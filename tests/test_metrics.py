@@ -0,0 +1,90 @@
+import httpx
+import pytest
+
+from bot.services import rag_api
+from bot.utils import metrics
+from bot.utils.metrics import Counter, Gauge, Histogram, Registry
+
+
+def test_text_exposition_format():
+    registry = Registry()
+    requests = Counter("demo_requests_total", "Requests by path", ("path",), registry=registry)
+    in_flight = Gauge("demo_in_flight", "Requests under way", registry=registry)
+    latency = Histogram("demo_seconds", "Request time", buckets=(0.1, 1.0), registry=registry)
+
+    requests.labels('/a"b').inc()
+    requests.labels('/a"b').inc(2)
+    in_flight.inc()
+    in_flight.inc()
+    in_flight.dec()
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value)
+
+    text = registry.render()
+    assert "# TYPE demo_requests_total counter" in text
+    assert 'demo_requests_total{path="/a\\"b"} 3' in text
+    assert "demo_in_flight 1" in text
+    # Buckets are cumulative and `le` is inclusive
+    assert 'demo_seconds_bucket{le="0.1"} 2' in text
+    assert 'demo_seconds_bucket{le="1"} 3' in text
+    assert 'demo_seconds_bucket{le="+Inf"} 4' in text
+    assert "demo_seconds_sum 3.65" in text
+    assert "demo_seconds_count 4" in text
+    assert text.endswith("\n")
+
+
+def test_labels_are_checked_and_names_unique():
+    registry = Registry()
+    counter = Counter("demo_total", "Demo", ("a", "b"), registry=registry)
+    with pytest.raises(ValueError):
+        counter.labels("only-one")
+    assert counter.labels("x", "y") is counter.labels("x", "y")
+    with pytest.raises(ValueError):
+        Counter("demo_total", "Again", registry=registry)
+
+
+def test_timer_observes_elapsed_time():
+    latency = Histogram("demo_timer_seconds", "Timed", registry=Registry())
+    with latency.time():
+        pass
+    child = latency.labels()
+    assert child.count == 1
+    assert 0 <= child.sum < 1
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_serves_the_registry():
+    registry = Registry()
+    Counter("demo_scraped_total", "Scraped", registry=registry).inc()
+    server = metrics.build_metrics_server("127.0.0.1", 0, registry)
+    await server.start()
+    try:
+        async with httpx.AsyncClient() as client:
+            resp = await client.get(f"{server.url}/metrics")
+            missing = await client.get(f"{server.url}/other")
+    finally:
+        await server.stop()
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "demo_scraped_total 1" in resp.text
+    assert missing.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_rag_calls_are_recorded():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"response": "ok", "transcription": "hi"})
+
+    await rag_api.close_client()
+    await rag_api.init_client(transport=httpx.MockTransport(handler))
+    latency = metrics.RAG_REQUEST_SECONDS.labels("speech")
+    ok = metrics.RAG_REQUESTS.labels("speech", "200")
+    before_count, before_ok = latency.count, ok.value
+    try:
+        # History bypasses the result cache, so the call reaches the backend
+        await rag_api.speech_to_text(b"metrics test audio", "a.ogg", [{"role": "user", "content": "hi"}])
+    finally:
+        await rag_api.close_client()
+    assert latency.count == before_count + 1
+    assert ok.value == before_ok + 1
+    assert metrics.RAG_IN_FLIGHT.labels("speech").value == 0
@@ -0,0 +1,71 @@
+import time
+
+from telegram import MessageEntity
+
+from bot.utils.pagination import PageStore, first_page, page_markup, parse_callback, split_rendered
+from bot.utils.rendering import Rendered, render_markdown, utf16_len
+
+
+def test_short_answer_is_one_page_without_buttons():
+    answer = render_markdown("**Yes**, GDPR applies.")
+    assert split_rendered(answer) == [answer]
+    assert "reply_markup" not in first_page(answer)
+
+
+def test_pages_fit_the_limit_and_cut_at_paragraphs():
+    paragraphs = [f"Paragraph {i}. " + "word " * 30 for i in range(40)]
+    pages = split_rendered(Rendered("\n\n".join(p.strip() for p in paragraphs)), limit=500)
+    assert len(pages) > 1
+    for page in pages:
+        assert utf16_len(page.text) <= 500
+        assert page.text.startswith("Paragraph ")
+    assert " ".join(page.text for page in pages).split() == " ".join(paragraphs).split()
+
+
+def test_limit_counts_utf16_units():
+    pages = split_rendered(Rendered("🔒 " * 3000), limit=4096)
+    assert all(utf16_len(page.text) <= 4096 for page in pages)
+    assert sum(page.text.count("🔒") for page in pages) == 3000
+
+
+def test_entities_are_not_cut_when_avoidable():
+    text = ("plain words here. " * 10 + "**bold sentence. still bold.** ") * 30
+    answer = render_markdown(text)
+    pages = split_rendered(answer, limit=300)
+    bold = [p.text[e.offset:e.offset + e.length] for p in pages for e in p.entities]
+    assert bold == ["bold sentence. still bold."] * 30
+
+
+def test_oversized_code_block_is_split_at_lines():
+    answer = render_markdown("```\n" + "\n".join(f"line {i}" for i in range(400)) + "\n```")
+    pages = split_rendered(answer, limit=600)
+    assert len(pages) > 1
+    for page in pages:
+        (entity,) = page.entities
+        assert entity.type == MessageEntity.PRE
+        assert (entity.offset, entity.length) == (0, utf16_len(page.text))
+        assert page.text.startswith("line ") and page.text.split("\n")[-1].startswith("line ")
+
+
+def test_store_expires_and_stays_bounded():
+    store = PageStore(max_entries=2, ttl=0.05)
+    pages = [Rendered("one", [MessageEntity(MessageEntity.BOLD, 0, 3)]), Rendered("two")]
+    token = store.add(pages)
+    assert store.get(token, 0) == (pages[0], 2)
+    assert store.get(token, 2) is None
+    store.add(pages)
+    store.add(pages)
+    assert store.get(token, 0) is None
+    newest = store.add(pages)
+    time.sleep(0.06)
+    assert store.get(newest, 1) is None
+
+
+def test_callback_data_round_trip():
+    markup = page_markup("abc_-1", 1, 3)
+    data = [button.callback_data for button in markup.inline_keyboard[0]]
+    assert data == ["pg:abc_-1:0", "pg:abc_-1:1", "pg:abc_-1:2"]
+    assert all(len(d.encode()) <= 64 for d in data)
+    assert parse_callback("pg:abc_-1:2") == ("abc_-1", 2)
+    assert parse_callback("pg:abc") is None
+    assert parse_callback("pg::1") is None
@@ -0,0 +1,66 @@
+import pytest
+
+from bot.services.persistence import SQLitePersistence
+
+
+@pytest.mark.asyncio
+async def test_data_survives_restart_and_loads_lazily(tmp_path):
+    path = str(tmp_path / "p.sqlite3")
+    persistence = SQLitePersistence(path, flush_delay=0)
+    await persistence.update_user_data(7, {"lang": "my"})
+    await persistence.update_chat_data(-100, {"history_message_ids": [1, 2]})
+    await persistence.flush()
+    persistence.close()
+
+    restarted = SQLitePersistence(path)
+    assert await restarted.get_user_data() == {}
+    user_data = {}
+    await restarted.refresh_user_data(7, user_data)
+    assert user_data == {"lang": "my"}
+    # Loaded once; later refreshes leave the live dict alone
+    user_data["lang"] = "en"
+    await restarted.refresh_user_data(7, user_data)
+    assert user_data == {"lang": "en"}
+    chat_data = {}
+    await restarted.refresh_chat_data(-100, chat_data)
+    assert chat_data == {"history_message_ids": [1, 2]}
+    assert restarted.stats()["loads"] == 2
+    restarted.close()
+
+
+@pytest.mark.asyncio
+async def test_unchanged_entries_are_skipped_and_changes_batched(tmp_path):
+    persistence = SQLitePersistence(str(tmp_path / "p.sqlite3"), flush_delay=60)
+    for user_id in range(50):
+        await persistence.update_user_data(user_id, {"n": user_id})
+    assert persistence.stats()["pending"] == 50
+    await persistence.flush()
+    assert persistence.stats()["writes"] == 50
+    for user_id in range(50):
+        await persistence.update_user_data(user_id, {"n": user_id})
+    await persistence.update_user_data(3, {"n": 4})
+    stats = persistence.stats()
+    assert (stats["skipped"], stats["pending"]) == (50, 1)
+    await persistence.flush()
+    persistence.close()
+
+
+@pytest.mark.asyncio
+async def test_drops_and_conversations(tmp_path):
+    path = str(tmp_path / "p.sqlite3")
+    persistence = SQLitePersistence(path, flush_delay=0)
+    await persistence.update_chat_data(1, {"a": 1})
+    await persistence.update_conversation("setup", (1, 7), "ASK_NAME")
+    await persistence.update_conversation("setup", (2, 8), "DONE")
+    await persistence.flush()
+    await persistence.drop_chat_data(1)
+    await persistence.update_conversation("setup", (2, 8), None)
+    await persistence.flush()
+    persistence.close()
+
+    restarted = SQLitePersistence(path)
+    chat_data = {}
+    await restarted.refresh_chat_data(1, chat_data)
+    assert chat_data == {}
+    assert await restarted.get_conversations("setup") == {(1, 7): "ASK_NAME"}
+    restarted.close()
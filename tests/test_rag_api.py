@@ -0,0 +1,260 @@
+import asyncio
+
+import httpx
+import pytest
+import pytest_asyncio
+from telegram import File
+
+from bot.services import rag_api, uploads
+from bot.services.limiter import AdaptiveLimiter
+from bot.services.uploads import FileSource, TelegramAttachmentSource
+
+
+def make_transport(calls):
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        if request.method == "HEAD":
+            return httpx.Response(200)
+        if request.url.path.endswith("/text"):
+            return httpx.Response(200, json={"response": "Hello!"})
+        return httpx.Response(200, json={"response": "ok", "transcription": "hi"})
+    return httpx.MockTransport(handler)
+
+
+@pytest_asyncio.fixture
+async def client_calls():
+    calls = []
+    await rag_api.close_client()
+    rag_api.answer_cache.clear()
+    rag_api.file_results.memory.clear()
+    await rag_api.init_client(transport=make_transport(calls))
+    yield calls
+    await rag_api.close_client()
+
+
+@pytest.mark.asyncio
+async def test_shared_client_is_reused(client_calls):
+    client = rag_api.get_client()
+    assert await rag_api.query_text("Hi") == "Hello!"
+    await rag_api.speech_to_text(b"abc", "a.ogg")
+    assert rag_api.get_client() is client
+    assert [r.method for r in client_calls].count("POST") == 2
+
+
+@pytest.mark.asyncio
+async def test_preconnect_and_close(client_calls):
+    assert any(r.method == "HEAD" for r in client_calls)
+    await rag_api.close_client()
+    assert rag_api._client is None
+    assert rag_api.pool_stats()["connections"] == 0
+
+
+@pytest.mark.asyncio
+async def test_text_answers_are_cached(client_calls):
+    assert await rag_api.query_text("Do I need a privacy policy?") == "Hello!"
+    assert await rag_api.query_text("do i need a  PRIVACY policy") == "Hello!"
+    assert [r.method for r in client_calls].count("POST") == 1
+
+
+@pytest.mark.asyncio
+async def test_history_is_sent_and_bypasses_the_cache(client_calls):
+    history = [{"role": "user", "content": "Is GDPR needed?"}, {"role": "assistant", "content": "Yes."}]
+    assert await rag_api.query_text("and PDPA?") == "Hello!"
+    assert await rag_api.query_text("and PDPA?", history) == "Hello!"
+    posts = [r for r in client_calls if r.method == "POST"]
+    assert len(posts) == 2
+    assert b"history" not in posts[0].content
+    assert b"history=" in posts[1].content and b"GDPR" in posts[1].content
+
+
+@pytest.mark.asyncio
+async def test_error_answers_are_not_cached():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(500, json={})
+
+    await rag_api.close_client()
+    rag_api.answer_cache.clear()
+    rag_api.file_results.memory.clear()
+    await rag_api.init_client(transport=httpx.MockTransport(handler))
+    try:
+        for _ in range(2):
+            assert await rag_api.query_text("hi") == rag_api.USER_FRIENDLY_ERRORS[500]
+        assert [r.method for r in calls].count("POST") == 2
+        assert len(rag_api.answer_cache) == 0
+    finally:
+        await rag_api.close_client()
+
+
+@pytest.mark.asyncio
+async def test_identical_in_flight_requests_are_coalesced():
+    calls = []
+    release = asyncio.Event()
+
+    async def handler(request):
+        calls.append(request)
+        if request.method == "POST":
+            await release.wait()
+        return httpx.Response(200, json={"response": "shared", "transcription": "t"})
+
+    await rag_api.close_client()
+    rag_api.answer_cache.clear()
+    rag_api.file_results.memory.clear()
+    await rag_api.init_client(transport=httpx.MockTransport(handler))
+    try:
+        texts = [asyncio.ensure_future(rag_api.query_text(q)) for q in ("GDPR?", "gdpr", " GDPR ")]
+        speech = [asyncio.ensure_future(rag_api.speech_to_text(b"voice", "a.ogg")) for _ in range(2)]
+        await asyncio.sleep(0)
+        # A cancelled waiter must not cancel the shared upstream call
+        texts[0].cancel()
+        release.set()
+        assert [await t for t in texts[1:]] == ["shared", "shared"]
+        assert [(await s)["transcription"] for s in speech] == ["t", "t"]
+        assert [r.method for r in calls].count("POST") == 2
+    finally:
+        await rag_api.close_client()
+
+
+class FakeAttachment:
+    """Stands in for a Telegram Document: counts how often the bot fetches it"""
+
+    file_unique_id = "AgADuniq"
+    file_size = 5
+
+    def __init__(self):
+        self.fetches = 0
+
+    async def get_file(self):
+        self.fetches += 1
+        return File(file_id="id", file_unique_id=self.file_unique_id, file_size=5, file_path="/tmp/unused")
+
+
+@pytest.mark.asyncio
+async def test_repeated_file_is_answered_without_download(client_calls, monkeypatch, tmp_path):
+    payload = tmp_path / "doc.pdf"
+    payload.write_bytes(b"%PDF!")
+    rag_api.file_results.memory.clear()
+
+    async def fake_open(file):
+        return FileSource(str(payload), key=file.file_unique_id, digest="d1")
+
+    monkeypatch.setattr(uploads, "open_telegram_file", fake_open)
+    attachment = FakeAttachment()
+    first = await rag_api.query_text_with_file("Summary?", TelegramAttachmentSource(attachment), "doc.pdf")
+    again = await rag_api.query_text_with_file("summary", TelegramAttachmentSource(attachment), "doc.pdf")
+    assert first == again == {"response": "ok", "transcription": "hi"}
+    assert attachment.fetches == 1
+    assert [r.method for r in client_calls].count("POST") == 1
+
+
+@pytest.mark.asyncio
+async def test_file_answers_with_history_use_but_do_not_fill_the_cache(client_calls):
+    history = [{"role": "user", "content": "Is GDPR needed?"}]
+    rag_api.file_results.memory.clear()
+    await rag_api.query_text_with_file("Summary?", b"%PDF!", "doc.pdf", history)
+    assert len(rag_api.file_results.memory) == 0
+    assert b"GDPR" in [r for r in client_calls if r.method == "POST"][-1].content
+
+    await rag_api.query_text_with_file("Summary?", b"%PDF!", "doc.pdf")
+    posts = [r.method for r in client_calls].count("POST")
+    assert await rag_api.query_text_with_file("Summary?", b"%PDF!", "doc.pdf", history) == {"response": "ok", "transcription": "hi"}
+    assert [r.method for r in client_calls].count("POST") == posts
+
+
+@pytest.mark.asyncio
+async def test_gateway_errors_are_retried_then_circuit_opens(monkeypatch):
+    statuses = [503, 502, 200]
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if request.method == "HEAD":
+            return httpx.Response(200)
+        status = statuses.pop(0) if statuses else 503
+        return httpx.Response(status, json={"response": "recovered"} if status == 200 else {})
+
+    monkeypatch.setattr(rag_api.retry_policy, "delay", lambda attempt: 0)
+    monkeypatch.setattr(rag_api, "breakers", {name: rag_api.CircuitBreaker(name, 3, 60) for name in ("text", "file", "speech")})
+    await rag_api.close_client()
+    rag_api.answer_cache.clear()
+    await rag_api.init_client(transport=httpx.MockTransport(handler))
+    try:
+        assert await rag_api.query_text("first") == "recovered"
+        # Three more 503s open the circuit; afterwards users fail fast without a request
+        assert await rag_api.query_text("second") == rag_api.USER_FRIENDLY_ERRORS["unknown"]
+        posts = [r.method for r in calls].count("POST")
+        assert await rag_api.query_text("third") == rag_api.USER_FRIENDLY_ERRORS["unavailable"]
+        assert [r.method for r in calls].count("POST") == posts == 6
+    finally:
+        await rag_api.close_client()
+
+
+@pytest.mark.asyncio
+async def test_half_open_probe_that_is_cancelled_or_shed_is_given_back(monkeypatch):
+    release = asyncio.Event()
+
+    async def handler(request):
+        if request.method == "HEAD":
+            return httpx.Response(200)
+        if b"slow" in request.content:
+            await release.wait()
+        return httpx.Response(200, json={"response": "recovered"})
+
+    breaker = rag_api.CircuitBreaker("text", failure_threshold=1, recovery_timeout=0)
+    breaker.record_failure()
+    monkeypatch.setattr(rag_api, "breakers", {**rag_api.breakers, "text": breaker})
+    limiter = AdaptiveLimiter("text", initial=1, max_queue=0)
+    monkeypatch.setattr(rag_api, "limiters", {**rag_api.limiters, "text": limiter})
+    history = [{"role": "user", "content": "Earlier"}]
+    await rag_api.close_client()
+    await rag_api.init_client(transport=httpx.MockTransport(handler))
+    try:
+        probe = asyncio.ensure_future(rag_api.query_text("slow", history))
+        await asyncio.sleep(0.05)
+        assert breaker.state == rag_api.CircuitBreaker.HALF_OPEN
+        # The limiter is full, so this call is shed before it can take the trial
+        assert await rag_api.query_text("shed", history) == rag_api.USER_FRIENDLY_ERRORS["busy"]
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        assert await rag_api.query_text("fast", history) == "recovered"
+        assert breaker.state == rag_api.CircuitBreaker.CLOSED
+    finally:
+        release.set()
+        await rag_api.close_client()
+
+
+@pytest.mark.asyncio
+async def test_telegram_download_failure_is_not_a_backend_failure(monkeypatch):
+    downloads = []
+
+    def rag(request):
+        return httpx.Response(200, json={"response": "never"})
+
+    def telegram(request):
+        downloads.append(request)
+        raise httpx.ConnectError("api.telegram.org unreachable", request=request)
+
+    breaker = rag_api.CircuitBreaker("file", failure_threshold=1, recovery_timeout=60)
+    monkeypatch.setattr(rag_api, "breakers", {**rag_api.breakers, "file": breaker})
+    monkeypatch.setattr(rag_api.retry_policy, "delay", lambda attempt: 0)
+    download_client = httpx.AsyncClient(transport=httpx.MockTransport(telegram))
+    monkeypatch.setattr(uploads, "get_download_client", lambda: download_client)
+    limit = rag_api.limiters["file"].limit
+    rag_api.file_results.memory.clear()
+    await rag_api.close_client()
+    await rag_api.init_client(transport=httpx.MockTransport(rag))
+    try:
+        file = File(file_id="id", file_unique_id="dl-fail", file_size=5, file_path="https://tg.invalid/file/doc.pdf")
+        with pytest.raises(uploads.TelegramDownloadError):
+            await rag_api.query_text_with_file("Summary?", uploads.TelegramFileSource(file), "doc.pdf")
+        # A connect error of the download is not retried: the piped body cannot be replayed
+        assert len(downloads) == 1
+        assert breaker.state == rag_api.CircuitBreaker.CLOSED and breaker.stats()["failures"] == 0
+        assert rag_api.limiters["file"].limit == limit
+    finally:
+        await download_client.aclose()
+        await rag_api.close_client()
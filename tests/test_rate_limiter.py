@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+import pytest
+from telegram.error import RetryAfter
+
+from bot.utils.rate_limiter import PriorityRateLimiter
+
+
+def _send(limiter, endpoint, chat_id, log, result=True, fail=None):
+    async def callback():
+        if fail:
+            fail.pop()
+            raise RetryAfter(1)
+        log.append((endpoint, chat_id, time.monotonic()))
+        return result
+
+    return limiter.process_request(callback, (), {}, endpoint, {"chat_id": chat_id}, None)
+
+
+@pytest.mark.asyncio
+async def test_per_chat_rate_after_burst():
+    limiter = PriorityRateLimiter(global_rate=1000, per_chat=20, burst=2)
+    log = []
+    start = time.monotonic()
+    await asyncio.gather(*(_send(limiter, "sendMessage", 1, log) for _ in range(4)))
+    await _send(limiter, "sendMessage", 2, log)
+    await limiter.shutdown()
+    # Two go out at once, the next two are spaced 1/20 s apart; another chat is not held back
+    assert log[-1][2] - start >= 0.09
+    assert [entry[1] for entry in log].count(1) == 4
+
+
+@pytest.mark.asyncio
+async def test_chat_action_dropped_when_busy():
+    limiter = PriorityRateLimiter(global_rate=1000, per_chat=1, burst=1)
+    log = []
+    await _send(limiter, "sendMessage", 1, log)
+    assert await _send(limiter, "sendChatAction", 1, log) is True
+    await limiter.shutdown()
+    assert [entry[0] for entry in log] == ["sendMessage"]
+    assert limiter.dropped == 1
+
+
+@pytest.mark.asyncio
+async def test_retry_after_pauses_and_replays(monkeypatch):
+    limiter = PriorityRateLimiter(global_rate=1000, per_chat=1000)
+    monkeypatch.setattr("bot.utils.rate_limiter.retry_after_seconds", lambda e: 0.05)
+    log = []
+    start = time.monotonic()
+    result = await _send(limiter, "sendMessage", 1, log, result={"ok": 1}, fail=[True])
+    await limiter.shutdown()
+    assert result == {"ok": 1}
+    assert log[0][2] - start >= 0.05
+    assert limiter.flood_waits == 1
+
+
+@pytest.mark.asyncio
+async def test_retry_after_raised_after_max_retries(monkeypatch):
+    limiter = PriorityRateLimiter(global_rate=1000, per_chat=1000, max_retries=1)
+    monkeypatch.setattr("bot.utils.rate_limiter.retry_after_seconds", lambda e: 0.01)
+    with pytest.raises(RetryAfter):
+        await _send(limiter, "sendMessage", 1, [], fail=[True, True])
+    await limiter.shutdown()
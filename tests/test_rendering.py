@@ -0,0 +1,57 @@
+from telegram import MessageEntity
+
+from bot.utils.rendering import Rendered, escape_markdown_v2, render_markdown, utf16_len
+
+
+def entities(rendered):
+    return [(e.type, rendered.text[e.offset:e.offset + e.length]) for e in rendered.entities]
+
+
+def test_escape_covers_backslash_first():
+    assert escape_markdown_v2("a_b.c!") == "a\\_b\\.c\\!"
+    # A literal backslash before a special character must not swallow that escape
+    assert escape_markdown_v2("C:\\_x") == "C:\\\\\\_x"
+    assert escape_markdown_v2(42) == "42"
+
+
+def test_inline_markup_becomes_entities():
+    rendered = render_markdown("**Answer** to _Is GDPR needed?_ see `art_6` and [the law](https://gdpr-info.eu)")
+    assert rendered.text == "Answer to Is GDPR needed? see art_6 and the law"
+    assert entities(rendered) == [
+        (MessageEntity.BOLD, "Answer"),
+        (MessageEntity.ITALIC, "Is GDPR needed?"),
+        (MessageEntity.CODE, "art_6"),
+        (MessageEntity.TEXT_LINK, "the law"),
+    ]
+
+
+def test_blocks_headings_and_bullets():
+    rendered = render_markdown("## Checklist\n- keep *records*\n```python\nprint(1)\n```")
+    assert rendered.text == "Checklist\n• keep records\nprint(1)"
+    assert entities(rendered) == [
+        (MessageEntity.BOLD, "Checklist"),
+        (MessageEntity.ITALIC, "records"),
+        (MessageEntity.PRE, "print(1)"),
+    ]
+    assert rendered.entities[-1].language == "python"
+
+
+def test_incomplete_or_plain_markers_stay_literal():
+    for text in ["unclosed **bold", "snake_case_name", "2 * 3 * 4", "[x] not a link"]:
+        assert render_markdown(text).entities == []
+    assert render_markdown("unclosed **bold").text == "unclosed **bold"
+    assert render_markdown("[bad](ftp://x)").text == "bad (ftp://x)"
+
+
+def test_offsets_are_utf16():
+    rendered = render_markdown("😀 ဟုတ် **GDPR**")
+    [bold] = rendered.entities
+    assert bold.offset == utf16_len("😀 ဟုတ် ") == 8
+    assert bold.length == 4
+
+
+def test_concatenation_shifts_entities():
+    combined = Rendered("🗣️ hi\n\n") + render_markdown("**ok**")
+    [bold] = combined.entities
+    assert combined.text == "🗣️ hi\n\nok"
+    assert bold.offset == utf16_len("🗣️ hi\n\n")
@@ -0,0 +1,58 @@
+import pytest
+
+from bot.services.resilience import CircuitBreaker, CircuitOpenError, RetryPolicy
+
+
+def test_breaker_opens_then_half_opens_and_closes(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("bot.services.resilience.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker("text", failure_threshold=2, recovery_timeout=10)
+
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    now[0] += 10
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.before_call()
+    # Only one trial call at a time while half-open
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats()["rejected"] == 2
+
+
+def test_failed_probe_reopens(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("bot.services.resilience.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker("file", failure_threshold=1, recovery_timeout=5)
+    breaker.record_failure()
+    now[0] += 5
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_trial_without_outcome_is_given_back(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("bot.services.resilience.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker("text", failure_threshold=1, recovery_timeout=5)
+    assert breaker.before_call() is False
+    breaker.record_failure()
+    now[0] += 5
+    assert breaker.before_call() is True
+    breaker.release_trial()
+    assert breaker.before_call() is True
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_backoff_is_jittered_and_capped():
+    policy = RetryPolicy(attempts=5, base_delay=0.5, max_delay=1.0)
+    delays = [policy.delay(attempt) for attempt in range(5) for _ in range(50)]
+    assert all(0 <= d <= 1.0 for d in delays)
+    assert len(set(delays)) > 1
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from bot.services.scheduler import (
+    PRIORITY_HIGH,
+    PRIORITY_NORMAL,
+    ModalityScheduler,
+    PriorityPool,
+    SchedulerBusyError,
+)
+
+
+@pytest.mark.asyncio
+async def test_short_text_jumps_the_queue():
+    pool = PriorityPool("text", size=1, max_queue=10)
+    order = []
+    gate = asyncio.Event()
+
+    async def job(name, priority):
+        async with pool.slot(priority):
+            order.append(name)
+            await gate.wait()
+
+    first = asyncio.ensure_future(job("running", PRIORITY_NORMAL))
+    await asyncio.sleep(0)
+    waiting = [asyncio.ensure_future(job(name, prio)) for name, prio in
+               [("long-1", PRIORITY_NORMAL), ("short", PRIORITY_HIGH), ("long-2", PRIORITY_NORMAL)]]
+    await asyncio.sleep(0)
+    gate.set()
+    await asyncio.gather(first, *waiting)
+    assert order == ["running", "short", "long-1", "long-2"]
+
+
+@pytest.mark.asyncio
+async def test_speech_burst_does_not_block_text():
+    scheduler = ModalityScheduler({
+        "text": PriorityPool("text", size=2, max_queue=2),
+        "speech": PriorityPool("speech", size=1, max_queue=1),
+    })
+    gate = asyncio.Event()
+
+    async def speech_job():
+        async with scheduler.slot("speech"):
+            await gate.wait()
+
+    busy = [asyncio.ensure_future(speech_job()) for _ in range(2)]
+    await asyncio.sleep(0)
+    with pytest.raises(SchedulerBusyError):
+        async with scheduler.slot("speech"):
+            pass
+    # Text still gets a slot immediately
+    async with scheduler.slot("text", PRIORITY_HIGH):
+        assert scheduler.stats()["text"]["running"] == 1
+    gate.set()
+    await asyncio.gather(*busy)
+    assert scheduler.stats()["speech"] == {"size": 1, "running": 0, "queued": 0, "rejected": 1}
+
+
+@pytest.mark.asyncio
+async def test_cancel_racing_with_release_stays_a_cancel():
+    pool = PriorityPool("file", size=1, max_queue=2)
+    await pool._acquire(PRIORITY_NORMAL)
+    waiter = asyncio.ensure_future(pool._acquire(PRIORITY_NORMAL))
+    await asyncio.sleep(0)
+    # The waiter's future is cancelled at once, but the task only resumes later:
+    # the release in between pops its entry from the heap
+    waiter.cancel()
+    pool._release()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert pool.stats() == {"size": 1, "running": 0, "queued": 0, "rejected": 0}
@@ -0,0 +1,46 @@
+import sys
+
+import pytest
+
+from bot.utils import sharding
+from bot.utils.sharding import ShardSupervisor, shard_for, shard_key
+
+
+def _exit_at_once(index, queue, shards):
+    sys.exit(3)
+
+
+def test_shard_key_follows_chat_then_user():
+    message = {"update_id": 1, "message": {"message_id": 5, "chat": {"id": -100123}, "from": {"id": 7}}}
+    callback = {"update_id": 2, "callback_query": {"id": "q", "from": {"id": 7}, "message": {"chat": {"id": 55}}}}
+    inline = {"update_id": 3, "inline_query": {"id": "i", "from": {"id": 7}, "query": ""}}
+    assert shard_key(message) == -100123
+    assert shard_key(callback) == 55
+    assert shard_key(inline) == 7
+    assert shard_key({"update_id": 4}) == 0
+    assert 0 <= shard_for(message, 4) < 4
+
+
+@pytest.mark.asyncio
+async def test_updates_of_one_chat_go_to_one_queue_in_order():
+    supervisor = ShardSupervisor(3, _exit_at_once)
+    for update_id in range(6):
+        chat = 10 if update_id % 2 else 11
+        assert await supervisor.dispatch({"update_id": update_id, "message": {"chat": {"id": chat}}})
+    for chat, expected in ((10, [1, 3, 5]), (11, [0, 2, 4])):
+        queue = supervisor._workers[chat % 3].queue
+        assert [queue.get(timeout=5)["update_id"] for _ in expected] == expected
+
+
+def test_crashed_worker_is_restarted(monkeypatch):
+    monkeypatch.setattr(sharding, "_STABLE_AFTER", 0.0)
+    supervisor = ShardSupervisor(1, _exit_at_once)
+    supervisor.start()
+    first = supervisor._workers[0].process
+    first.join(10)
+    assert first.exitcode == 3
+    supervisor.check()
+    assert supervisor._workers[0].process is not first
+    assert supervisor.stats()["restarts"] == 1
+    supervisor._workers[0].process.join(10)
+    supervisor.stop(timeout=1)
@@ -0,0 +1,56 @@
+import sys
+import types
+
+import pytest
+
+from bot.utils.startup import lazy_callback, parse_importtime, push_commands_if_changed
+
+COMMANDS = (("start", "Start"), ("help", "Help"))
+
+
+class Bot:
+    id = 42
+
+    def __init__(self):
+        self.pushed = []
+
+    async def set_my_commands(self, commands):
+        self.pushed.append(commands)
+
+
+@pytest.mark.asyncio
+async def test_lazy_callback_imports_on_first_call(monkeypatch):
+    module = types.ModuleType("lazy_target")
+    calls = []
+
+    async def handler(update, context):
+        calls.append(update)
+        return "done"
+
+    module.handler = handler
+    callback = lazy_callback("lazy_target:handler")
+    assert callback.__name__ == "handler"
+    monkeypatch.setitem(sys.modules, "lazy_target", module)
+    assert await callback(1, None) == "done"
+    monkeypatch.delitem(sys.modules, "lazy_target")
+    assert await callback(2, None) == "done"
+    assert calls == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_commands_pushed_only_when_they_change(tmp_path):
+    state = str(tmp_path / "state" / "commands.sha256")
+    bot = Bot()
+    assert await push_commands_if_changed(bot, COMMANDS, state)
+    assert not await push_commands_if_changed(bot, COMMANDS, state)
+    assert await push_commands_if_changed(bot, COMMANDS + (("menu", "Menu"),), state)
+    assert len(bot.pushed) == 2
+
+
+def test_parse_importtime():
+    lines = [
+        "import time: self [us] | cumulative | imported package",
+        "import time:       144 |        144 |   bot",
+        "import time:      1524 |       4147 |   bot.config",
+    ]
+    assert parse_importtime(lines) == [("bot", 144, 144), ("bot.config", 1524, 4147)]
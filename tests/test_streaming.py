@@ -0,0 +1,109 @@
+import types
+
+import pytest
+import pytest_asyncio
+from telegram.constants import MessageLimit
+from telegram.error import BadRequest
+
+from bot.services import rag_api
+from bot.utils.http_server import HTTPServer
+from bot.utils.rendering import escape_markdown_v2, utf16_len
+from bot.utils.streaming import CURSOR, StreamingReply
+from tools.fake_rag import BASE_PATH, FakeRAG
+
+
+@pytest_asyncio.fixture(params=[True, False], ids=["sse", "chunked"])
+async def fake_rag(request, monkeypatch):
+    server = HTTPServer()
+    fake = FakeRAG(token_delay=0, tokens=5, sse=request.param)
+    fake.install(server)
+    await server.start()
+    monkeypatch.setattr(rag_api, "RAG_API_BASE", server.url + BASE_PATH)
+    await rag_api.close_client()
+    rag_api.answer_cache.clear()
+    yield fake
+    await rag_api.close_client()
+    await server.stop()
+
+
+class SentMessage:
+    def __init__(self, log):
+        self.log = log
+
+    async def edit_text(self, text, parse_mode=None):
+        self.log.append(("edit", text))
+
+
+class IncomingMessage:
+    def __init__(self):
+        self.log = []
+        self.chat = types.SimpleNamespace(type="private")
+
+    async def reply_text(self, text, parse_mode=None):
+        self.log.append(("reply", text))
+        return SentMessage(self.log)
+
+
+@pytest.mark.asyncio
+async def test_stream_yields_tokens_and_caches_answer(fake_rag):
+    tokens = [t async for t in rag_api.query_text_stream("Is GDPR needed?")]
+    assert len(tokens) == 6
+    assert "".join(tokens).startswith("**Answer** to _Is GDPR needed?_")
+    # Second call is answered from the cache without touching the backend
+    assert [t async for t in rag_api.query_text_stream("is gdpr needed")] == ["".join(tokens)]
+    assert len(fake_rag.requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_every_partial_edit_is_fully_escaped():
+    message = IncomingMessage()
+    reply = StreamingReply(message, render=escape_markdown_v2, parse_mode="MarkdownV2", min_interval=0)
+    await reply.start()
+    for token in ["**bold", "** and (x", ") done."]:
+        await reply.feed(token)
+    await reply.finish()
+    edits = [text for kind, text in message.log if kind == "edit"]
+    assert edits[-1] == escape_markdown_v2("**bold** and (x) done.")
+    assert edits[0].startswith(escape_markdown_v2("**bold"))
+    assert reply.edits == 4
+
+
+@pytest.mark.asyncio
+async def test_edits_are_throttled():
+    message = IncomingMessage()
+    reply = StreamingReply(message, min_interval=60)
+    await reply.start()
+    for token in "many small tokens".split():
+        await reply.feed(token)
+    await reply.finish()
+    assert [kind for kind, _ in message.log] == ["reply", "edit"]
+
+
+@pytest.mark.asyncio
+async def test_long_answers_with_astral_characters_fit_in_utf16_units():
+    message = IncomingMessage()
+    reply = StreamingReply(message, min_interval=0)
+    await reply.start()
+    # Each emoji is one code point but two UTF-16 units
+    for _ in range(3):
+        await reply.feed("မြန်မာ😀" * 300)
+    await reply.finish()
+    texts = [text for kind, text in message.log[1:]]
+    assert all(utf16_len(text) <= MessageLimit.MAX_TEXT_LENGTH for text in texts)
+    assert "".join(texts[-2:]).endswith("မြန်မာ😀")
+
+
+@pytest.mark.asyncio
+async def test_rejected_preview_edit_does_not_end_the_stream():
+    class RejectingMessage(SentMessage):
+        async def edit_text(self, text, parse_mode=None):
+            if text.endswith(CURSOR):
+                raise BadRequest("Message is too long")
+            await super().edit_text(text)
+
+    message = IncomingMessage()
+    reply = StreamingReply(message, min_interval=0)
+    reply._sent = RejectingMessage(message.log)
+    await reply.feed("partial")
+    await reply.finish()
+    assert message.log == [("edit", "partial")]
@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from bot.services import rag_api
+from bot.utils import tracing
+from bot.utils.tracing import TRACE_HEADER, Tracer, add_span, current_trace_id, span
+
+
+def test_spans_are_recorded_inside_a_trace_only():
+    with span("outside") as step:
+        step.set(ignored=True)
+    assert current_trace_id() is None
+
+    exported = []
+    tracer = Tracer(sample_rate=1.0)
+    tracer.export = exported.append
+    with tracer.trace("message", modality="text") as trace:
+        assert current_trace_id() == trace.trace_id
+        with span("typing"):
+            pass
+        with pytest.raises(KeyError):
+            with span("render", size=3):
+                raise KeyError("x")
+        trace.set(outcome="answered")
+    assert current_trace_id() is None
+
+    record = json.loads(exported[0])
+    assert record["trace_id"] == trace.trace_id
+    assert record["modality"] == "text" and record["outcome"] == "answered"
+    assert [s["name"] for s in record["spans"]] == ["typing", "render"]
+    assert record["spans"][1]["size"] == 3
+    assert record["spans"][1]["error"] == "KeyError"
+
+
+def test_sampling_keeps_slow_traces(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(sample_rate=0.0, slow=10.0, path=str(path))
+    with tracer.trace("fast"):
+        pass
+    slow = tracing.Trace("slow")
+    tracer.finish(slow, 12.0)
+    tracer.close()
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0])["slow"] is True
+    assert tracer.stats() == {"exported": 1, "dropped": 1}
+
+
+def test_disabled_tracer_runs_the_body_untraced():
+    tracer = Tracer(enabled=False)
+    with tracer.trace("message") as trace:
+        assert trace.trace_id is None
+        assert current_trace_id() is None
+
+
+@pytest.mark.asyncio
+async def test_tasks_share_the_trace_and_the_id_reaches_the_rag_api():
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "POST":
+            seen.append(request.headers.get(TRACE_HEADER))
+        return httpx.Response(200, json={"response": "ok", "transcription": "hi"})
+
+    await rag_api.close_client()
+    await rag_api.init_client(transport=httpx.MockTransport(handler))
+    async def side_task():
+        with span("side"):
+            await asyncio.sleep(0)
+
+    exported = []
+    tracer = Tracer(sample_rate=1.0)
+    tracer.export = exported.append
+    try:
+        with tracer.trace("message") as trace:
+            await asyncio.gather(
+                rag_api.speech_to_text(b"trace test", "a.ogg", [{"role": "user", "content": "hi"}]),
+                asyncio.create_task(side_task()),
+            )
+            add_span("queue", trace.started)
+    finally:
+        await rag_api.close_client()
+
+    assert seen == [trace.trace_id]
+    spans = [s["name"] for s in json.loads(exported[0])["spans"]]
+    assert sorted(spans) == ["queue", "rag.speech", "side"]
+
+
+def test_export_file_is_rotated(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(sample_rate=1.0, path=str(path), max_bytes=200, backups=1)
+    for n in range(20):
+        tracer.finish(tracing.Trace("message", n=n), 0.1)
+    tracer.close()
+    assert path.stat().st_size <= 200
+    assert (tmp_path / "traces.jsonl.1").exists()
+    assert not (tmp_path / "traces.jsonl.2").exists()
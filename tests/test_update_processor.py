@@ -0,0 +1,52 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from telegram import Chat, Message, Update
+
+from bot.utils.update_processor import PerChatUpdateProcessor
+
+
+def make_update(update_id, chat_id):
+    chat = Chat(id=chat_id, type="private")
+    message = Message(message_id=update_id, date=datetime.now(timezone.utc), chat=chat, text="hi")
+    return Update(update_id=update_id, message=message)
+
+
+@pytest.mark.asyncio
+async def test_same_chat_runs_in_order_other_chats_in_parallel():
+    processor = PerChatUpdateProcessor(max_concurrent_updates=4)
+    events = []
+
+    async def handle(name, delay):
+        events.append(f"start {name}")
+        await asyncio.sleep(delay)
+        events.append(f"end {name}")
+
+    await asyncio.gather(
+        processor.process_update(make_update(1, 10), handle("a1", 0.05)),
+        processor.process_update(make_update(2, 10), handle("a2", 0)),
+        processor.process_update(make_update(3, 20), handle("b1", 0)),
+    )
+
+    # b1 (another chat) finishes while a1 is still running, a2 waits for a1
+    assert events.index("end b1") < events.index("end a1")
+    assert events.index("end a1") < events.index("start a2")
+    assert processor.active_chats == 0
+
+
+@pytest.mark.asyncio
+async def test_global_cap_is_respected():
+    processor = PerChatUpdateProcessor(max_concurrent_updates=2)
+    running = 0
+    peak = 0
+
+    async def handle():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    await asyncio.gather(*(processor.process_update(make_update(i, i), handle()) for i in range(10)))
+    assert peak == 2
@@ -0,0 +1,52 @@
+import os
+
+import pytest
+from telegram import File
+
+from bot.services import uploads
+from bot.utils.http_server import HTTPServer, Response
+
+PAYLOAD = os.urandom(200_000)
+
+
+async def collect(stream):
+    return b"".join([chunk async for chunk in stream])
+
+
+@pytest.mark.asyncio
+async def test_multipart_stream_matches_content_length():
+    source = uploads.BytesSource(b"%PDF-1.4 data")
+    headers, body = uploads.multipart_stream({"query": "What is this?"}, "file", 'a "b".pdf', source)
+    data = await collect(body)
+    boundary = headers["Content-Type"].split("boundary=")[1]
+    assert int(headers["Content-Length"]) == len(data)
+    assert data.startswith(f"--{boundary}\r\n".encode())
+    assert data.endswith(f"\r\n--{boundary}--\r\n".encode())
+    assert b'name="query"\r\n\r\nWhat is this?\r\n' in data
+    assert b'filename="a %22b%22.pdf"' in data and b"\r\n\r\n%PDF-1.4 data\r\n" in data
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("threshold,expected", [(10**9, uploads.TelegramFileSource), (1024, uploads.FileSource)])
+async def test_telegram_file_is_piped_or_spooled(monkeypatch, threshold, expected):
+    server = HTTPServer()
+
+    async def serve_file(request):
+        return Response(PAYLOAD, content_type="application/octet-stream")
+
+    server.route("GET", "/file/bot123/doc.pdf", serve_file)
+    await server.start()
+    monkeypatch.setattr(uploads, "FILE_SPOOL_THRESHOLD", threshold)
+    try:
+        file = File(file_id="id", file_unique_id="uniq", file_size=len(PAYLOAD),
+                    file_path=f"{server.url}/file/bot123/doc.pdf")
+        source = await uploads.open_telegram_file(file)
+        assert isinstance(source, expected)
+        assert source.key == "uniq" and source.size == len(PAYLOAD)
+        assert await collect(source.chunks()) == PAYLOAD
+        await source.aclose()
+        if isinstance(source, uploads.FileSource):
+            assert not os.path.exists(source.path)
+    finally:
+        await uploads.close_download_client()
+        await server.stop()
@@ -0,0 +1,58 @@
+import httpx
+import pytest
+import pytest_asyncio
+from telegram import Update
+from telegram.ext import Application
+
+from bot.utils.webhook import SECRET_HEADER, build_webhook_server
+
+SECRET = "s3cret-token"
+
+RECORDED_UPDATE = {
+    "update_id": 815001,
+    "message": {
+        "message_id": 42,
+        "date": 1760000000,
+        "chat": {"id": 1234, "type": "private", "first_name": "Test"},
+        "from": {"id": 1234, "is_bot": False, "first_name": "Test"},
+        "text": "What is GDPR?",
+    },
+}
+
+
+@pytest_asyncio.fixture
+async def webhook():
+    app = Application.builder().token("123456:TEST").updater(None).build()
+    server = build_webhook_server(app, "/telegram", SECRET, "127.0.0.1", 0)
+    await server.start()
+    async with httpx.AsyncClient(base_url=server.url) as client:
+        yield app, client
+    await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_update_is_acknowledged_and_queued(webhook):
+    app, client = webhook
+    resp = await client.post("/telegram", json=RECORDED_UPDATE, headers={SECRET_HEADER: SECRET})
+    assert resp.status_code == 200
+    update = app.update_queue.get_nowait()
+    assert isinstance(update, Update)
+    assert update.update_id == 815001
+    assert update.message.text == "What is GDPR?"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("headers", [{}, {SECRET_HEADER: "wrong"}])
+async def test_wrong_secret_is_rejected(webhook, headers):
+    app, client = webhook
+    resp = await client.post("/telegram", json=RECORDED_UPDATE, headers=headers)
+    assert resp.status_code == 403
+    assert app.update_queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_malformed_body_is_rejected(webhook):
+    app, client = webhook
+    resp = await client.post("/telegram", content=b"{not json", headers={SECRET_HEADER: SECRET})
+    assert resp.status_code == 400
+    assert app.update_queue.empty()
@@ -0,0 +1,212 @@
+"""
+Local stand-in for the RAG backend, for offline development, tests and load tests
+
+    python -m tools.fake_rag --port 8000 --token-delay 0.05
+    python -m tools.fake_rag --latency text=lognormal:0.8:0.5 --latency file=uniform:1:4 --error-rate 0.02
+    RAG_API_URL=http://127.0.0.1:8000/api/v2/telegram RAG_STREAMING=true python -m bot.main
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import random
+from typing import Dict, Optional, Sequence
+
+from bot.utils.http_server import HTTPServer, Request, Response
+
+BASE_PATH = "/api/v2/telegram"
+
+# `detail` of injected failures, which the bot passes on to the user
+FAILURE_DETAIL = "Injected failure"
+
+FILLER = (
+    "Under GDPR you need a lawful basis for processing, a clear privacy notice, "
+    "records of processing and a plan to report breaches within 72 hours. "
+    "Small teams can start with a data map and a short privacy policy."
+).split(" ")
+
+
+def make_answer(query: str, tokens: int, end: str = "") -> list:
+    """The answer as a list of tokens (words with their trailing space), plus `end` if given"""
+    words = [f"**Answer** to _{query}_:"] + [FILLER[i % len(FILLER)] for i in range(tokens)]
+    if end:
+        words.append(end)
+    return [w + " " for w in words]
+
+
+class Distribution:
+    """
+    Random delays in seconds, from a spec like "fixed:0.5", "uniform:0.2:1.5",
+    "normal:1:0.3" (mean, sd), "lognormal:0.8:0.5" (median, sigma) or "exp:0.5" (mean).
+    Samples are never negative.
+    """
+
+    KINDS = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exp": 1}
+
+    def __init__(self, spec: str, rng: Optional[random.Random] = None):
+        kind, *params = spec.split(":")
+        if kind not in self.KINDS or len(params) != self.KINDS[kind]:
+            raise ValueError(f"Bad latency spec {spec!r}, expected e.g. fixed:0.5 or lognormal:0.8:0.5")
+        self.spec = spec
+        self.kind = kind
+        self.params = [float(p) for p in params]
+        self.rng = rng or random.Random()
+
+    def sample(self) -> float:
+        a = self.params[0]
+        if self.kind == "fixed":
+            value = a
+        elif self.kind == "uniform":
+            value = self.rng.uniform(a, self.params[1])
+        elif self.kind == "normal":
+            value = self.rng.gauss(a, self.params[1])
+        elif self.kind == "lognormal":
+            value = self.rng.lognormvariate(math.log(a), self.params[1])
+        else:
+            value = self.rng.expovariate(1 / a) if a > 0 else 0.0
+        return max(value, 0.0)
+
+
+class FakeRAG:
+    """
+    Serves /text, its streaming variant /text/stream, /file and /speech.
+
+    `latency` maps an endpoint ("text", "file", "speech") to the Distribution of its
+    response time (streams use it before the first token); endpoints without one take
+    `token_delay * tokens`. A share `error_rate` of requests fails with one of
+    `error_statuses`. `end` is appended to every answer so clients can tell it is complete.
+    """
+
+    def __init__(
+        self,
+        token_delay: float = 0.02,
+        tokens: int = 40,
+        sse: bool = True,
+        latency: Optional[Dict[str, Distribution]] = None,
+        error_rate: float = 0.0,
+        error_statuses: Sequence[int] = (500, 503),
+        end: str = "",
+        seed: Optional[int] = None,
+    ):
+        self.token_delay = token_delay
+        self.tokens = tokens
+        self.sse = sse
+        self.latency = latency or {}
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.end = end
+        self.rng = random.Random(seed)
+        self.requests = []
+        self.errors = 0
+
+    def install(self, server: HTTPServer) -> None:
+        server.route("HEAD", BASE_PATH, self.head)
+        server.route("POST", f"{BASE_PATH}/text", self.text)
+        server.route("POST", f"{BASE_PATH}/text/stream", self.text_stream)
+        server.route("POST", f"{BASE_PATH}/file", self.file)
+        server.route("POST", f"{BASE_PATH}/speech", self.speech)
+
+    async def head(self, request: Request) -> Response:
+        return Response(b"")
+
+    async def _delay(self, endpoint: str) -> None:
+        distribution = self.latency.get(endpoint)
+        await asyncio.sleep(distribution.sample() if distribution else self.token_delay * self.tokens)
+
+    def _failure(self) -> Optional[Response]:
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.errors += 1
+            return Response.json({"detail": FAILURE_DETAIL}, status=self.rng.choice(self.error_statuses))
+        return None
+
+    def _answer(self, query: str) -> str:
+        return "".join(make_answer(query, self.tokens, self.end)).strip()
+
+    async def text(self, request: Request) -> Response:
+        query = request.form().get("query", "")
+        self.requests.append(("text", query))
+        await self._delay("text")
+        return self._failure() or Response.json({"response": self._answer(query)})
+
+    async def file(self, request: Request) -> Response:
+        # Multipart body; the fields are not parsed, only its size is noted
+        self.requests.append(("file", len(request.body)))
+        await self._delay("file")
+        return self._failure() or Response.json({"response": self._answer("your file")})
+
+    async def speech(self, request: Request) -> Response:
+        self.requests.append(("speech", len(request.body)))
+        await self._delay("speech")
+        return self._failure() or Response.json(
+            {"transcription": "What does this law require?", "response": self._answer("your voice note")}
+        )
+
+    async def text_stream(self, request: Request) -> Response:
+        query = request.form().get("query", "")
+        self.requests.append(("text/stream", query))
+        if "text" in self.latency:
+            await self._delay("text")
+        failure = self._failure()
+        if failure is not None:
+            return failure
+
+        async def events():
+            for token in make_answer(query, self.tokens, self.end):
+                await asyncio.sleep(self.token_delay)
+                if self.sse:
+                    yield f"data: {json.dumps({'token': token}, ensure_ascii=False)}\n\n".encode("utf-8")
+                else:
+                    yield token.encode("utf-8")
+            if self.sse:
+                yield b"data: [DONE]\n\n"
+
+        content_type = "text/event-stream" if self.sse else "text/plain; charset=utf-8"
+        return Response(events(), content_type=content_type)
+
+
+def parse_latencies(items: Sequence[str], rng: Optional[random.Random] = None) -> Dict[str, Distribution]:
+    """{"text": Distribution(...)} from ["text=lognormal:0.8:0.5", ...]"""
+    latencies = {}
+    for item in items:
+        endpoint, _, spec = item.partition("=")
+        latencies[endpoint.strip()] = Distribution(spec.strip(), rng)
+    return latencies
+
+
+async def serve(host: str, port: int, fake: FakeRAG) -> None:
+    server = HTTPServer(host, port)
+    fake.install(server)
+    await server.start()
+    logging.info(f"Fake RAG API at {server.url}{BASE_PATH}")
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--token-delay", type=float, default=0.05, help="seconds between streamed tokens")
+    parser.add_argument("--tokens", type=int, default=40, help="words per answer")
+    parser.add_argument("--plain", action="store_true", help="stream plain chunked text instead of SSE")
+    parser.add_argument(
+        "--latency", action="append", default=[], metavar="ENDPOINT=SPEC",
+        help="response time of text, file or speech, e.g. text=lognormal:0.8:0.5 (repeatable)",
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests that fail")
+    parser.add_argument("--error-status", type=int, action="append", help="status codes of failures (default 500, 503)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    fake = FakeRAG(
+        args.token_delay, args.tokens, sse=not args.plain, latency=parse_latencies(args.latency),
+        error_rate=args.error_rate, error_statuses=args.error_status or (500, 503),
+    )
+    try:
+        asyncio.run(serve(args.host, args.port, fake))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Local stand-in for the Telegram Bot API, for load tests and offline runs
+
+Serves getMe, getUpdates (long polling), getFile and file downloads, records every
+sendMessage / editMessageText / sendPhoto, and answers other methods with `true`.
+Updates are injected with `send_text`, `send_photo`, `send_document` and `send_voice`.
+
+    python -m tools.fake_telegram --port 8081
+    TELEGRAM_API_BASE=http://127.0.0.1:8081 TELEGRAM_BOT_TOKEN=1:fake python -m bot.main
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import time
+from typing import Dict, List, Optional
+
+from bot.utils.http_server import HTTPServer, Request, Response
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Pivot", "username": "pivot_fake_bot"}
+
+# Methods whose reply to the user is recorded
+REPLY_METHODS = frozenset({"sendMessage", "editMessageText", "sendPhoto"})
+
+_TEXT_FIELDS = frozenset({"text", "caption"})
+
+
+class Reply:
+    """One message the bot sent or edited, stamped with perf_counter() on arrival"""
+
+    __slots__ = ("chat_id", "method", "text", "at")
+
+    def __init__(self, chat_id: int, method: str, text: str, at: float):
+        self.chat_id = chat_id
+        self.method = method
+        self.text = text
+        self.at = at
+
+
+def _params(request: Request) -> dict:
+    """Bot API parameters: form fields whose non-string values are JSON encoded"""
+    if not request.headers.get("content-type", "").startswith("application/x-www-form-urlencoded"):
+        # multipart uploads (sendPhoto with a file) and empty bodies
+        return {}
+    params = {}
+    for name, value in request.form().items():
+        if name in _TEXT_FIELDS:
+            # Strings go out as they are, so "42" or "true" must stay text
+            params[name] = value
+            continue
+        try:
+            params[name] = json.loads(value)
+        except ValueError:
+            params[name] = value
+    return params
+
+
+class FakeTelegram:
+    """
+    Bot API methods under /bot<token>/ and files under /file/bot<token>/, for any token.
+
+    `replies` keeps every recorded Reply; `replies_for(chat_id)` is a queue of the
+    replies in one chat, for clients waiting on answers.
+    """
+
+    def __init__(self):
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+        self._updates: List[dict] = []
+        self._new_updates = asyncio.Event()
+        self.files: Dict[str, bytes] = {}
+        self.replies: List[Reply] = []
+        self._queues: Dict[int, asyncio.Queue] = {}
+        self.calls: Dict[str, int] = {}
+        # Set on the first getUpdates, i.e. once the bot is up
+        self.polling = asyncio.Event()
+
+    def install(self, server: HTTPServer) -> None:
+        server.route("POST", "/bot*", self.api)
+        server.route("GET", "/bot*", self.api)
+        server.route("GET", "/file/bot*", self.download)
+
+    # ----- incoming updates ----- #
+    def _message(self, chat_id: int, **content) -> dict:
+        user = {"id": chat_id, "is_bot": False, "first_name": f"User {chat_id}"}
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private", "first_name": user["first_name"]},
+            "from": user,
+            **content,
+        }
+
+    def _push(self, message: dict) -> dict:
+        self._updates.append({"update_id": next(self._update_ids), "message": message})
+        self._new_updates.set()
+        return message
+
+    def add_file(self, data: bytes) -> dict:
+        """Store `data` as a Telegram file; returns its file_id / file_unique_id / file_size"""
+        number = next(self._file_ids)
+        file_id = f"file-{number}"
+        self.files[file_id] = data
+        return {"file_id": file_id, "file_unique_id": f"unique-{number}", "file_size": len(data)}
+
+    def send_text(self, chat_id: int, text: str) -> dict:
+        return self._push(self._message(chat_id, text=text))
+
+    def send_photo(self, chat_id: int, data: bytes, caption: Optional[str] = None) -> dict:
+        photo = {**self.add_file(data), "width": 800, "height": 600}
+        return self._push(self._message(chat_id, photo=[photo], **({"caption": caption} if caption else {})))
+
+    def send_document(self, chat_id: int, data: bytes, file_name: str, caption: Optional[str] = None) -> dict:
+        document = {**self.add_file(data), "file_name": file_name, "mime_type": "application/pdf"}
+        return self._push(self._message(chat_id, document=document, **({"caption": caption} if caption else {})))
+
+    def send_voice(self, chat_id: int, data: bytes, duration: int = 5) -> dict:
+        voice = {**self.add_file(data), "duration": duration, "mime_type": "audio/ogg"}
+        return self._push(self._message(chat_id, voice=voice))
+
+    def replies_for(self, chat_id: int) -> asyncio.Queue:
+        queue = self._queues.get(chat_id)
+        if queue is None:
+            queue = self._queues[chat_id] = asyncio.Queue()
+        return queue
+
+    # ----- Bot API ----- #
+    async def api(self, request: Request) -> Response:
+        method = request.path.rsplit("/", 1)[-1]
+        self.calls[method] = self.calls.get(method, 0) + 1
+        params = _params(request)
+        handler = getattr(self, f"_{method}", None)
+        result = await handler(params) if handler is not None else True
+        if method in REPLY_METHODS and isinstance(result, dict):
+            self._record(method, result)
+        return Response.json({"ok": True, "result": result})
+
+    def _record(self, method: str, message: dict) -> None:
+        reply = Reply(message["chat"]["id"], method, message.get("text") or message.get("caption") or "", time.perf_counter())
+        self.replies.append(reply)
+        self.replies_for(reply.chat_id).put_nowait(reply)
+
+    async def _getMe(self, params: dict) -> dict:
+        return BOT_USER
+
+    async def _getUpdates(self, params: dict) -> list:
+        self.polling.set()
+        offset = int(params.get("offset") or 0)
+        if offset:
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+        if not self._updates:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), float(params.get("timeout") or 0))
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                # Shutting down with a poll open: end it like a timeout. A cancelled
+                # connection task would otherwise be logged by asyncio (Python < 3.12).
+                return []
+        return self._updates[: int(params.get("limit") or 100)]
+
+    async def _getFile(self, params: dict) -> dict:
+        file_id = params["file_id"]
+        data = self.files[file_id]
+        number = file_id.rsplit("-", 1)[-1]
+        return {"file_id": file_id, "file_unique_id": f"unique-{number}", "file_size": len(data), "file_path": f"files/{file_id}"}
+
+    def _sent(self, chat_id, **content) -> dict:
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id), "type": "private"},
+            "from": BOT_USER,
+            **content,
+        }
+
+    async def _sendMessage(self, params: dict) -> dict:
+        return self._sent(params["chat_id"], text=params.get("text", ""))
+
+    async def _editMessageText(self, params: dict) -> dict:
+        message = self._sent(params["chat_id"], text=params.get("text", ""))
+        message["message_id"] = int(params["message_id"])
+        message["edit_date"] = int(time.time())
+        return message
+
+    async def _sendPhoto(self, params: dict) -> dict:
+        photo = {"file_id": f"sent-photo-{next(self._file_ids)}", "file_unique_id": "sent", "width": 800, "height": 600}
+        return self._sent(params.get("chat_id", 0), photo=[photo], caption=params.get("caption", ""))
+
+    async def download(self, request: Request) -> Response:
+        data = self.files.get(request.path.rsplit("/", 1)[-1])
+        if data is None:
+            return Response(b"not found", status=404)
+        return Response(data, content_type="application/octet-stream")
+
+
+async def serve(host: str, port: int) -> None:
+    server = HTTPServer(host, port)
+    fake = FakeTelegram()
+    fake.install(server)
+    await server.start()
+    logging.info(f"Fake Bot API at {server.url}")
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+End-to-end load test: the real bot (python -m bot.main) against local fake Telegram and RAG servers
+
+    python -m tools.loadtest --users 50 --messages 4
+    python -m tools.loadtest --users 200 --mix text=0.6,photo=0.15,document=0.15,voice=0.1 \\
+        --latency text=lognormal:0.8:0.5 --latency file=uniform:1:3 --error-rate 0.02
+
+Each synthetic user sends its messages one after another and waits for each answer
+(plus an optional think time). End-to-end latency runs from the moment an update is
+handed to getUpdates until the message carrying its answer reaches the fake Bot API.
+The bot runs as a child process with its data files in a temporary directory; bot
+settings can be passed with --env NAME=VALUE.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import signal
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from bot.services.rag_api import USER_FRIENDLY_ERRORS
+from bot.utils.http_server import HTTPServer
+from tools.fake_rag import BASE_PATH, FAILURE_DETAIL, FakeRAG, parse_latencies
+from tools.fake_telegram import FakeTelegram
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODALITIES = ("text", "photo", "document", "voice")
+
+# Appended to every fake answer: a reply containing it is a complete answer
+END = "∎"
+
+# Replies that end a request without an answer; the bot's own failure replies start with ❌
+FAILURE_TEXTS = frozenset({FAILURE_DETAIL, *USER_FRIENDLY_ERRORS.values()})
+
+# (modality, outcome, seconds) of one message
+Result = Tuple[str, str, float]
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of `values` (0 < q <= 100)"""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """{"text": 0.7, ...} from "text=0.7,photo=0.1,..."; weights need not add up to 1"""
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in MODALITIES:
+            raise ValueError(f"Unknown modality {name!r}, expected one of {', '.join(MODALITIES)}")
+        mix[name] = float(weight)
+    if not any(mix.values()):
+        raise ValueError("The mix needs at least one modality with a positive weight")
+    return mix
+
+
+def is_failure(text: str) -> bool:
+    return text.startswith("❌") or text.lstrip("❌⏳ ") in FAILURE_TEXTS
+
+
+def bot_env(telegram_url: str, rag_url: str, workdir: str, streaming: bool, extra: Sequence[str]) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "TELEGRAM_BOT_TOKEN": "123456:loadtest",
+        "TELEGRAM_API_BASE": telegram_url,
+        "RAG_API_URL": rag_url + BASE_PATH,
+        "BOT_MODE": "polling",
+        "BOT_SHARDS": "1",
+        "RAG_STREAMING": "true" if streaming else "false",
+        "JOB_QUEUE_PATH": os.path.join(workdir, "jobs.sqlite3"),
+        "PERSISTENCE_PATH": os.path.join(workdir, "persistence.sqlite3"),
+        "MEDIA_CACHE_PATH": os.path.join(workdir, "media_ids.json"),
+        "BOT_COMMANDS_STATE_PATH": os.path.join(workdir, "bot_commands.sha256"),
+        "TRACE_EXPORT_PATH": os.path.join(workdir, "traces.jsonl"),
+        "FILE_CACHE_PATH": "",
+        "METRICS_PORT": "0",
+    })
+    for item in extra:
+        name, _, value = item.partition("=")
+        env[name.strip()] = value
+    return env
+
+
+class LoadTest:
+    """Synthetic users talking to the bot through a FakeTelegram"""
+
+    def __init__(
+        self,
+        telegram: FakeTelegram,
+        users: int,
+        messages: int,
+        mix: Dict[str, float],
+        think: float = 0.0,
+        ramp: float = 0.0,
+        timeout: float = 60.0,
+        file_size: int = 100_000,
+        seed: int = 1,
+    ):
+        self.telegram = telegram
+        self.users = users
+        self.messages = messages
+        self.modalities = list(mix)
+        self.weights = [mix[m] for m in self.modalities]
+        self.think = think
+        self.ramp = ramp
+        self.timeout = timeout
+        self.file_size = file_size
+        self.seed = seed
+        self.results: List[Result] = []
+
+    def _send(self, rng: random.Random, modality: str, chat_id: int, tag: str) -> None:
+        # Unique content per message, so no answer or file cache serves it
+        data = tag.encode() + rng.randbytes(self.file_size)
+        if modality == "text":
+            self.telegram.send_text(chat_id, f"Do we need a data protection officer? ({tag})")
+        elif modality == "photo":
+            self.telegram.send_photo(chat_id, data, caption=f"Is this consent form compliant? ({tag})")
+        elif modality == "document":
+            self.telegram.send_document(chat_id, data, f"policy-{tag}.pdf", caption=f"Summarize this policy ({tag})")
+        else:
+            self.telegram.send_voice(chat_id, data[: max(len(tag), self.file_size // 4)])
+
+    async def _answer(self, replies: asyncio.Queue, deadline: float) -> Tuple[str, float]:
+        """("ok" | "error" | "timeout", perf_counter() of the reply that settled it)"""
+        while True:
+            remaining = deadline - time.perf_counter()
+            try:
+                reply = await asyncio.wait_for(replies.get(), max(remaining, 0))
+            except asyncio.TimeoutError:
+                return "timeout", deadline
+            if END in reply.text:
+                return "ok", reply.at
+            if is_failure(reply.text):
+                return "error", reply.at
+
+    async def user(self, index: int) -> None:
+        rng = random.Random(self.seed * 1_000_003 + index)
+        chat_id = 100_000 + index
+        replies = self.telegram.replies_for(chat_id)
+        if self.ramp:
+            await asyncio.sleep(self.ramp * index / self.users)
+        for n in range(self.messages):
+            modality = rng.choices(self.modalities, self.weights)[0]
+            # A late answer to an earlier, timed-out message must not count for this one
+            while not replies.empty():
+                replies.get_nowait()
+            started = time.perf_counter()
+            self._send(rng, modality, chat_id, f"u{index}m{n}")
+            outcome, at = await self._answer(replies, started + self.timeout)
+            self.results.append((modality, outcome, at - started))
+            if self.think:
+                await asyncio.sleep(rng.expovariate(1 / self.think))
+
+    async def run(self) -> float:
+        """Run every user to the end; returns the wall time in seconds"""
+        started = time.perf_counter()
+        await asyncio.gather(*(self.user(i) for i in range(self.users)))
+        return time.perf_counter() - started
+
+
+def report(results: Sequence[Result], wall: float, rag: FakeRAG, telegram: FakeTelegram) -> str:
+    outcomes: Dict[str, int] = {}
+    for _, outcome, _ in results:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    ok = [r for r in results if r[1] == "ok"]
+    lines = [
+        f"{len(results)} messages in {wall:.1f} s: {len(ok) / wall:.1f} answers/s, {len(results) / wall:.1f} messages/s",
+        "outcomes: " + ", ".join(f"{name} {count}" for name, count in sorted(outcomes.items())),
+        f"  {'latency (ok)':<14} {'n':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}",
+    ]
+    groups = [("all", ok)] + [(m, [r for r in ok if r[0] == m]) for m in MODALITIES]
+    for name, group in groups:
+        if not group:
+            continue
+        seconds = [r[2] for r in group]
+        lines.append(
+            f"  {name:<14} {len(group):>6} {percentile(seconds, 50):>7.2f}s {percentile(seconds, 95):>7.2f}s"
+            f" {percentile(seconds, 99):>7.2f}s {max(seconds):>7.2f}s"
+        )
+    endpoints: Dict[str, int] = {}
+    for endpoint, _ in rag.requests:
+        endpoints[endpoint] = endpoints.get(endpoint, 0) + 1
+    lines.append("RAG requests: " + ", ".join(f"{k} {v}" for k, v in sorted(endpoints.items()))
+                 + f", injected errors {rag.errors}")
+    lines.append("Bot API calls: " + ", ".join(f"{k} {v}" for k, v in sorted(telegram.calls.items())))
+    return "\n".join(lines)
+
+
+async def _stop(process: asyncio.subprocess.Process) -> None:
+    if process.returncode is not None:
+        return
+    process.send_signal(signal.SIGINT)
+    try:
+        await asyncio.wait_for(process.wait(), 30)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+
+
+async def run(args) -> str:
+    telegram, rag = FakeTelegram(), FakeRAG(
+        token_delay=args.token_delay, tokens=args.tokens,
+        latency=parse_latencies(args.latency, random.Random(args.seed)),
+        error_rate=args.error_rate, end=END, seed=args.seed,
+    )
+    telegram_server, rag_server = HTTPServer(), HTTPServer()
+    telegram.install(telegram_server)
+    rag.install(rag_server)
+    await telegram_server.start()
+    await rag_server.start()
+
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    log_path = args.bot_log or os.path.join(workdir, "bot.log")
+    env = bot_env(telegram_server.url, rag_server.url, workdir, args.streaming, args.env)
+    with open(log_path, "wb") as log:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "bot.main", cwd=ROOT, env=env, stdout=log, stderr=asyncio.subprocess.STDOUT,
+        )
+        try:
+            waiting = asyncio.ensure_future(telegram.polling.wait())
+            exited = asyncio.ensure_future(process.wait())
+            await asyncio.wait({waiting, exited}, timeout=60, return_when=asyncio.FIRST_COMPLETED)
+            exited.cancel()
+            if not telegram.polling.is_set():
+                waiting.cancel()
+                raise RuntimeError(f"The bot did not start polling, see {log_path}")
+            test = LoadTest(
+                telegram, args.users, args.messages, parse_mix(args.mix), think=args.think, ramp=args.ramp,
+                timeout=args.timeout, file_size=args.file_size, seed=args.seed,
+            )
+            wall = await test.run()
+        finally:
+            await _stop(process)
+            await telegram_server.stop()
+            await rag_server.stop()
+    return report(test.results, wall, rag, telegram) + f"\nbot log and data: {workdir}"
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="concurrent synthetic users")
+    parser.add_argument("--messages", type=int, default=3, help="messages per user, sent one after another")
+    parser.add_argument("--mix", default="text=0.7,photo=0.1,document=0.1,voice=0.1", help="modality weights")
+    parser.add_argument("--think", type=float, default=0.0, help="mean pause between a user's messages (s)")
+    parser.add_argument("--ramp", type=float, default=0.0, help="seconds over which users start")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for each answer")
+    parser.add_argument("--file-size", type=int, default=100_000, help="bytes per photo/document (voice: a quarter)")
+    parser.add_argument(
+        "--latency", action="append", default=[], metavar="ENDPOINT=SPEC",
+        help="fake RAG response time of text, file or speech, e.g. text=lognormal:0.8:0.5 (repeatable)",
+    )
+    parser.add_argument("--token-delay", type=float, default=0.01, help="fake RAG seconds per answer token")
+    parser.add_argument("--tokens", type=int, default=40, help="words per fake answer")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of fake RAG requests that fail")
+    parser.add_argument("--streaming", action="store_true", help="run the bot with RAG_STREAMING=true")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE", help="extra bot setting (repeatable)")
+    parser.add_argument("--bot-log", default="", help="where the bot's output goes (default: the temporary directory)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    print(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()